@@ -8,7 +8,9 @@ import numpy as np
 from scipy import stats
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import datetime
+
+import soc_block_table
 
 def analyze_extended_data():
     """
@@ -19,10 +21,8 @@ def analyze_extended_data():
     print('PHÂN TÍCH MỞ RỘNG: DỮ LIỆU 4 NGÀY (22, 23, 25, 26/9)')
     print('='*100)
     
-    # Đọc dữ liệu
-    df = pd.read_csv('kotohira_integrated_data.csv')
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.sort_values('timestamp')
+    # Bảng SOC theo block 3 giờ (soc_block_table.py)
+    blocks = soc_block_table.load_blocks()
     
     # Danh sách các ngày cần phân tích
     target_dates = [
@@ -44,59 +44,47 @@ def analyze_extended_data():
         print(f'📊 Phân tích ngày {date.strftime("%Y-%m-%d")}')
         print(f'{"="*100}')
         
-        # Lọc dữ liệu ngày này
-        daily_data = df[
-            (df['timestamp'] >= date) & 
-            (df['timestamp'] < date + timedelta(days=1))
-        ].copy()
-        
-        daily_soc = daily_data[daily_data['battery_soc_percent'].notna()].copy()
-        daily_baseline = daily_data[daily_data['demand_plan_kw_baseline'].notna()].copy()
+        # Các block của ngày này
+        daily_blocks = blocks[blocks['date'] == date]
+        baseline_blocks = daily_blocks[(daily_blocks['baseline_count'] > 0) &
+                                       daily_blocks['soc_start'].notna()]
         
-        if len(daily_baseline) == 0:
+        if len(baseline_blocks) == 0:
             print('   ⚠️  Không có dữ liệu 基準値')
             continue
             
-        print(f'\n   SOC範囲: {daily_soc["battery_soc_percent"].min():.1f}% → {daily_soc["battery_soc_percent"].max():.1f}%')
+        print(f'\n   SOC範囲: {daily_blocks["soc_min"].min():.1f}% → {daily_blocks["soc_max"].max():.1f}%')
         print(f'   基準値が設定されている時間帯:')
         
-        # Phân tích từng baseline value
-        for baseline_value in sorted(daily_baseline['demand_plan_kw_baseline'].unique()):
-            group = daily_baseline[daily_baseline['demand_plan_kw_baseline'] == baseline_value]
-            start_time = group['timestamp'].min()
-            end_time = group['timestamp'].max()
+        # Phân tích từng block 3 giờ
+        for _, block in baseline_blocks.iterrows():
+            baseline_value = block['baseline_mean']
+            start_time = block['soc_start_time']
+            end_time = block['soc_end_time']
+            soc_start = block['soc_start']
+            soc_end = block['soc_end']
+            soc_change = soc_end - soc_start
+            duration_hours = (end_time - start_time).total_seconds() / 3600
             
-            # Tìm SOC trong khoảng thời gian này
-            period_soc = daily_soc[
-                (daily_soc['timestamp'] >= start_time) & 
-                (daily_soc['timestamp'] <= end_time)
-            ]
-            
-            if len(period_soc) > 0:
-                soc_start = period_soc['battery_soc_percent'].iloc[0]
-                soc_end = period_soc['battery_soc_percent'].iloc[-1]
-                soc_change = soc_end - soc_start
-                duration_hours = (end_time - start_time).total_seconds() / 3600
+            if duration_hours > 0:
+                soc_change_rate = soc_change / duration_hours
+                
+                all_data.append({
+                    'date': date.strftime('%Y-%m-%d'),
+                    'time_start': start_time.strftime('%H:%M'),
+                    'time_end': end_time.strftime('%H:%M'),
+                    'baseline_kw': baseline_value,
+                    'duration_hours': duration_hours,
+                    'soc_start': soc_start,
+                    'soc_end': soc_end,
+                    'soc_change': soc_change,
+                    'soc_change_rate': soc_change_rate
+                })
                 
-                if duration_hours > 0:
-                    soc_change_rate = soc_change / duration_hours
-                    
-                    all_data.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'time_start': start_time.strftime('%H:%M'),
-                        'time_end': end_time.strftime('%H:%M'),
-                        'baseline_kw': baseline_value,
-                        'duration_hours': duration_hours,
-                        'soc_start': soc_start,
-                        'soc_end': soc_end,
-                        'soc_change': soc_change,
-                        'soc_change_rate': soc_change_rate
-                    })
-                    
-                    print(f'\n      基準値 = {baseline_value:.0f} kW')
-                    print(f'         期間: {start_time.strftime("%H:%M")} → {end_time.strftime("%H:%M")} ({duration_hours:.2f}時間)')
-                    print(f'         SOC: {soc_start:.1f}% → {soc_end:.1f}% (変化: {soc_change:+.1f}%)')
-                    print(f'         変化率: {soc_change_rate:+.2f} %/時間')
+                print(f'\n      基準値 = {baseline_value:.0f} kW')
+                print(f'         期間: {start_time.strftime("%H:%M")} → {end_time.strftime("%H:%M")} ({duration_hours:.2f}時間)')
+                print(f'         SOC: {soc_start:.1f}% → {soc_end:.1f}% (変化: {soc_change:+.1f}%)')
+                print(f'         変化率: {soc_change_rate:+.2f} %/時間')
     
     # Tạo DataFrame
     analysis_df = pd.DataFrame(all_data)
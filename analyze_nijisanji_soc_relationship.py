@@ -10,27 +10,17 @@ from plotly.subplots import make_subplots
 from sklearn.linear_model import LinearRegression
 from scipy import stats
 
+from dataset_cache import load_dataset
+
 print("=" * 60)
 print("二次・三次調整力 計画値 vs ΔSOC 分析")
 print("=" * 60)
 
 # データ読み込み
 print("\nデータを読み込んでいます...")
-schedule_df = pd.read_csv(
-    'arao_202406-202504/arao_schedule_202406-202504.csv'
-)
-soc_battery12_df = pd.read_csv(
-    'arao_202406-202504/arao_soc_battery1-2_202406-202504.csv'
-)
-soc_battery34_df = pd.read_csv(
-    'arao_202406-202504/arao_soc_battery3-4_202406-202504.csv'
-)
-
-# 時刻をdatetimeに変換
-schedule_df['開始時刻'] = pd.to_datetime(schedule_df['開始時刻'])
-schedule_df['終了時刻'] = pd.to_datetime(schedule_df['終了時刻'])
-soc_battery12_df['時刻'] = pd.to_datetime(soc_battery12_df['時刻'])
-soc_battery34_df['時刻'] = pd.to_datetime(soc_battery34_df['時刻'])
+schedule_df = load_dataset('arao_202406-202504/arao_schedule_202406-202504.csv')
+soc_battery12_df = load_dataset('arao_202406-202504/arao_soc_battery1-2_202406-202504.csv')
+soc_battery34_df = load_dataset('arao_202406-202504/arao_soc_battery3-4_202406-202504.csv')
 
 # 二次・三次のデータのみを抽出
 nijisanji_df = schedule_df[
@@ -61,44 +51,57 @@ avg_soc.columns = ['時刻', 'SOC平均']
 print(f"30分平均SOCデータ数: {len(avg_soc)} 行")
 
 # 二次・三次の各期間について、開始時と終了時のSOCを取得
-analysis_data = []
+def lookup_interval_soc(soc_times, soc_values, start_times, end_times):
+    """
+    全期間の開始・終了SOCを二分探索で一括取得
 
-for idx, row in nijisanji_df.iterrows():
-    start_time = row['開始時刻']
-    end_time = row['終了時刻']
-    plan_value = row['計画値']
-    
-    # 開始時刻のSOCを取得（前の時刻の値）
-    soc_before = avg_soc[
-        avg_soc['時刻'] <= start_time
-    ].tail(1)
-    
-    # 終了時刻のSOCを取得
-    soc_after = avg_soc[
-        (avg_soc['時刻'] >= start_time) & 
-        (avg_soc['時刻'] <= end_time)
-    ].tail(1)
-    
-    if len(soc_before) > 0 and len(soc_after) > 0:
-        soc_start = soc_before.iloc[0]['SOC平均']
-        soc_end = soc_after.iloc[0]['SOC平均']
-        delta_soc = soc_end - soc_start
-        
-        # 時間差（分）
-        time_diff_min = (end_time - start_time).total_seconds() / 60
-        
-        analysis_data.append({
-            '開始時刻': start_time,
-            '終了時刻': end_time,
-            '計画値': plan_value,
-            'SOC開始': soc_start,
-            'SOC終了': soc_end,
-            'ΔSOC': delta_soc,
-            '時間_分': time_diff_min,
-            'ΔSOC_per_30min': delta_soc * (30 / time_diff_min) if time_diff_min > 0 else 0
-        })
-
-result_df = pd.DataFrame(analysis_data)
+    - 開始SOC: 開始時刻以前で最後のSOC
+    - 終了SOC: 開始時刻〜終了時刻の範囲で最後のSOC
+    soc_times は昇順であること。
+
+    Returns:
+        (soc_start, soc_end, valid): 両方のSOCが存在する期間は valid=True
+    """
+    soc_times = np.asarray(soc_times, dtype='datetime64[ns]')
+    soc_values = np.asarray(soc_values, dtype=np.float64)
+    start_times = np.asarray(start_times, dtype='datetime64[ns]')
+    end_times = np.asarray(end_times, dtype='datetime64[ns]')
+
+    before = np.searchsorted(soc_times, start_times, side='right') - 1
+    after = np.searchsorted(soc_times, end_times, side='right') - 1
+
+    valid = (before >= 0) & (after >= 0)
+    valid &= soc_times[np.maximum(after, 0)] >= start_times
+
+    soc_start = soc_values[np.maximum(before, 0)]
+    soc_end = soc_values[np.maximum(after, 0)]
+    return soc_start, soc_end, valid
+
+
+soc_start, soc_end, valid = lookup_interval_soc(
+    avg_soc['時刻'].to_numpy(), avg_soc['SOC平均'].to_numpy(),
+    nijisanji_df['開始時刻'].to_numpy(), nijisanji_df['終了時刻'].to_numpy()
+)
+
+matched_df = nijisanji_df[valid]
+delta_soc = soc_end[valid] - soc_start[valid]
+
+# 時間差（分）
+time_diff_min = ((matched_df['終了時刻'] - matched_df['開始時刻'])
+                 .dt.total_seconds().to_numpy() / 60)
+
+result_df = pd.DataFrame({
+    '開始時刻': matched_df['開始時刻'].to_numpy(),
+    '終了時刻': matched_df['終了時刻'].to_numpy(),
+    '計画値': matched_df['計画値'].to_numpy(),
+    'SOC開始': soc_start[valid],
+    'SOC終了': soc_end[valid],
+    'ΔSOC': delta_soc,
+    '時間_分': time_diff_min,
+    'ΔSOC_per_30min': np.where(
+        time_diff_min > 0, delta_soc * 30 / np.where(time_diff_min > 0, time_diff_min, 1), 0
+    ),
+})
 
 print(f"\n分析対象データ数: {len(result_df)} 件")
 print(f"計画値の範囲: {result_df['計画値'].min():.2f} ~ "
@@ -0,0 +1,320 @@
+"""
+日別レポート（計画値・SOCグラフ）の並列一括出力
+
+荒尾・琴平の全期間を1日ごとに分割し、プロセスプールで並列に
+HTML / PNG を書き出す。
+- 各ワーカーは起動時に Kaleido を1回だけ立ち上げ、以降の PNG 出力で使い回す
+- 日ごとの入力データのハッシュを manifest.json に記録し、
+  データが変わっていない日（かつ出力ファイルがある日）はスキップする
+- HTML は plotly.js を CDN 参照にして1日あたりのファイルを小さくする
+
+使い方:
+    python batch_daily_report.py arao --format html png --workers 8
+    python batch_daily_report.py kotohira --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# 描画内容を変えたら上げる（全日を再出力）
+RENDER_VERSION = 1
+
+OUTPUT_DIR = 'daily_reports'
+MANIFEST_FILE = 'manifest.json'
+
+ARAO_SCHEDULE_FILE = 'arao_202406-202504/arao_schedule_202406-202504.csv'
+ARAO_SOC_FILES = [
+    'arao_202406-202504/arao_soc_battery1-2_202406-202504.csv',
+    'arao_202406-202504/arao_soc_battery3-4_202406-202504.csv',
+]
+KOTOHIRA_FILE = 'kotohira_integrated_data.csv'
+
+BATTERY_COLORS = {
+    '蓄電池1': 'rgba(0, 128, 0, 0.8)',
+    '蓄電池2': 'rgba(144, 238, 144, 0.8)',
+    '蓄電池3': 'rgba(255, 140, 0, 0.8)',
+    '蓄電池4': 'rgba(255, 69, 0, 0.8)',
+}
+
+
+# ============================================================================
+# データ読み込み（サイト → {名前: (DataFrame, 時刻列)}）
+# ============================================================================
+
+def _naive(times):
+    """タイムゾーン付きは現地時刻のまま tz を外す"""
+    times = pd.to_datetime(times)
+    if getattr(times.dt, 'tz', None) is not None:
+        times = times.dt.tz_localize(None)
+    return times
+
+
+def load_arao():
+    from dataset_cache import load_dataset
+
+    schedule = load_dataset(ARAO_SCHEDULE_FILE)
+    schedule['開始時刻'] = _naive(schedule['開始時刻'])
+    schedule['終了時刻'] = _naive(schedule['終了時刻'])
+    soc = pd.concat([load_dataset(path) for path in ARAO_SOC_FILES], ignore_index=True)
+    soc['時刻'] = _naive(soc['時刻'])
+    return {'schedule': (schedule, '開始時刻'), 'soc': (soc, '時刻')}
+
+
+def load_kotohira():
+    from dataset_cache import load_dataset
+
+    data = load_dataset(KOTOHIRA_FILE)
+    data['timestamp'] = _naive(data['timestamp'])
+    return {'data': (data, 'timestamp')}
+
+
+def split_days(frames):
+    """
+    各 DataFrame を日付ごとに分割する（時刻でソートして二分探索で区切る）
+
+    Returns:
+        dict: 日付 (Timestamp) → {名前: その日の DataFrame}
+    """
+    days = {}
+    for name, (df, column) in frames.items():
+        df = df.sort_values(column, kind='stable').reset_index(drop=True)
+        times = df[column].to_numpy(dtype='datetime64[ns]')
+        day_keys = times.astype('datetime64[D]')
+        unique_days = np.unique(day_keys)
+        bounds = np.searchsorted(day_keys, unique_days, side='left')
+        bounds = np.append(bounds, len(df))
+        for day, lo, hi in zip(unique_days, bounds[:-1], bounds[1:]):
+            days.setdefault(pd.Timestamp(day), {})[name] = df.iloc[lo:hi]
+    for day_frames in days.values():
+        for name, (df, _) in frames.items():
+            day_frames.setdefault(name, df.iloc[0:0])
+    return dict(sorted(days.items()))
+
+
+def day_hash(day_frames, formats):
+    """その日の入力データ + 描画バージョン + 出力形式のハッシュ"""
+    digest = hashlib.sha256(f'{RENDER_VERSION}:{sorted(formats)}'.encode())
+    for name in sorted(day_frames):
+        df = day_frames[name]
+        digest.update(name.encode())
+        digest.update(','.join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# ============================================================================
+# 1日分のグラフ
+# ============================================================================
+
+def arao_day_figure(day, frames):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    from block_shading import add_block_shading
+
+    schedule, soc = frames['schedule'], frames['soc']
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
+                        subplot_titles=('計画値 - 30分粒度', 'バッテリSOC - 1分粒度'),
+                        row_heights=[0.4, 0.6])
+    add_block_shading(fig, day, day, -2500, 2500, opacity=0.15, row=1, col=1)
+    add_block_shading(fig, day, day, 0, 100, opacity=0.1, row=2, col=1)
+
+    for resource, color in [('JEPX', 'blue'), ('二次・三次', 'red')]:
+        part = schedule[schedule['計画リソース'] == resource]
+        if len(part) > 0:
+            fig.add_trace(go.Scatter(x=part['開始時刻'], y=part['計画値'], name=resource,
+                                     mode='lines', line=dict(color=color, width=2, shape='hv')),
+                          row=1, col=1)
+
+    for battery, part in soc.groupby('蓄電池名', sort=True):
+        fig.add_trace(go.Scatter(x=part['時刻'], y=part['SOC'], name=f'{battery} SOC',
+                                 mode='lines',
+                                 line=dict(color=BATTERY_COLORS.get(battery), width=1)),
+                      row=2, col=1)
+
+    fig.update_xaxes(range=[day, day + pd.Timedelta(days=1)])
+    fig.update_yaxes(title_text='計画値 (kW)', row=1, col=1)
+    fig.update_yaxes(title_text='SOC (%)', range=[0, 100], row=2, col=1)
+    fig.update_layout(title=f'荒尾発電所 {day:%Y-%m-%d}', height=800, width=1400,
+                      hovermode='x unified', template='plotly_white')
+    return fig
+
+
+def kotohira_day_figure(day, frames):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    data = frames['data']
+    fig = make_subplots(specs=[[{'secondary_y': True}]])
+    fig.add_trace(go.Scatter(x=data['timestamp'], y=data['battery_soc_percent'],
+                             mode='lines', name='SOC (%)', line=dict(color='blue', width=1)),
+                  secondary_y=False)
+    fig.add_trace(go.Scatter(x=data['timestamp'], y=data['actual_power_kw'],
+                             mode='lines', name='実績値kW',
+                             line=dict(color='rgba(255, 100, 100, 0.5)', width=1)),
+                  secondary_y=True)
+    fig.add_trace(go.Scatter(x=data['timestamp'], y=data['demand_plan_kw_baseline'],
+                             mode='lines', name='需要計画kW (基準値)',
+                             line=dict(color='green', width=3, dash='dash', shape='hv')),
+                  secondary_y=True)
+
+    fig.update_xaxes(range=[day, day + pd.Timedelta(days=1)])
+    fig.update_yaxes(title_text='SOC (%)', range=[0, 100], secondary_y=False)
+    fig.update_yaxes(title_text='電力 (kW)', secondary_y=True)
+    fig.update_layout(title=f'琴平 {day:%Y-%m-%d}', height=700, width=1400,
+                      hovermode='x unified', plot_bgcolor='white')
+    return fig
+
+
+SITES = {
+    'arao': (load_arao, arao_day_figure),
+    'kotohira': (load_kotohira, kotohira_day_figure),
+}
+
+
+# ============================================================================
+# 並列出力
+# ============================================================================
+
+def _init_worker(use_kaleido):
+    """ワーカー起動時に Kaleido を1回だけ立ち上げる（以降の write_image で再利用）"""
+    if not use_kaleido:
+        return
+    try:
+        import kaleido
+        if hasattr(kaleido, 'start_sync_server'):  # Kaleido v1
+            kaleido.start_sync_server(silence_warnings=True)
+            return
+    except ImportError:
+        return
+    import plotly.io as pio
+    scope = getattr(getattr(pio, 'kaleido', None), 'scope', None)  # Kaleido v0.2
+    if scope is not None:
+        scope.mathjax = None
+        pio.to_image({'data': []}, format='png')  # Kaleido プロセスを起動しておく
+
+
+def _render_day(task):
+    """1日分を出力（ワーカーで実行）"""
+    site, day, frames, paths = task
+    fig = SITES[site][1](day, frames)
+    for fmt, path in paths.items():
+        tmp_path = f'{path}.tmp'
+        if fmt == 'html':
+            fig.write_html(tmp_path, include_plotlyjs='cdn')
+        else:
+            fig.write_image(tmp_path, format=fmt)
+        os.replace(tmp_path, path)
+    return day
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_daily_reports(site, output_dir=OUTPUT_DIR, formats=('html',), workers=None,
+                         force=False, days=None):
+    """
+    全期間の日別レポートを並列に出力する
+
+    Args:
+        site: 'arao' または 'kotohira'
+        output_dir: 出力ディレクトリ（<output_dir>/<site>/<日付>.<形式>）
+        formats: 'html', 'png', 'svg', 'pdf' など
+        workers: プロセス数（None = CPU数）
+        force: True ならハッシュに関係なく全日を出力
+        days: 対象日のリスト（None = 全期間）
+
+    Returns:
+        dict: 'rendered', 'skipped', 'failed'（日付のリスト）, 'elapsed'
+    """
+    t0 = time.perf_counter()
+    load, _ = SITES[site]
+    site_dir = os.path.join(output_dir, site)
+    os.makedirs(site_dir, exist_ok=True)
+    manifest_path = os.path.join(site_dir, MANIFEST_FILE)
+    manifest = _load_manifest(manifest_path)
+
+    by_day = split_days(load())
+    if days is not None:
+        wanted = {pd.Timestamp(d).normalize() for d in days}
+        by_day = {day: frames for day, frames in by_day.items() if day in wanted}
+
+    tasks, hashes, skipped = [], {}, []
+    for day, frames in by_day.items():
+        key = f'{day:%Y-%m-%d}'
+        paths = {fmt: os.path.join(site_dir, f'{key}.{fmt}') for fmt in formats}
+        digest = day_hash(frames, formats)
+        if (not force and manifest.get(key) == digest and
+                all(os.path.exists(path) for path in paths.values())):
+            skipped.append(day)
+            continue
+        hashes[key] = digest
+        tasks.append((site, day, frames, paths))
+
+    rendered, failed = [], []
+    if tasks:
+        use_kaleido = any(fmt != 'html' for fmt in formats)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(use_kaleido,)) as pool:
+                futures = {pool.submit(_render_day, task): task[1] for task in tasks}
+                for future in as_completed(futures):
+                    day = futures[future]
+                    key = f'{day:%Y-%m-%d}'
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # 失敗した日は manifest に記録せず、次回また出力する
+                        print(f"⚠️ {site} {key} の出力に失敗: {type(e).__name__}: {e}")
+                        failed.append(day)
+                        continue
+                    manifest[key] = hashes[key]
+                    rendered.append(day)
+                    # 途中で止まっても出力済みの日は次回スキップできるように随時保存
+                    if len(rendered) % 50 == 0:
+                        _save_manifest(manifest_path, manifest)
+        finally:
+            _save_manifest(manifest_path, manifest)
+
+    return {'rendered': sorted(rendered), 'skipped': skipped, 'failed': sorted(failed),
+            'elapsed': time.perf_counter() - t0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='日別レポートの並列一括出力')
+    parser.add_argument('site', choices=sorted(SITES))
+    parser.add_argument('--format', nargs='+', default=['html'], dest='formats')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--force', action='store_true', help='変更がない日も出力する')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"日別レポート一括出力: {args.site}")
+    print("=" * 70)
+
+    result = render_daily_reports(args.site, output_dir=args.output_dir,
+                                  formats=args.formats, workers=args.workers,
+                                  force=args.force)
+    print(f"\n出力: {len(result['rendered'])} 日, スキップ(変更なし): {len(result['skipped'])} 日")
+    if result['failed']:
+        print(f"失敗: {', '.join(f'{d:%Y-%m-%d}' for d in result['failed'])}")
+    print(f"所要時間: {result['elapsed']:.1f} 秒")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ĐÁNH GIÁ HÀNG LOẠT PATTERN 基準値 (VECTORIZED)
+
+Thay cho vòng lặp `for b in blocks` của check_pattern trong
+exhaustive_search.py / search_flexible_jepx.py / find_better_pattern.py:
+- Input: mảng NumPy (N, blocks) các pattern 基準値 (kW)
+- Output: SOC trajectory, mask hợp lệ, ΔSOC JEPX, Σ基準値 trong 1 lần tính
+  (cumsum theo trục block, so sánh với SOC_MIN/SOC_MAX)
+"""
+
+import numpy as np
+
+from soc_model import INTERCEPT, SLOPE, delta_soc
+
+# Giới hạn SOC
+SOC_MIN = 5.0
+SOC_MAX = 90.0
+
+BLOCK_HOURS = 3.0
+
+
+def evaluate_patterns(patterns, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                      jepx_delta=None, soc_end=None, end_tolerance=0.5,
+                      bound_tolerance=0.0, block_hours=BLOCK_HOURS,
+                      slope=SLOPE, intercept=INTERCEPT):
+    """
+    Đánh giá N pattern cùng lúc
+
+    Args:
+        patterns: array (N, blocks) hoặc (blocks,) các giá trị 基準値 (kW)
+        soc_start: SOC ban đầu (%)
+        soc_min, soc_max: giới hạn SOC cho mọi block (%)
+        jepx_delta: ΔSOC cố định của JEPX (%), ví dụ -85.0.
+            None = JEPX linh hoạt, xả từ bất kỳ mức nào về soc_min
+        soc_end: SOC bắt buộc sau JEPX (%). Mặc định = soc_min khi có jepx_delta
+        end_tolerance: sai số cho phép của SOC cuối chu kỳ (%)
+        bound_tolerance: sai số cho phép khi so với soc_min/soc_max (%)
+        block_hours: số giờ mỗi block
+
+    Returns:
+        dict:
+            'soc': array (N, blocks + 1) SOC trajectory (cột 0 = soc_start)
+            'feasible': mask bool (N,)
+            'jepx_delta': array (N,) ΔSOC của JEPX
+            'soc_after_jepx': array (N,) SOC sau JEPX
+            'total': array (N,) Σ基準値
+    """
+    patterns = np.asarray(patterns, dtype=np.float64)
+    if patterns.ndim == 1:
+        patterns = patterns[np.newaxis, :]
+
+    n_patterns, n_blocks = patterns.shape
+
+    # ΔSOC từng block → cumsum = SOC sau mỗi block
+    delta = delta_soc(patterns, block_hours, slope=slope, intercept=intercept)
+    soc = np.empty((n_patterns, n_blocks + 1))
+    soc[:, 0] = soc_start
+    np.cumsum(delta, axis=1, out=soc[:, 1:])
+    soc[:, 1:] += soc_start
+
+    # Kiểm tra SOC ∈ [soc_min, soc_max] cho mọi block
+    after_blocks = soc[:, 1:]
+    feasible = ((after_blocks.max(axis=1) <= soc_max + bound_tolerance) &
+                (after_blocks.min(axis=1) >= soc_min - bound_tolerance))
+
+    soc_final = soc[:, -1]
+    if jepx_delta is None:
+        # JEPX xả về soc_min từ bất kỳ mức nào
+        jepx = soc_min - soc_final
+        soc_after_jepx = np.full(n_patterns, soc_min)
+        if soc_end is not None:
+            feasible &= np.abs(soc_after_jepx - soc_end) <= end_tolerance
+    else:
+        jepx = np.full(n_patterns, float(jepx_delta))
+        soc_after_jepx = soc_final + jepx_delta
+        target = soc_min if soc_end is None else soc_end
+        feasible &= np.abs(soc_after_jepx - target) <= end_tolerance
+
+    return {
+        'soc': soc,
+        'feasible': feasible,
+        'jepx_delta': jepx,
+        'soc_after_jepx': soc_after_jepx,
+        'total': patterns.sum(axis=1),
+    }
+
+
+def grid_patterns(values, n_blocks, start=0, stop=None):
+    """
+    Sinh các pattern thứ start..stop-1 của lưới values^n_blocks (thứ tự itertools.product)
+
+    Returns:
+        array (stop - start, n_blocks)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_values = len(values)
+    if stop is None:
+        stop = n_values ** n_blocks
+
+    index = np.arange(start, stop, dtype=np.int64)
+    digits = np.empty((len(index), n_blocks), dtype=np.int64)
+    for k in range(n_blocks - 1, -1, -1):
+        index, digits[:, k] = np.divmod(index, n_values)
+
+    return values[digits]
+
+
+def search_grid(values, n_blocks=7, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                jepx_delta=None, soc_end=None, end_tolerance=0.5,
+                bound_tolerance=0.0, block_hours=BLOCK_HOURS,
+                slope=SLOPE, intercept=INTERCEPT):
+    """
+    Kiểm tra TOÀN BỘ lưới values^n_blocks (không dùng heuristic)
+
+    Mở rộng từng block một cho tất cả prefix cùng lúc (vectorized) và loại bỏ
+    prefix đã vi phạm SOC hoặc không thể đạt SOC cuối chu kỳ. Mọi pattern bị
+    loại đều chắc chắn không hợp lệ, nên kết quả giống hệt việc gọi
+    evaluate_patterns trên cả lưới nhưng nhanh hơn nhiều lần.
+
+    Args:
+        values: các mức 基準値 cho phép (kW)
+        n_blocks: số block
+        (các tham số khác giống evaluate_patterns)
+
+    Returns:
+        dict:
+            'best_pattern': array (n_blocks,) hoặc None
+            'best_total': Σ基準値 lớn nhất
+            'best_soc': SOC trajectory của pattern tốt nhất
+            'n_evaluated': số pattern của lưới (values^n_blocks)
+            'n_expanded': số prefix thực sự được tính
+            'n_feasible': số pattern hợp lệ
+    """
+    values = np.asarray(values, dtype=np.float64)
+    delta = delta_soc(values, block_hours, slope=slope, intercept=intercept)
+
+    # Khoảng SOC cuối (trước JEPX) hợp lệ
+    if jepx_delta is None:
+        end_lo, end_hi = -np.inf, np.inf
+        if soc_end is not None and abs(soc_min - soc_end) > end_tolerance:
+            end_lo, end_hi = np.inf, -np.inf
+    else:
+        target = soc_min if soc_end is None else soc_end
+        end_lo = target - jepx_delta - end_tolerance
+        end_hi = target - jepx_delta + end_tolerance
+
+    soc = np.array([float(soc_start)])
+    total = np.array([0.0])
+    parents = []
+    choices = []
+    n_expanded = 0
+
+    for k in range(n_blocks):
+        remaining = n_blocks - k - 1
+        soc_next = (soc[:, np.newaxis] + delta[np.newaxis, :]).ravel()
+        n_expanded += len(soc_next)
+
+        keep = ((soc_next <= soc_max + bound_tolerance) &
+                (soc_next >= soc_min - bound_tolerance) &
+                (soc_next + remaining * delta.max() >= end_lo) &
+                (soc_next + remaining * delta.min() <= end_hi))
+        index = np.flatnonzero(keep)
+
+        parent, choice = np.divmod(index, len(values))
+        soc = soc_next[index]
+        total = total[parent] + values[choice]
+        parents.append(parent)
+        choices.append(choice)
+
+        if len(index) == 0:
+            break
+
+    n_feasible = len(soc) if len(parents) == n_blocks else 0
+    best_pattern = None
+    best_total = None
+    best_soc = None
+
+    if n_feasible > 0:
+        i = int(np.argmax(total))
+        digits = np.empty(n_blocks, dtype=np.int64)
+        for k in range(n_blocks - 1, -1, -1):
+            digits[k] = choices[k][i]
+            i = parents[k][i]
+        best_pattern = values[digits]
+        best_total = float(best_pattern.sum())
+        best_soc = np.concatenate([[soc_start], soc_start + np.cumsum(delta[digits])])
+
+    return {
+        'best_pattern': best_pattern,
+        'best_total': best_total,
+        'best_soc': best_soc,
+        'n_evaluated': len(values) ** n_blocks,
+        'n_expanded': n_expanded,
+        'n_feasible': n_feasible,
+    }
+
+
+if __name__ == '__main__':
+    import time
+
+    print("=" * 80)
+    print("⚡ BATCH PATTERN EVALUATOR")
+    print("=" * 80)
+
+    rng = np.random.default_rng(42)
+    patterns = rng.integers(0, 21, size=(2_000_000, 7)) * 100.0
+
+    t0 = time.perf_counter()
+    result = evaluate_patterns(patterns, jepx_delta=-85.0)
+    elapsed = time.perf_counter() - t0
+
+    print(f"\nĐánh giá {len(patterns):,} patterns: {elapsed*1000:.0f} ms "
+          f"({len(patterns)/elapsed/1e6:.1f} triệu patterns/giây)")
+    print(f"Hợp lệ: {result['feasible'].sum():,}")
+
+    # Pattern đều 7 × 507kW
+    uniform = evaluate_patterns([[507] * 7], jepx_delta=-85.0)
+    print(f"\nPattern đều [507]*7: hợp lệ={uniform['feasible'][0]}, "
+          f"SOC cuối={uniform['soc'][0, -1]:.2f}%")
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK CÁC PHƯƠNG PHÁP TÌM LỊCH 基準値
+
+Chạy mọi phương pháp trên cùng 1 ma trận kịch bản
+(giới hạn SOC × JEPX −75/−85 × block tham gia) và ghi lại:
+- Thời gian chạy (tốt nhất trong N lần)
+- Bộ nhớ đỉnh Python/NumPy (tracemalloc, chạy riêng để không ảnh hưởng thời gian;
+  không tính bộ nhớ bên trong HiGHS)
+- Số ứng viên đã đánh giá
+- Khoảng cách tới tối ưu chính xác (LP liên tục, cùng ràng buộc).
+  Pattern vượt giới hạn SOC (dù rất ít) bị tính là không khả thi, không có gap
+Kết quả ghi ra JSON; --compare so sánh với báo cáo cũ để thấy regression.
+
+Các script cũ không nhận tham số (search_flexible_jepx, find_better_pattern,
+exhaustive_search, optimal_block12_allow_below5) được chạy nguyên trạng bằng
+--scripts, chỉ đo thời gian và bộ nhớ đỉnh của tiến trình.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import scipy
+from scipy.optimize import minimize
+
+from batch_pattern_evaluator import search_grid
+from dp_solver import SOC_TOLERANCE, soc_violation, solve_dp
+from lp_scheduler import optimize_schedule
+from soc_model import BLOCK_HOURS, INTERCEPT, SLOPE, delta_soc
+
+BASELINE_MAX = 2000
+N_BLOCKS = 7  # block 1..7 có 基準値, block 8 = JEPX
+
+# Sai số cho phép của SOC cuối (giống soc_end của các solver, %).
+# Giới hạn SOC của từng block không có sai số (chỉ SOC_TOLERANCE của float).
+END_TOLERANCE = 0.5
+
+LEGACY_SCRIPTS = [
+    'search_flexible_jepx.py',
+    'find_better_pattern.py',
+    'exhaustive_search.py',
+    'optimal_block12_allow_below5.py',
+]
+
+
+def build_scenarios():
+    """
+    Ma trận kịch bản
+
+    SOC ban đầu = SOC sau JEPX = soc_max + jepx_delta (lặp lại hàng ngày).
+    Block không tham gia có 基準値 = 0 và được phép xuống dưới soc_min
+    (giống optimal_block12_allow_below5.py).
+    """
+    scenarios = []
+    for soc_min, soc_max in [(5.0, 90.0), (10.0, 90.0)]:
+        for jepx_delta in [-75.0, -85.0]:
+            for name, participating in [('all', range(1, 8)), ('no12', range(3, 8))]:
+                soc_cycle = soc_max + jepx_delta
+                scenarios.append({
+                    'name': f'soc{soc_min:g}-{soc_max:g}_jepx{jepx_delta:g}_{name}',
+                    'soc_min': soc_min,
+                    'soc_max': soc_max,
+                    'jepx_delta': jepx_delta,
+                    'participating': list(participating),
+                    'soc_start': soc_cycle,
+                    'soc_end': soc_cycle,
+                })
+    return scenarios
+
+
+def _block_bounds(scenario):
+    """Giới hạn SOC sau block 1..7 (block không tham gia: không có cận dưới)"""
+    active = np.isin(np.arange(1, N_BLOCKS + 1), scenario['participating'])
+    soc_min = np.where(active, scenario['soc_min'], -np.inf)
+    soc_max = np.full(N_BLOCKS, scenario['soc_max'])
+    return active, soc_min, soc_max
+
+
+def check_pattern(scenario, pattern):
+    """Kiểm tra lại 1 pattern bằng công thức liên tục → (feasible, total)"""
+    if pattern is None:
+        return False, None
+    pattern = np.asarray(pattern, dtype=np.float64)
+    active, soc_min, soc_max = _block_bounds(scenario)
+
+    soc = scenario['soc_start'] + np.concatenate([[0.0], np.cumsum(delta_soc(pattern))])
+    violation = soc_violation(soc, soc_min, soc_max, soc_end=scenario['soc_end'],
+                              jepx_delta=scenario['jepx_delta'], end_tolerance=END_TOLERANCE)
+
+    feasible = bool(
+        np.all(pattern[~active] == 0) and
+        np.all((pattern >= 0) & (pattern <= BASELINE_MAX)) and
+        violation <= SOC_TOLERANCE  # chỉ là sai số float, không nới giới hạn
+    )
+    return feasible, float(pattern.sum())
+
+
+# ============================================================================
+# CÁC PHƯƠNG PHÁP
+# Mỗi hàm nhận scenario, trả về {'pattern': array (7,) hoặc None, 'n_evaluated': int}
+# ============================================================================
+
+def run_lp(scenario, baseline_step=None):
+    """LP liên tục (tối ưu chính xác) hoặc MILP theo bước baseline_step"""
+    active, soc_min, soc_max = _block_bounds(scenario)
+    idle = {b: INTERCEPT * BLOCK_HOURS for b in range(1, N_BLOCKS + 1) if not active[b - 1]}
+    result = optimize_schedule(
+        soc_start=scenario['soc_start'],
+        soc_min=list(soc_min) + [-np.inf],
+        soc_max=list(soc_max) + [np.inf],
+        soc_end=scenario['soc_end'], end_tolerance=END_TOLERANCE,
+        n_blocks=N_BLOCKS + 1, participating=scenario['participating'],
+        jepx_blocks={N_BLOCKS + 1: scenario['jepx_delta']}, idle_delta=idle,
+        baseline_step=baseline_step,
+    )
+    pattern = result['baselines'][:N_BLOCKS] if result['success'] else None
+    return {'pattern': pattern, 'n_evaluated': None}
+
+
+def run_milp_100(scenario):
+    return run_lp(scenario, baseline_step=100)
+
+
+def run_dp(scenario):
+    """DP trên lưới SOC 0.1%, 基準値 bước 1kW"""
+    active, soc_min, soc_max = _block_bounds(scenario)
+    result = solve_dp(n_blocks=N_BLOCKS, soc_start=scenario['soc_start'],
+                      soc_min=np.maximum(soc_min, -100.0), soc_max=soc_max,
+                      participating=active, jepx_delta=scenario['jepx_delta'],
+                      soc_end=scenario['soc_end'], end_tolerance=END_TOLERANCE)
+    n_states = len(result['soc_grid'])
+    n_levels = BASELINE_MAX + 1
+    return {'pattern': result['pattern'],
+            'n_evaluated': int(n_states * (n_levels * active.sum() + (~active).sum()))}
+
+
+def run_grid_search(scenario):
+    """Duyệt toàn bộ lưới bước 100kW có cắt tỉa (chỉ khi mọi block tham gia)"""
+    if len(scenario['participating']) != N_BLOCKS:
+        return None
+    result = search_grid(range(0, BASELINE_MAX + 1, 100), n_blocks=N_BLOCKS,
+                         soc_start=scenario['soc_start'], soc_min=scenario['soc_min'],
+                         soc_max=scenario['soc_max'], jepx_delta=scenario['jepx_delta'],
+                         soc_end=scenario['soc_end'], end_tolerance=END_TOLERANCE)
+    return {'pattern': result['best_pattern'], 'n_evaluated': int(result['n_expanded'])}
+
+
+def run_itertools(scenario, step=400):
+    """Brute force itertools.product + vòng lặp Python (kiểu find_better_pattern)"""
+    active, soc_min, soc_max = _block_bounds(scenario)
+    options = range(0, BASELINE_MAX + 1, step)
+
+    best, best_total, n_evaluated = None, -1.0, 0
+    for values in itertools.product(options, repeat=int(active.sum())):
+        n_evaluated += 1
+        pattern = [0] * N_BLOCKS
+        for b, value in zip(scenario['participating'], values):
+            pattern[b - 1] = value
+
+        soc = scenario['soc_start']
+        ok = True
+        for k, b in enumerate(pattern):
+            soc += (SLOPE * b + INTERCEPT) * BLOCK_HOURS
+            if soc < soc_min[k] or soc > soc_max[k]:
+                ok = False
+                break
+        if not ok or abs(soc + scenario['jepx_delta'] - scenario['soc_end']) > END_TOLERANCE:
+            continue
+
+        total = sum(pattern)
+        if total > best_total:
+            best, best_total = pattern, total
+
+    return {'pattern': best, 'n_evaluated': n_evaluated}
+
+
+def run_charge_count(scenario):
+    """N block đầu sạc MAX, còn lại 0 (kiểu simple_maximize_baseline)"""
+    best, best_total, n_evaluated = None, -1.0, 0
+    for n_charge in range(len(scenario['participating']) + 1):
+        n_evaluated += 1
+        pattern = np.zeros(N_BLOCKS)
+        pattern[np.array(scenario['participating'][:n_charge], dtype=int) - 1] = BASELINE_MAX
+        feasible, total = check_pattern(scenario, pattern)
+        if feasible and total > best_total:
+            best, best_total = pattern, total
+    return {'pattern': best, 'n_evaluated': n_evaluated}
+
+
+def run_lbfgsb_penalty(scenario):
+    """L-BFGS-B với hàm phạt (kiểu maximize_baseline_optimizer)"""
+    active, soc_min, soc_max = _block_bounds(scenario)
+    alpha = 0.1
+
+    def objective(x):
+        pattern = np.where(active, x, 0.0)
+        soc = scenario['soc_start'] + np.cumsum(delta_soc(pattern))
+        end_penalty = (soc[-1] + scenario['jepx_delta'] - scenario['soc_end']) ** 2 * 1000
+        soc_penalty = (np.sum(np.maximum(soc - soc_max, 0) ** 2) +
+                       np.sum(np.maximum(soc_min - soc, 0) ** 2)) * 10000
+        return end_penalty + soc_penalty - alpha * pattern.sum()
+
+    x0 = np.full(N_BLOCKS, BASELINE_MAX / 4)
+    result = minimize(objective, x0, method='L-BFGS-B',
+                      bounds=[(0, BASELINE_MAX)] * N_BLOCKS, options={'maxiter': 1000})
+    return {'pattern': np.where(active, result.x, 0.0), 'n_evaluated': int(result.nfev)}
+
+
+METHODS = {
+    'lp': run_lp,
+    'milp_100': run_milp_100,
+    'dp': run_dp,
+    'grid_search_100': run_grid_search,
+    'itertools_400': run_itertools,
+    'charge_count': run_charge_count,
+    'lbfgsb_penalty': run_lbfgsb_penalty,
+}
+
+
+# ============================================================================
+# ĐO
+# ============================================================================
+
+def measure(method, scenario, repeat=3):
+    """Chạy 1 phương pháp: thời gian tốt nhất trong repeat lần + bộ nhớ đỉnh"""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        output = method(scenario)
+        times.append(time.perf_counter() - t0)
+    if output is None:
+        return None
+
+    tracemalloc.start()
+    method(scenario)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    feasible, total = check_pattern(scenario, output['pattern'])
+    pattern = output['pattern']
+    return {
+        'wall_time_s': min(times),
+        'peak_memory_bytes': peak,
+        'n_evaluated': output['n_evaluated'],
+        'feasible': feasible,
+        'total': total if feasible else None,
+        'pattern': None if pattern is None else [float(b) for b in pattern],
+    }
+
+
+def run_script(path):
+    """Chạy 1 script cũ trong tiến trình riêng → thời gian + bộ nhớ đỉnh (RSS)"""
+    t0 = time.perf_counter()
+    process = subprocess.Popen([sys.executable, path], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - t0
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        'wall_time_s': elapsed,
+        'peak_rss_bytes': usage.ru_maxrss * 1024,
+        'exit_code': process.returncode,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(methods=None, scenarios=None, repeat=3, scripts=False):
+    """
+    Chạy toàn bộ benchmark
+
+    Returns:
+        dict báo cáo (có thể ghi ra JSON)
+    """
+    methods = methods or list(METHODS)
+    scenarios = scenarios or build_scenarios()
+
+    results = []
+    for scenario in scenarios:
+        optimum = check_pattern(scenario, run_lp(scenario)['pattern'])[1]
+        for name in methods:
+            row = measure(METHODS[name], scenario, repeat=repeat)
+            if row is None:
+                continue
+            row['gap'] = (None if row['total'] is None or not optimum
+                          else (optimum - row['total']) / optimum)
+            row.update({'scenario': scenario['name'], 'method': name, 'optimum': optimum})
+            results.append(row)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'repeat': repeat,
+        'scenarios': scenarios,
+        'results': results,
+    }
+    if scripts:
+        report['scripts'] = {path: run_script(path) for path in LEGACY_SCRIPTS
+                             if os.path.exists(path)}
+    return report
+
+
+def compare_reports(old, new):
+    """So sánh 2 báo cáo → list (scenario, method, tỉ lệ thời gian, gap cũ, gap mới)"""
+    previous = {(r['scenario'], r['method']): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        o = previous.get((r['scenario'], r['method']))
+        if o is None:
+            continue
+        ratio = r['wall_time_s'] / o['wall_time_s'] if o['wall_time_s'] > 0 else None
+        rows.append((r['scenario'], r['method'], ratio, o['gap'], r['gap']))
+    return rows
+
+
+def _fmt_gap(gap):
+    return f'{"—":>11}' if gap is None else f'{gap * 100:10.3f}%'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark các phương pháp tìm lịch 基準値')
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--methods', nargs='+', choices=list(METHODS))
+    parser.add_argument('--scripts', action='store_true', help='chạy cả các script cũ')
+    parser.add_argument('--compare', help='báo cáo JSON cũ để so sánh')
+    args = parser.parse_args()
+
+    print('=' * 100)
+    print('⏱️  BENCHMARK CÁC PHƯƠNG PHÁP TÌM LỊCH 基準値')
+    print('=' * 100)
+
+    report = run_benchmark(methods=args.methods, repeat=args.repeat, scripts=args.scripts)
+
+    current = None
+    for r in report['results']:
+        if r['scenario'] != current:
+            current = r['scenario']
+            optimum = '—' if r['optimum'] is None else f"{r['optimum']:.1f}kW"
+            print(f'\n📋 {current}  (tối ưu LP: {optimum})')
+            print(f"   {'Phương pháp':<18}{'Thời gian':>12}{'Bộ nhớ':>12}{'Ứng viên':>14}"
+                  f"{'Σ基準値':>12}{'Gap':>12}")
+        evaluated = '—' if r['n_evaluated'] is None else f"{r['n_evaluated']:,}"
+        total = '❌' if r['total'] is None else f"{r['total']:.0f}"
+        print(f"   {r['method']:<18}{r['wall_time_s'] * 1000:>10.1f}ms"
+              f"{r['peak_memory_bytes'] / 1e6:>10.1f}MB{evaluated:>14}{total:>12}"
+              f"{_fmt_gap(r['gap']):>12}")
+
+    for path, r in report.get('scripts', {}).items():
+        print(f"\n📜 {path}: {r['wall_time_s']:.2f}s, RSS {r['peak_rss_bytes'] / 1e6:.0f}MB, "
+              f"exit {r['exit_code']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'\n✅ Đã lưu: {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = json.load(f)
+        print(f'\n📊 So sánh với {args.compare}')
+        for scenario, method, ratio, old_gap, new_gap in compare_reports(old, report):
+            flag = '⚠️' if (ratio or 0) > 1.2 or (new_gap or 0) > (old_gap or 0) + 1e-9 else '  '
+            ratio_text = '—' if ratio is None else f'{ratio:.2f}×'
+            print(f'   {flag} {scenario:<32}{method:<18}{ratio_text:>8}'
+                  f'{_fmt_gap(old_gap)}{_fmt_gap(new_gap)}')
@@ -0,0 +1,84 @@
+"""
+ブロック1~8の背景色（1トレース版）
+
+1日8ブロック × 日数 × サブプロット数の矩形 shape を作る代わりに、
+全期間の3時間ビンを1本の Heatmap トレース（z = ブロック番号）で描く。
+Plotly オブジェクト数は期間に関係なくサブプロットごとに1つなので、
+描画・HTML書き出し時間は数年分でもほぼ一定になる。
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+BLOCK_HOURS = 3
+N_BLOCKS = 8
+
+# ブロック別の色
+BLOCK_COLORS = {
+    1: 'rgba(255, 0, 0, 0.6)',      # 赤（0:00-3:00）
+    2: 'rgba(255, 165, 0, 0.6)',    # オレンジ（3:00-6:00）
+    3: 'rgba(255, 255, 0, 0.6)',    # 黄色（6:00-9:00）
+    4: 'rgba(0, 255, 0, 0.6)',      # 緑（9:00-12:00）
+    5: 'rgba(0, 255, 255, 0.6)',    # シアン（12:00-15:00）
+    6: 'rgba(0, 0, 255, 0.6)',      # 青（15:00-18:00）
+    7: 'rgba(148, 0, 211, 0.6)',    # 紫（18:00-21:00）
+    8: 'rgba(255, 20, 147, 0.6)',   # ピンク（21:00-24:00）
+}
+
+
+def block_bins(start_date, end_date):
+    """
+    start_date 0:00 〜 end_date 24:00 の3時間ビン
+
+    Returns:
+        (edges, blocks): ビン境界 (n+1,) とブロック番号 (n,)
+    """
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+    edges = pd.date_range(start, end, freq=f'{BLOCK_HOURS}h')
+    blocks = np.arange(len(edges) - 1) % N_BLOCKS + 1
+    return edges, blocks
+
+
+def _discrete_colorscale(colors):
+    """ブロック番号 1..8 → 色 の階段状カラースケール"""
+    scale = []
+    for i in range(N_BLOCKS):
+        color = colors[i + 1]
+        scale.append([i / N_BLOCKS, color])
+        scale.append([(i + 1) / N_BLOCKS, color])
+    return scale
+
+
+def add_block_shading(fig, start_date, end_date, y0, y1, opacity=0.15,
+                      colors=BLOCK_COLORS, row=None, col=None):
+    """
+    期間全体のブロック背景を1トレースで追加する
+
+    線より下に描くため、他のトレースより先に追加すること。
+
+    Args:
+        fig: Plotly Figure
+        start_date, end_date: 期間（日付）
+        y0, y1: 背景の縦範囲
+        opacity: 不透明度
+        colors: ブロック番号 → 色
+        row, col: サブプロット
+    """
+    edges, blocks = block_bins(start_date, end_date)
+    fig.add_trace(
+        go.Heatmap(
+            x=edges,
+            y=[y0, y1],
+            z=blocks[np.newaxis, :],
+            zmin=0.5,
+            zmax=N_BLOCKS + 0.5,
+            colorscale=_discrete_colorscale(colors),
+            opacity=opacity,
+            showscale=False,
+            hoverinfo='skip',
+            showlegend=False,
+        ),
+        row=row, col=col
+    )
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LỊCH 基準値 VỚI RÀNG BUỘC XÁC SUẤT (CHANCE-CONSTRAINED)
+
+    max Σ基準値   s.t.   P(SOC ∉ [soc_min, soc_max] tại ít nhất 1 block) ≤ ε
+
+Thay vì lập lịch sát 5% / 90%, mỗi block được thu hẹp giới hạn SOC bằng
+biên (margin) lấy từ phân vị thực nghiệm của residual:
+- Residual ΔSOC theo block 3 giờ, theo (block trong ngày × mức 基準値), từ
+  kotohira_integrated_data.csv (琴平), so với đúng mô hình tuyến tính mà LP
+  dùng. 荒尾 (arao_nijisanji_soc_data.csv) không dùng được: 計画値 toàn số âm,
+  hệ số hồi quy theo 計画値 không cùng nghĩa với SLOPE / INTERCEPT của 基準値
+- ε chia đều cho các ràng buộc 1 phía (Bonferroni) → phân vị α mỗi ràng buộc
+- Biên sau block k cho tổng nhiễu tích lũy: Σμ ± sqrt(Σ (q_α − μ)²)
+  (chính xác khi nhiễu chuẩn, gần đúng theo CLT trong trường hợp khác);
+  |q_α − μ| không nhỏ hơn z_α × σ của ô, vì với α nhỏ phân vị thực nghiệm chỉ
+  là min/max của mẫu
+
+Bảng residual được tính 1 lần và cache ra soc_margin_table_<site>.npz (tự
+tính lại khi CSV nguồn hoặc hệ số mô hình thay đổi). Lúc giải chỉ tra bảng (vài µs) rồi gọi cùng LP của lp_scheduler;
+mức 基準値 phụ thuộc nghiệm nên lặp: giải với biên của mức xấu nhất (luôn an
+toàn), rồi với biên theo mức của nghiệm, nhận nghiệm khi biên của chính nó không
+lớn hơn biên đã dùng (thường 3 lần LP). Khi giải lặp lại (từng ngày, quét
+kịch bản), warm_start = kết quả trước → thường chỉ 1 lần LP.
+
+    python chance_constrained.py --epsilon 0.05
+    python chance_constrained.py --model kotohira/v1 --epsilon 0.1
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+import soc_model
+from lp_scheduler import SOC_MAX, SOC_MIN, build_schedule_problem, solve_schedule
+from soc_risk import LEVEL_EDGES, N_BLOCKS, bucket_residuals, violation_probability
+
+KOTOHIRA_CSV = 'kotohira_integrated_data.csv'
+MARGIN_TABLE = 'soc_margin_table_{site}.npz'
+TABLE_VERSION = 1
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+EPSILON = 0.05
+
+
+# ============================================================================
+# RESIDUAL TỪ DỮ LIỆU THỰC TẾ
+# ============================================================================
+
+def kotohira_block_residuals(model=None, path=KOTOHIRA_CSV):
+    """
+    Residual ΔSOC theo block 3 giờ của 琴平 (SOC thực đo, 基準値 thực tế)
+
+    Returns:
+        (residuals, baselines, blocks): array (M,)
+    """
+    from historical_backtest import block_table
+
+    data = pd.read_csv(path, usecols=['timestamp', 'battery_soc_percent',
+                                      'demand_plan_kw_baseline'])
+    table = block_table(data['timestamp'], data['battery_soc_percent'],
+                        data['timestamp'], data['demand_plan_kw_baseline'])
+    n_days, n_blocks = table['baseline'].shape
+    delta = table['soc'][:, 1:] - table['soc'][:, :-1]
+    residuals = delta - soc_model.delta_soc(table['baseline'], BLOCK_HOURS, model)
+    blocks = np.broadcast_to(np.arange(n_blocks), (n_days, n_blocks))
+    return residuals.ravel(), table['baseline'].ravel(), blocks.ravel()
+
+
+SOURCES = {
+    'kotohira': (KOTOHIRA_CSV, kotohira_block_residuals),
+}
+
+
+def _signature(site, model=None):
+    stat = os.stat(SOURCES[site][0])
+    slope, intercept = soc_model._coefficients(model)
+    return json.dumps({'version': TABLE_VERSION, 'site': site, 'mtime_ns': stat.st_mtime_ns,
+                       'size': stat.st_size, 'slope': float(slope),
+                       'intercept': float(intercept)})
+
+
+# ============================================================================
+# BẢNG BIÊN (CACHE)
+# ============================================================================
+
+def build_margin_table(site='kotohira', model=None, level_edges=LEVEL_EDGES):
+    """
+    Bảng residual của 1 site
+
+    Returns:
+        dict bảng residual của soc_risk (values tăng dần trong mỗi ô) thêm:
+            'mean', 'std': array (n_blocks, n_levels) trung bình / độ lệch chuẩn của ô
+            'signature': JSON phiên bản bảng, site, mtime/size của CSV nguồn, hệ số mô hình
+    """
+    residuals, baselines, blocks = SOURCES[site][1](model=model)
+    table = bucket_residuals(residuals, baselines, blocks, BLOCK_HOURS, model,
+                             level_edges=level_edges, n_blocks=N_BLOCKS)
+    ends = table['start'] + table['count']
+    sums = np.concatenate([[0.0], np.cumsum(table['values'])])
+    squares = np.concatenate([[0.0], np.cumsum(table['values'] ** 2)])
+    table['mean'] = (sums[ends] - sums[table['start']]) / table['count']
+    variance = (squares[ends] - squares[table['start']]) / table['count'] - table['mean'] ** 2
+    table['std'] = np.sqrt(np.maximum(variance, 0.0))
+    table['signature'] = np.array(_signature(site, model))
+    return table
+
+
+def load_margin_table(site='kotohira', path=None, rebuild=False, model=None):
+    """Đọc bảng biên từ cache, tính lại khi chưa có, CSV nguồn hoặc hệ số mô hình đã thay đổi"""
+    path = path or MARGIN_TABLE.format(site=site)
+    if not rebuild and os.path.exists(path):
+        with np.load(path) as data:
+            table = {key: data[key] for key in data.files}
+        if str(table['signature']) == _signature(site, model):
+            for key in ('hours', 'slope', 'intercept'):
+                table[key] = float(table[key])
+            return table
+
+    table = build_margin_table(site, model)
+    np.savez_compressed(path, **table)
+    return table
+
+
+def _cell_deviations(table, block, level, alpha):
+    """
+    Trung bình và độ lệch phân vị α / 1 − α so với trung bình của các ô
+
+    Khi α × số residual < 1 phân vị thực nghiệm chỉ là min/max của mẫu, nên
+    độ lệch được chặn dưới bởi xấp xỉ chuẩn z_α × σ của ô.
+    """
+    start = table['start'][block, level]
+    last = table['count'][block, level] - 1
+    mean = table['mean'][block, level]
+    gaussian = norm.ppf(1 - alpha) * table['std'][block, level]
+    q_low = table['values'][start + np.floor(alpha * last).astype(np.int64)]
+    q_high = table['values'][start + np.ceil((1 - alpha) * last).astype(np.int64)]
+    return mean, np.maximum(mean - q_low, gaussian), np.maximum(q_high - mean, gaussian)
+
+
+def block_margins(table, baselines, alpha, first_block=0):
+    """
+    Biên SOC sau từng block cho 1 pattern
+
+    Args:
+        table: bảng biên (load_margin_table)
+        baselines: array (n,) 基準値 từng block (0 = không tham gia)
+        alpha: xác suất vi phạm cho phép của mỗi ràng buộc 1 phía
+
+    Returns:
+        (lower, upper): array (n,) ≥ 0, cộng vào soc_min / trừ khỏi soc_max
+    """
+    baselines = np.asarray(baselines, dtype=np.float64)
+    block = (first_block + np.arange(len(baselines))) % table['start'].shape[0]
+    level = np.digitize(baselines, table['level_edges'])
+    mean, low, high = _cell_deviations(table, block, level, alpha)
+
+    drift = np.cumsum(mean)
+    lower = np.sqrt(np.cumsum(low ** 2)) - drift
+    upper = np.sqrt(np.cumsum(high ** 2)) + drift
+    return np.maximum(lower, 0.0), np.maximum(upper, 0.0)
+
+
+def worst_margins(table, n_blocks, alpha, first_block=0):
+    """Biên lớn nhất trên mọi tổ hợp mức 基準値 (chặn trên, không phụ thuộc nghiệm)"""
+    block = (first_block + np.arange(n_blocks)) % table['start'].shape[0]
+    levels = np.arange(table['start'].shape[1])[:, np.newaxis]
+    mean, low, high = _cell_deviations(table, block[np.newaxis, :], levels, alpha)
+
+    lower = np.sqrt(np.cumsum(low.max(axis=0) ** 2)) - np.cumsum(mean.min(axis=0))
+    upper = np.sqrt(np.cumsum(high.max(axis=0) ** 2)) + np.cumsum(mean.max(axis=0))
+    return np.maximum(lower, 0.0), np.maximum(upper, 0.0)
+
+
+# ============================================================================
+# GIẢI
+# ============================================================================
+
+def solve_chance_constrained(problem, table, epsilon=EPSILON, soc_start=SOC_MIN,
+                             soc_min=SOC_MIN, soc_max=SOC_MAX, soc_end=None,
+                             end_tolerance=0.0, first_block=0, warm_start=None,
+                             max_iter=4):
+    """
+    Giải lịch 基準値 với giới hạn SOC thu hẹp theo biên residual
+
+    Args:
+        problem: build_schedule_problem (lp_scheduler)
+        table: bảng biên (load_margin_table)
+        epsilon: P(vi phạm ít nhất 1 giới hạn) cho phép
+        soc_start, soc_min, soc_max, end_tolerance: như solve_schedule
+        soc_end: SOC cuối mục tiêu; được kéo vào trong giới hạn đã thu hẹp của
+            block cuối (ví dụ JEPX xả về 5% → về 5% + biên)
+        first_block: chỉ số block trong ngày của block 1
+        warm_start: kết quả của lần giải trước (bài toán / kịch bản gần giống);
+            biên của nó thường được nhận ngay → 1 lần LP như solve_schedule
+        max_iter: số lần giải LP tối đa (1 không có warm_start = chỉ biên xấu nhất)
+
+    Returns:
+        dict của solve_schedule thêm:
+            'margin_lower', 'margin_upper': array (n_blocks,) biên đã dùng
+            'alpha': xác suất cho mỗi ràng buộc 1 phía
+            'iterations': số lần giải LP
+    """
+    n_blocks = problem['n_blocks']
+    soc_min = np.broadcast_to(np.asarray(soc_min, dtype=np.float64), (n_blocks,))
+    soc_max = np.broadcast_to(np.asarray(soc_max, dtype=np.float64), (n_blocks,))
+    n_constraints = int(np.isfinite(soc_min).sum() + np.isfinite(soc_max).sum())
+    alpha = epsilon / max(n_constraints, 1)
+
+    def solve(lower, upper):
+        tight_min = soc_min + lower
+        tight_max = soc_max - upper
+        end = None if soc_end is None else float(np.clip(soc_end, tight_min[-1], tight_max[-1]))
+        return solve_schedule(problem, soc_start=soc_start, soc_min=tight_min,
+                              soc_max=tight_max, soc_end=end, end_tolerance=end_tolerance)
+
+    def accept(result, lower, upper, iteration):
+        return dict(result, margin_lower=lower, margin_upper=upper, alpha=alpha,
+                    iterations=iteration)
+
+    # Biên khởi đầu: của lần giải trước (warm start) hoặc của mức xấu nhất (luôn an toàn)
+    worst = warm_start is None
+    if worst:
+        lower, upper = worst_margins(table, n_blocks, alpha, first_block)
+    else:
+        lower, upper = warm_start['margin_lower'], warm_start['margin_upper']
+
+    best = None
+    for iteration in range(1, max_iter + 1):
+        result = solve(lower, upper)
+        if not result['success']:
+            if iteration > 1 or best is not None:
+                break
+            # Biên khởi đầu quá chặt: thử lại từ mức của nghiệm tất định
+            result = solve(np.zeros(n_blocks), np.zeros(n_blocks))
+            if not result['success']:
+                break
+            lower, upper = block_margins(table, result['baselines'], alpha, first_block)
+            worst = False
+            continue
+
+        own_lower, own_upper = block_margins(table, result['baselines'], alpha, first_block)
+        if np.all(own_lower <= lower + 1e-9) and np.all(own_upper <= upper + 1e-9):
+            if best is None or result['total'] > best['total']:
+                best = accept(result, lower, upper, iteration)
+            if not worst:
+                break
+        # Biên theo mức của nghiệm; sau lần đầu chỉ tăng nên vòng lặp hội tụ
+        if worst:
+            lower, upper = own_lower, own_upper
+            worst = False
+        else:
+            lower, upper = np.maximum(lower, own_lower), np.maximum(upper, own_upper)
+
+    if best is None:
+        return dict(result, success=False, margin_lower=lower, margin_upper=upper,
+                    alpha=alpha, iterations=iteration)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lịch 基準値 với ràng buộc xác suất')
+    parser.add_argument('--epsilon', type=float, default=EPSILON)
+    parser.add_argument('--site', choices=sorted(SOURCES), default='kotohira')
+    parser.add_argument('--model', default=None, help='mô hình SOC, ví dụ kotohira/v2')
+    parser.add_argument('--table', default=None, help='cache bảng biên .npz')
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+    model = soc_model.get_model(*args.model.split('/')) if args.model else None
+
+    print('=' * 80)
+    print('🛡️  LỊCH 基準値 VỚI RÀNG BUỘC XÁC SUẤT')
+    print('=' * 80)
+
+    t0 = time.perf_counter()
+    table = load_margin_table(args.site, args.table, rebuild=args.rebuild, model=model)
+    print(f"\nBảng biên {args.site}: {int(table['count'].max()):,} residual/ô lớn nhất, "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    scenarios = [
+        ('7 blocks, SOC cuối tự do', dict(participating=range(1, 8)),
+         dict(soc_start=SOC_MIN)),
+        ('7 blocks + JEPX -75% (block 8)', dict(participating=range(1, 8), jepx_blocks={8: -75.0}),
+         dict(soc_start=SOC_MIN, soc_end=SOC_MIN, end_tolerance=0.5)),
+    ]
+    for name, problem_kwargs, solve_kwargs in scenarios:
+        problem = build_schedule_problem(slope=table['slope'], intercept=table['intercept'],
+                                         **problem_kwargs)
+
+        t0 = time.perf_counter()
+        plain = solve_schedule(problem, **solve_kwargs)
+        t_plain = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        chance = solve_chance_constrained(problem, table, args.epsilon, **solve_kwargs)
+        t_chance = time.perf_counter() - t0
+
+        print(f"\n📋 {name}")
+        for label, result, elapsed in (('Tất định', plain, t_plain),
+                                        (f'ε = {args.epsilon:.0%}', chance, t_chance)):
+            if not result['success']:
+                print(f"   {label:>10}: ❌ {result['message']}")
+                continue
+            fixed = np.full(problem['n_blocks'], np.nan)
+            idle = np.setdiff1d(np.arange(problem['n_blocks']),
+                                np.array(problem['participating']) - 1)
+            fixed[idle] = result['delta'][idle]
+            risk = violation_probability(result['baselines'], table,
+                                         soc_start=solve_kwargs['soc_start'],
+                                         soc_min=SOC_MIN, soc_max=SOC_MAX,
+                                         fixed_delta=fixed, n_samples=20000)
+            print(f"   {label:>10}: Σ基準値 {result['total']:7.0f} kW, "
+                  f"P(vi phạm) Monte Carlo {risk['p_any'][0]:6.1%}, {elapsed * 1000:5.1f} ms"
+                  + (f", {result['iterations']} lần LP" if 'iterations' in result else ''))
+        if chance['success']:
+            t0 = time.perf_counter()
+            solve_chance_constrained(problem, table, args.epsilon, warm_start=chance,
+                                     **solve_kwargs)
+            print(f"   Giải lại với warm_start: {(time.perf_counter() - t0) * 1000:.1f} ms")
+            print(f"   Biên dưới: {np.round(chance['margin_lower'], 2).tolist()}")
+            print(f"   Biên trên: {np.round(chance['margin_upper'], 2).tolist()}")
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HỒI QUY HỆ SỐ SOC/基準値 THEO (NGÀY, BLOCK) VÀ CỬA SỔ TRƯỢT, CÓ KHOẢNG TIN CẬY
+
+minute_by_minute_analysis.py và analyze_extended_4days.py chỉ chạy 1 lần
+scipy.stats.linregress trên danh sách ngày chọn tay. Pipeline này:
+- Tính SOC変化率 từng phút (cùng bộ lọc với minute_by_minute_analysis.py)
+- Chia toàn bộ lịch sử thành nhóm (ngày, block 3 giờ), tính thống kê đủ
+  (n, Σx, Σy, Σx², Σxy, Σy²) → hồi quy từng nhóm dạng đóng
+- Cửa sổ trượt N ngày (1 = từng ngày): cộng thống kê của các block trong cửa sổ
+- Khoảng tin cậy bootstrap vector hóa bằng ma trận chỉ số (B × n):
+  - nhóm: lấy lại mẫu các phút trong nhóm
+  - cửa sổ: lấy lại mẫu các block (cluster bootstrap, giữ tự tương quan
+    trong block)
+- Các khoảng nhóm / cửa sổ chạy song song trên process pool; mỗi nhóm / cửa
+  sổ có seed riêng nên kết quả không phụ thuộc số worker
+
+Trong 1 block 基準値 thường không đổi → slope của nhóm phần lớn là NaN (chỉ có
+SOC変化率 trung bình); slope có nghĩa từ cửa sổ ≥ 1 ngày.
+
+    python coefficient_fits.py --windows 1 7 30 --boot 1000 --workers 8
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BLOCK_HOURS = 3
+N_BLOCKS = 24 // BLOCK_HOURS
+
+# Bộ lọc của minute_by_minute_analysis.py
+MAX_GAP_SECONDS = 120
+MAX_RATE = 100
+
+N_BOOT = 1000
+CONFIDENCE = 0.95
+
+_STATS = ('n', 'sx', 'sy', 'sxx', 'sxy', 'syy')
+
+# Dữ liệu dùng chung của worker (gán 1 lần trong _init_worker)
+_DATA = None
+
+
+# ============================================================================
+# DỮ LIỆU
+# ============================================================================
+
+def minute_rates(times, soc, baselines, max_gap_seconds=MAX_GAP_SECONDS, max_rate=MAX_RATE):
+    """
+    SOC変化率 (%/h) giữa 2 mẫu liên tiếp
+
+    Returns:
+        dict: 'time' datetime64[ns], 'baseline' (kW), 'rate' (%/h), 'soc' (% đầu khoảng),
+        đã sắp xếp theo thời gian
+    """
+    times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]')
+    soc = np.asarray(soc, dtype=np.float64)
+    baselines = np.asarray(baselines, dtype=np.float64)
+    ok = np.isfinite(soc) & np.isfinite(baselines) & ~np.isnat(times)
+    order = np.argsort(times[ok], kind='stable')
+    times, soc, baselines = times[ok][order], soc[ok][order], baselines[ok][order]
+
+    seconds = np.diff(times).astype(np.int64) / 1e9
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.diff(soc) / (seconds / 3600)
+    keep = (seconds > 0) & (seconds < max_gap_seconds) & (np.abs(rate) < max_rate)
+    return {'time': times[1:][keep], 'baseline': baselines[1:][keep], 'rate': rate[keep],
+            'soc': soc[:-1][keep]}
+
+
+def group_statistics(data):
+    """
+    Thống kê đủ theo nhóm (ngày, block)
+
+    Returns:
+        dict:
+            'day' (G,) datetime64[D], 'block' (G,), 'n', 'sx', 'sy', 'sxx', 'sxy', 'syy' (G,)
+            'offsets' (G + 1,): dữ liệu từng phút của nhóm g là [offsets[g], offsets[g + 1])
+    """
+    day = data['time'].astype('datetime64[D]')
+    block = ((data['time'] - day).astype('timedelta64[h]').astype(np.int64) // BLOCK_HOURS)
+    key = (day.astype(np.int64) * N_BLOCKS + block)
+    offsets = np.flatnonzero(np.diff(key, prepend=key[0] - 1))
+    x, y = data['baseline'], data['rate']
+    stats = {
+        'day': day[offsets],
+        'block': block[offsets],
+        'n': np.diff(np.append(offsets, len(key))).astype(np.float64),
+        'sx': np.add.reduceat(x, offsets),
+        'sy': np.add.reduceat(y, offsets),
+        'sxx': np.add.reduceat(x * x, offsets),
+        'sxy': np.add.reduceat(x * y, offsets),
+        'syy': np.add.reduceat(y * y, offsets),
+        'offsets': np.append(offsets, len(key)),
+    }
+    return stats
+
+
+def ols(n, sx, sy, sxx, sxy, syy=None):
+    """
+    Hồi quy tuyến tính dạng đóng từ thống kê đủ (vector hóa, mọi shape)
+
+    Returns:
+        (slope, intercept, r_squared): NaN khi x không đổi (r_squared NaN nếu không có syy)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_x = sxx - sx * sx / n
+        cov = sxy - sx * sy / n
+        degenerate = var_x <= 1e-9 * np.maximum(sxx, 1.0)
+        slope = np.where(degenerate, np.nan, cov / var_x)
+        intercept = (sy - slope * sx) / n
+        r_squared = np.nan
+        if syy is not None:
+            r_squared = np.where(degenerate, np.nan, cov * cov / (var_x * (syy - sy * sy / n)))
+    return slope, intercept, r_squared
+
+
+def _interval(samples, confidence):
+    """Khoảng percentile của các mẫu bootstrap (bỏ mẫu NaN do x không đổi)"""
+    tail = (1 - confidence) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(samples, [tail, 100 - tail], axis=-1)
+
+
+# ============================================================================
+# HỒI QUY TỪNG NHÓM / CỬA SỔ (chạy trong worker)
+# ============================================================================
+
+def _init_worker(data, stats, settings):
+    global _DATA
+    _DATA = (data, stats, settings)
+
+
+def _fit_groups(lo, hi):
+    """
+    Nhóm [lo, hi): bootstrap các phút trong nhóm bằng ma trận chỉ số (B × n)
+
+    Nhóm có 基準値 không đổi chỉ cần bootstrap SOC変化率 trung bình (1 lần gather).
+    """
+    data, stats, settings = _DATA
+    n_boot, confidence, seed = settings['n_boot'], settings['confidence'], settings['seed']
+    x, y, offsets = data['baseline'], data['rate'], stats['offsets']
+    slope_point, _, _ = ols(*(stats[key][lo:hi] for key in _STATS))
+
+    rate = np.full((hi - lo, n_boot), np.nan)
+    slope = np.full((hi - lo, n_boot), np.nan)
+    intercept = np.full((hi - lo, n_boot), np.nan)
+    for i, g in enumerate(range(lo, hi)):
+        a, b = offsets[g], offsets[g + 1]
+        if b - a < 2:
+            continue
+        rng = np.random.default_rng([seed, 0, g])
+        index = a + rng.integers(0, b - a, size=(n_boot, b - a), dtype=np.int32)
+        ys = y[index]
+        rate[i] = ys.mean(axis=1)
+        if np.isfinite(slope_point[i]):
+            xs = x[index]
+            slope[i], intercept[i], _ = ols(b - a, xs.sum(1), ys.sum(1), (xs * xs).sum(1),
+                                            (xs * ys).sum(1))
+
+    out = {}
+    for name, samples in (('slope', slope), ('intercept', intercept), ('rate', rate)):
+        out[f'{name}_low'], out[f'{name}_high'] = _interval(samples, confidence)
+    return 'groups', lo, hi, out
+
+
+def _fit_windows(window, lo, hi):
+    """
+    Cửa sổ kết thúc tại ngày [lo, hi) (chỉ số trong danh sách ngày): cluster
+    bootstrap theo block. Ma trận chỉ số (B × m) → ma trận số lần chọn (bincount)
+    → nhân với thống kê đủ của block (m × 6) ra thống kê của B mẫu bootstrap.
+    """
+    data, stats, settings = _DATA
+    n_boot, confidence, seed = settings['n_boot'], settings['confidence'], settings['seed']
+    days = settings['days']
+    day_index = np.searchsorted(days, stats['day'])
+    columns = np.column_stack([stats[key] for key in _STATS])       # (G, 6)
+
+    out = {key: np.full(hi - lo, np.nan) for key in ('n_blocks', 'n', 'slope', 'intercept',
+                                                      'r_squared')}
+    slope = np.full((hi - lo, n_boot), np.nan)
+    intercept = np.full((hi - lo, n_boot), np.nan)
+    first = np.searchsorted(days, days - np.timedelta64(window - 1, 'D'))
+    group_start = np.searchsorted(day_index, first, side='left')
+    group_end = np.searchsorted(day_index, np.arange(len(days)), side='right')
+    for i, d in enumerate(range(lo, hi)):
+        members = columns[group_start[d]:group_end[d]]
+        m = len(members)
+        if m == 0:
+            continue
+        totals = members.sum(axis=0)
+        out['n_blocks'][i] = m
+        out['n'][i] = totals[0]
+        out['slope'][i], out['intercept'][i], out['r_squared'][i] = ols(*totals)
+
+        rng = np.random.default_rng([seed, window, d])
+        index = (rng.integers(0, m, size=(n_boot, m), dtype=np.int32) +
+                 np.arange(n_boot, dtype=np.int32)[:, np.newaxis] * m)
+        counts = np.bincount(index.ravel(), minlength=n_boot * m).reshape(n_boot, m)
+        boot = counts @ members                                       # (B, 6)
+        slope[i], intercept[i], _ = ols(*boot[:, :5].T)
+
+    out['slope_low'], out['slope_high'] = _interval(slope, confidence)
+    out['intercept_low'], out['intercept_high'] = _interval(intercept, confidence)
+    return 'windows', window, lo, hi, out
+
+
+def _run_task(task):
+    kind, *args = task
+    return _fit_groups(*args) if kind == 'groups' else _fit_windows(*args)
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def fit_coefficients(times, soc, baselines, windows=(1, 7, 30), n_boot=N_BOOT,
+                     confidence=CONFIDENCE, workers=None, chunk=None, seed=0):
+    """
+    Hồi quy theo nhóm (ngày, block) và theo cửa sổ trượt, có khoảng tin cậy bootstrap
+
+    Args:
+        times, soc, baselines: dữ liệu từng phút (timestamp, SOC %, 基準値 kW)
+        windows: độ dài cửa sổ (ngày); cửa sổ kết thúc tại mỗi ngày có dữ liệu
+        n_boot: số lần bootstrap
+        confidence: mức tin cậy của khoảng
+        workers: số tiến trình (None = số CPU, 1 = tuần tự)
+        chunk: số nhóm / ngày mỗi task (None = tự chọn)
+        seed: seed (kết quả không phụ thuộc số worker)
+
+    Returns:
+        dict:
+            'groups': DataFrame 1 dòng / (ngày, block)
+            'windows': DataFrame 1 dòng / (cửa sổ, ngày cuối)
+            'elapsed': giây
+    """
+    t0 = time.perf_counter()
+    data = minute_rates(times, soc, baselines)
+    if len(data['rate']) == 0:
+        raise ValueError('Không có dữ liệu SOC変化率 hợp lệ')
+    stats = group_statistics(data)
+    days = np.unique(stats['day'])
+    settings = {'n_boot': n_boot, 'confidence': confidence, 'seed': seed, 'days': days}
+    workers = workers or os.cpu_count() or 1
+
+    n_groups = len(stats['n'])
+    group_chunk = chunk or max(1, -(-n_groups // (4 * workers)))
+    day_chunk = chunk or max(1, -(-len(days) // (4 * workers)))
+    tasks = [('groups', lo, min(lo + group_chunk, n_groups))
+             for lo in range(0, n_groups, group_chunk)]
+    tasks += [('windows', w, lo, min(lo + day_chunk, len(days)))
+              for w in windows for lo in range(0, len(days), day_chunk)]
+
+    if workers == 1:
+        _init_worker(data, stats, settings)
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data, stats, settings)) as pool:
+            results = list(pool.map(_run_task, tasks))
+
+    slope, intercept, r_squared = ols(*(stats[key] for key in _STATS))
+    groups = pd.DataFrame({
+        'date': pd.to_datetime(stats['day']),
+        'block': stats['block'] + 1,
+        'n': stats['n'].astype(int),
+        'baseline_mean': stats['sx'] / stats['n'],
+        'rate_mean': stats['sy'] / stats['n'],
+        'slope': slope,
+        'intercept': intercept,
+        'r_squared': r_squared,
+    })
+    window_frames = []
+    for result in results:
+        if result[0] == 'groups':
+            _, lo, hi, out = result
+            for key, value in out.items():
+                groups.loc[lo:hi - 1, key] = value
+        else:
+            _, window, lo, hi, out = result
+            frame = pd.DataFrame({'window_days': window, 'end_date': pd.to_datetime(days[lo:hi])})
+            for key, value in out.items():
+                frame[key] = value
+            window_frames.append(frame)
+
+    windows_df = pd.concat(window_frames, ignore_index=True) if window_frames else pd.DataFrame()
+    if len(windows_df):
+        windows_df['n_blocks'] = windows_df['n_blocks'].astype('Int64')
+        windows_df['n'] = windows_df['n'].astype('Int64')
+    return {'groups': groups, 'windows': windows_df, 'elapsed': time.perf_counter() - t0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hồi quy hệ số theo nhóm / cửa sổ với bootstrap CI')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 7, 30])
+    parser.add_argument('--boot', type=int, default=N_BOOT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='coefficient_fits',
+                        help='tiền tố file CSV (_groups.csv, _windows.csv)')
+    args = parser.parse_args()
+
+    from batch_daily_report import load_kotohira
+
+    print('=' * 100)
+    print('📈 HỒI QUY HỆ SỐ THEO NGÀY / BLOCK / CỬA SỔ (BOOTSTRAP)')
+    print('=' * 100)
+
+    data = load_kotohira()['data'][0]
+    result = fit_coefficients(data['timestamp'], data['battery_soc_percent'],
+                              data['demand_plan_kw_baseline'], windows=args.windows,
+                              n_boot=args.boot, workers=args.workers)
+    groups, windows = result['groups'], result['windows']
+    print(f"\n{len(groups):,} nhóm (ngày, block), {len(windows):,} cửa sổ, "
+          f"{args.boot} bootstrap: {result['elapsed']:.1f} giây")
+
+    for window, part in windows.groupby('window_days'):
+        part = part.dropna(subset=['slope'])
+        if part.empty:
+            continue
+        width = (part['slope_high'] - part['slope_low']).median()
+        print(f"\nCửa sổ {window} ngày ({len(part)} cửa sổ có slope):")
+        print(f"   slope     P5–P95: {part['slope'].quantile(0.05):.6f} … "
+              f"{part['slope'].quantile(0.95):.6f}, độ rộng CI trung vị {width:.6f}")
+        print(f"   intercept P5–P95: {part['intercept'].quantile(0.05):+.4f} … "
+              f"{part['intercept'].quantile(0.95):+.4f}")
+
+    groups.to_csv(f'{args.output}_groups.csv', index=False, encoding='utf-8-sig')
+    windows.to_csv(f'{args.output}_windows.csv', index=False, encoding='utf-8-sig')
+    print(f'\n✅ Đã lưu: {args.output}_groups.csv, {args.output}_windows.csv')
@@ -1,5 +1,7 @@
 """
 So sánh 2 công thức tính SOC với dữ liệu thực tế
+
+Chỉ dùng 3 block ngày 25/9; model_selection.py kiểm lại trên toàn bộ lịch sử.
 """
 
 print('='*100)
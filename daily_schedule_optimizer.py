@@ -8,12 +8,11 @@ Công cụ tối ưu hóa lịch hàng ngày
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
-# Công thức regression từ phân tích 4 ngày
-SLOPE = 0.013545
-INTERCEPT = -2.8197
+# Công thức regression từ phân tích 4 ngày (soc_model.py)
+from soc_model import INTERCEPT, SLOPE
+import soc_block_table
+import soc_model
 
 # Giới hạn SOC
 SOC_MIN = 10  # %
@@ -42,7 +41,7 @@ def calculate_soc_change_rate(baseline_kw):
     Returns:
         SOC変化率 (%/時間)
     """
-    return SLOPE * baseline_kw + INTERCEPT
+    return soc_model.soc_rate(baseline_kw)
 
 
 def predict_soc_after_period(soc_start, baseline_kw, duration_hours):
@@ -57,10 +56,7 @@ def predict_soc_after_period(soc_start, baseline_kw, duration_hours):
     Returns:
         SOC sau khoảng thời gian (%)
     """
-    change_rate = calculate_soc_change_rate(baseline_kw)
-    soc_change = change_rate * duration_hours
-    soc_end = soc_start + soc_change
-    return soc_end
+    return soc_model.predict_soc(soc_start, baseline_kw, duration_hours)
 
 
 def find_optimal_baseline(soc_current, soc_target, duration_hours):
@@ -75,25 +71,39 @@ def find_optimal_baseline(soc_current, soc_target, duration_hours):
     Returns:
         基準値 tối ưu (kW)
     """
-    # SOC_change_needed = soc_target - soc_current
-    # change_rate_needed = SOC_change_needed / duration_hours
-    # change_rate = SLOPE * baseline + INTERCEPT
-    # baseline = (change_rate - INTERCEPT) / SLOPE
-    
-    soc_change_needed = soc_target - soc_current
-    change_rate_needed = soc_change_needed / duration_hours
-    baseline_optimal = (change_rate_needed - INTERCEPT) / SLOPE
-    
-    return max(0, baseline_optimal)  # Không âm
+    # baseline = (ΔSOC / duration_hours - INTERCEPT) / SLOPE, không âm
+    return soc_model.baseline_for_delta(soc_target - soc_current, duration_hours, baseline_min=0)
+
+
+def block_soc_target(block_idx, soc_current):
+    """
+    SOC mục tiêu của block theo SOC hiện tại (scalar hoặc array)
+
+    - Block 1-7: SOC thấp → sạc lên SOC_MIN + 30, SOC cao → giữ SOC_MAX - 10,
+      còn lại tăng nhẹ 5%
+    - Block cuối: 80% để chuẩn bị cho ngày mai
+    """
+    soc_current = np.asarray(soc_current, dtype=np.float64)
+    if block_idx < len(TIME_BLOCKS) - 1:
+        # Giữ SOC trong khoảng an toàn
+        soc_target = np.where(soc_current < SOC_MIN + 10, SOC_MIN + 30,
+                              np.where(soc_current > SOC_MAX - 10, SOC_MAX - 10, soc_current + 5))
+    else:
+        # Block cuối: chuẩn bị cho ngày mai
+        soc_target = np.full(soc_current.shape, 80.0)
+
+    # Đảm bảo target trong giới hạn
+    return np.clip(soc_target, SOC_MIN, SOC_MAX)
 
 
-def optimize_daily_schedule(target_date_str, initial_soc=None):
+def optimize_daily_schedule(target_date_str, initial_soc=None, blocks=None):
     """
     Tối ưu hóa lịch cho một ngày cụ thể
     
     Args:
         target_date_str: Ngày cần tối ưu (format: 'YYYY-MM-DD')
         initial_soc: SOC ban đầu (nếu None sẽ lấy từ data)
+        blocks: bảng soc_block_table.load_blocks() (None = tự đọc)
     
     Returns:
         DataFrame với lịch tối ưu
@@ -102,38 +112,25 @@ def optimize_daily_schedule(target_date_str, initial_soc=None):
     print(f'🔧 TỐI ƯU HÓA LỊCH NGÀY {target_date_str}')
     print('='*100)
     
-    # Đọc dữ liệu
-    df = pd.read_csv('kotohira_integrated_data.csv')
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.sort_values('timestamp')
-    
-    # Lọc dữ liệu ngày target
+    # SOC đầu/cuối từng block 3 giờ từ bảng tổng hợp (soc_block_table.py)
     target_date = pd.to_datetime(target_date_str)
-    daily_data = df[
-        (df['timestamp'] >= target_date) & 
-        (df['timestamp'] < target_date + timedelta(days=1))
-    ].copy()
-    
-    if len(daily_data) == 0:
-        print(f'❌ Không có dữ liệu cho ngày {target_date_str}')
-        return None
-    
-    # Lấy SOC theo phút
-    soc_data = daily_data[daily_data['battery_soc_percent'].notna()].copy()
+    if blocks is None:
+        blocks = soc_block_table.load_blocks()
+    day_blocks = blocks[(blocks['date'] == target_date) & blocks['soc_start'].notna()]
     
-    if len(soc_data) == 0:
-        print('❌ Không có dữ liệu SOC')
+    if len(day_blocks) == 0:
+        print(f'❌ Không có dữ liệu SOC cho ngày {target_date_str}')
         return None
     
     # SOC ban đầu
     if initial_soc is None:
-        initial_soc = soc_data['battery_soc_percent'].iloc[0]
+        initial_soc = day_blocks['soc_start'].iloc[0]
     
     print(f'\n📊 Thông tin ngày:')
     print(f'   SOC ban đầu: {initial_soc:.1f}%')
-    print(f'   SOC cuối ngày (thực tế): {soc_data["battery_soc_percent"].iloc[-1]:.1f}%')
-    print(f'   SOC min: {soc_data["battery_soc_percent"].min():.1f}%')
-    print(f'   SOC max: {soc_data["battery_soc_percent"].max():.1f}%')
+    print(f'   SOC cuối ngày (thực tế): {day_blocks["soc_end"].iloc[-1]:.1f}%')
+    print(f'   SOC min: {day_blocks["soc_min"].min():.1f}%')
+    print(f'   SOC max: {day_blocks["soc_max"].max():.1f}%')
     
     # Tạo lịch tối ưu cho từng block 3 giờ
     schedule = []
@@ -143,48 +140,23 @@ def optimize_daily_schedule(target_date_str, initial_soc=None):
     print('📋 LỊCH TỐI ƯU HÓA THEO 3H BLOCK')
     print(f'{"="*100}')
     
+    actual = day_blocks.set_index('block')
     for block_idx, (time_start, time_end) in enumerate(TIME_BLOCKS):
-        block_start = datetime.combine(target_date.date(), 
-                                       datetime.strptime(time_start, '%H:%M').time())
-        block_end = datetime.combine(target_date.date(), 
-                                     datetime.strptime(time_end, '%H:%M').time())
-        
-        # Lấy SOC thực tế trong block này
-        block_soc = soc_data[
-            (soc_data['timestamp'] >= block_start) & 
-            (soc_data['timestamp'] <= block_end)
-        ]
-        
-        if len(block_soc) == 0:
+        # SOC thực tế trong block này
+        if block_idx not in actual.index:
             continue
         
-        soc_actual_start = block_soc['battery_soc_percent'].iloc[0]
-        soc_actual_end = block_soc['battery_soc_percent'].iloc[-1]
+        soc_actual_start = actual.at[block_idx, 'soc_start']
+        soc_actual_end = actual.at[block_idx, 'soc_end']
         soc_actual_change = soc_actual_end - soc_actual_start
         
         duration_hours = 3.0
-        actual_change_rate = soc_actual_change / duration_hours
         
         # Tính 基準値 thực tế (reverse engineer)
-        # change_rate = SLOPE * baseline + INTERCEPT
-        # baseline = (change_rate - INTERCEPT) / SLOPE
-        baseline_actual = (actual_change_rate - INTERCEPT) / SLOPE
+        baseline_actual = soc_model.baseline_for_delta(soc_actual_change, duration_hours)
         
         # Xác định mục tiêu cho block tiếp theo
-        if block_idx < len(TIME_BLOCKS) - 1:
-            # Giữ SOC trong khoảng an toàn
-            if soc_current < SOC_MIN + 10:
-                soc_target = SOC_MIN + 30  # Sạc lên
-            elif soc_current > SOC_MAX - 10:
-                soc_target = SOC_MAX - 10  # Giữ ổn định
-            else:
-                soc_target = soc_current + 5  # Tăng nhẹ
-        else:
-            # Block cuối: chuẩn bị cho ngày mai
-            soc_target = 80.0
-        
-        # Đảm bảo target trong giới hạn
-        soc_target = max(SOC_MIN, min(SOC_MAX, soc_target))
+        soc_target = block_soc_target(block_idx, soc_current)
         
         # Tính 基準値 tối ưu
         baseline_optimal = find_optimal_baseline(soc_current, soc_target, duration_hours)
@@ -216,7 +188,12 @@ def optimize_daily_schedule(target_date_str, initial_soc=None):
     
     schedule_df = pd.DataFrame(schedule)
     
-    # Visualization
+    # Visualization (SOC theo phút chỉ dùng để vẽ)
+    from batch_daily_report import load_kotohira
+    data = load_kotohira()['data'][0]
+    soc_data = data[(data['timestamp'] >= target_date) &
+                    (data['timestamp'] < target_date + timedelta(days=1)) &
+                    data['battery_soc_percent'].notna()]
     create_schedule_visualization(schedule_df, target_date_str, soc_data)
     
     # Lưu file
@@ -231,6 +208,9 @@ def create_schedule_visualization(schedule_df, target_date, soc_data):
     """
     Tạo visualization cho lịch tối ưu
     """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(
         rows=2, cols=1,
         subplot_titles=(
@@ -382,12 +362,13 @@ def batch_optimize(start_date_str, end_date_str):
     
     current_date = start_date
     all_schedules = []
+    blocks = soc_block_table.load_blocks()
     
     while current_date <= end_date:
         date_str = current_date.strftime('%Y-%m-%d')
         print(f'\n{"="*100}')
         
-        schedule_df = optimize_daily_schedule(date_str)
+        schedule_df = optimize_daily_schedule(date_str, blocks=blocks)
         
         if schedule_df is not None:
             schedule_df['date'] = date_str
@@ -0,0 +1,213 @@
+"""
+CSVデータセットのバイナリ列キャッシュ
+
+各スクリプトが毎回 pd.read_csv + pd.to_datetime している琴平・荒尾のCSV
+（1分粒度の arao_soc_battery1-2 / 3-4 など）を、初回読み込み時に
+CSVの隣の `<CSV名>.cache/` ディレクトリへ列ごとの .npy として保存する。
+- 時刻列: int64 (UTC epoch ns) + タイムゾーン情報
+- 数値列: float32
+- 文字列列: 固定長Unicode
+2回目以降はメモリマップで読み込み（ミリ秒）、CSVの更新時刻・サイズが
+変わった場合のみ作り直す。
+"""
+
+import json
+import os
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+
+
+def _cache_dir(csv_path):
+    return csv_path + '.cache'
+
+
+def _is_time_column(name):
+    """時刻列の自動判定（time / timestamp / start_time / end_time / ○○時刻）"""
+    return name in ('time', 'timestamp', 'start_time', 'end_time') or name.endswith('時刻')
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _encode_tz(tz):
+    """タイムゾーン → JSON（固定オフセットは分、名前付きは文字列）"""
+    if tz is None:
+        return None
+    offset = tz.utcoffset(None)
+    if offset is not None:
+        return {'offset_minutes': int(offset.total_seconds() // 60)}
+    return {'name': str(tz)}
+
+
+def _decode_tz(value):
+    if value is None:
+        return None
+    if 'offset_minutes' in value:
+        return timezone(timedelta(minutes=value['offset_minutes']))
+    return value['name']
+
+
+def build_cache(csv_path, time_columns=None, **read_csv_kwargs):
+    """
+    CSVを読み込んでキャッシュを作成する
+
+    Args:
+        csv_path: CSVファイルのパス
+        time_columns: 時刻として扱う列名のリスト（None なら列名から自動判定）
+        **read_csv_kwargs: pd.read_csv に渡す追加引数
+
+    Returns:
+        dict: メタ情報
+    """
+    signature = _source_signature(csv_path)
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    df.columns = [str(c).lstrip('\ufeff') for c in df.columns]
+    if time_columns is None:
+        time_columns = [c for c in df.columns if _is_time_column(c)]
+
+    cache_dir = _cache_dir(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # メタ情報を先に消しておき、書き込み途中のキャッシュを使わないようにする
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        tz = None
+        if name in time_columns:
+            times = pd.to_datetime(series)
+            tz = times.dt.tz
+            if tz is not None:
+                times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+            array = times.astype('datetime64[ns]').astype('int64').to_numpy()
+            kind = 'time'
+        elif pd.api.types.is_numeric_dtype(series):
+            array = series.to_numpy(dtype=np.float32)
+            kind = 'float'
+        else:
+            array = series.fillna('').astype(str).to_numpy(dtype=str)
+            kind = 'str'
+
+        file_name = f'{i:03d}.npy'
+        np.save(os.path.join(cache_dir, file_name), array)
+        columns.append({'name': name, 'file': file_name, 'kind': kind, 'tz': _encode_tz(tz)})
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': signature,
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def _load_meta(csv_path):
+    """有効なキャッシュのメタ情報（なければ None）"""
+    meta_path = os.path.join(_cache_dir(csv_path), 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION or meta.get('source') != _source_signature(csv_path):
+        return None
+    return meta
+
+
+def load_columns(csv_path, time_columns=None, **read_csv_kwargs):
+    """
+    列ごとの配列をメモリマップで読み込む（キャッシュが古ければ作り直す）
+
+    Returns:
+        dict: 列名 → np.ndarray（時刻列は int64 UTC epoch ns、数値列は float32）
+    """
+    meta = _load_meta(csv_path)
+    if meta is None:
+        meta = build_cache(csv_path, time_columns=time_columns, **read_csv_kwargs)
+
+    cache_dir = _cache_dir(csv_path)
+    return {column['name']: np.load(os.path.join(cache_dir, column['file']), mmap_mode='r')
+            for column in meta['columns']}
+
+
+def load_dataset(csv_path, time_columns=None, **read_csv_kwargs):
+    """
+    pd.read_csv + pd.to_datetime の代わりにキャッシュから DataFrame を作る
+
+    時刻列は元のタイムゾーン付き（または tz なし）の datetime 列として復元する。
+
+    Args:
+        csv_path: CSVファイルのパス
+        time_columns: 時刻として扱う列名のリスト（None なら列名から自動判定）
+        **read_csv_kwargs: キャッシュ作成時に pd.read_csv に渡す追加引数
+
+    Returns:
+        pd.DataFrame
+    """
+    meta = _load_meta(csv_path)
+    if meta is None:
+        meta = build_cache(csv_path, time_columns=time_columns, **read_csv_kwargs)
+
+    cache_dir = _cache_dir(csv_path)
+    data = {}
+    for column in meta['columns']:
+        array = np.load(os.path.join(cache_dir, column['file']), mmap_mode='r')
+        if column['kind'] == 'time':
+            times = pd.Series(np.asarray(array).view('datetime64[ns]'))
+            tz = _decode_tz(column['tz'])
+            if tz is not None:
+                times = times.dt.tz_localize('UTC').dt.tz_convert(tz)
+            data[column['name']] = times
+        elif column['kind'] == 'str':
+            # read_csv と同様に空文字は欠損値に戻す
+            data[column['name']] = pd.Series(np.asarray(array), dtype=object).replace('', np.nan)
+        else:
+            data[column['name']] = pd.Series(array)
+
+    return pd.DataFrame(data)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    paths = sys.argv[1:] or [
+        'kotohira_kijyunchi_20250801~now (1).csv',
+        'arao_202406-202504/arao_schedule_202406-202504.csv',
+    ]
+
+    print("=" * 70)
+    print("CSVキャッシュの作成・読み込み時間")
+    print("=" * 70)
+
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"\n⚠️  {path} が見つかりません")
+            continue
+
+        t0 = time.perf_counter()
+        df = pd.read_csv(path)
+        for name in df.columns:
+            if _is_time_column(str(name).lstrip('\ufeff')):
+                df[name] = pd.to_datetime(df[name])
+        t_csv = time.perf_counter() - t0
+
+        build_cache(path)
+        t0 = time.perf_counter()
+        cached = load_dataset(path)
+        t_cache = time.perf_counter() - t0
+
+        print(f"\n📄 {path}")
+        print(f"   行数: {len(cached):,}")
+        print(f"   CSV + to_datetime: {t_csv*1000:8.1f} ms")
+        print(f"   キャッシュ:        {t_cache*1000:8.1f} ms")
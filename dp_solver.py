@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GIẢI BẰNG QUY HOẠCH ĐỘNG (DP) TRÊN LƯỚI SOC
+
+Thay cho 5 chiến lược heuristic của exhaustive_search.py:
+- State: SOC rời rạc (ví dụ bước 0.1%)
+- Action: mức 基準値 (ví dụ bước 1 kW)
+- ΔSOC = (SLOPE × 基準値 + INTERCEPT) × 3h  (giống calc_delta_soc)
+- Tối ưu Σ基準値, độ phức tạp O(blocks × SOC states × 基準値 levels)
+
+ΔSOC tính bằng công thức liên tục (không làm tròn về lưới): Σ基準値 tối ưu
+từ SOC nằm giữa 2 mức lưới được nội suy tuyến tính, và khi đi xuôi thì chọn
+lại 基準値 ở SOC thực của từng block. Pattern trả về luôn thỏa giới hạn SOC /
+soc_end của mô hình liên tục; Σ基準値 có thể thấp hơn tối ưu liên tục (LP) vài kW
+do lưới 基準値 và nội suy.
+
+piecewise = mô hình của soc_piecewise: ΔSOC phụ thuộc cả SOC đầu block, SOC sau
+block là ma trận (SOC states × 基準値 levels) tính 1 lần cho mọi block. ΔSOC tích
+phân Euler PIECEWISE_SUBSTEPS bước trong block để thấy taper gần 90%: 1 bước dùng
+SOC変化率 của SOC đầu block cho cả 3 giờ, lệch ~2% ΔSOC khi block đi qua mốc 90%;
+12 bước (15 phút) còn lệch ~0.3-0.5%. Đổi lại, solve_dp với piecewise (lưới 0.1%
+× 1 kW, 8 block) mất ~1.9 s thay vì ~0.45 s với 1 bước.
+"""
+
+import numpy as np
+
+from soc_model import INTERCEPT, SLOPE, delta_soc
+
+# Giới hạn SOC
+SOC_MIN = 5.0
+SOC_MAX = 90.0
+
+# Giới hạn 基準値
+BASELINE_MIN = 0
+BASELINE_MAX = 2000
+
+BLOCK_HOURS = 3.0
+
+# Sai số số học khi so SOC liên tục với giới hạn (không phải nới giới hạn)
+SOC_TOLERANCE = 1e-6
+
+# Σ基準値 chênh nhau dưới TIE_FRACTION × baseline_step (kW) coi là hòa → chọn
+# 基準値 cao nhất. Σ基準値 của mọi lịch là bội của baseline_step, nên chênh lệch
+# nhỏ hơn nửa bước chỉ là sai số nội suy value (cỡ 0.3 kW với bước 10 kW)
+TIE_FRACTION = 0.5
+
+# Số bước tích phân Euler trong 1 block của mô hình piecewise (12 = 15 phút)
+PIECEWISE_SUBSTEPS = 12
+
+
+def _per_block(value, n_blocks):
+    """Scalar hoặc list → array (n_blocks,)"""
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim == 0:
+        value = np.full(n_blocks, float(value))
+    if len(value) != n_blocks:
+        raise ValueError(f"Cần {n_blocks} giá trị, nhận {len(value)}")
+    return value
+
+
+def soc_violation(soc, soc_min=SOC_MIN, soc_max=SOC_MAX, soc_end=None, jepx_delta=None,
+                  end_tolerance=0.5):
+    """
+    Mức vượt giới hạn lớn nhất của các SOC trajectory liên tục
+
+    Args:
+        soc: array (N, n_blocks + 1) hoặc (n_blocks + 1,) SOC đầu và sau mỗi block
+        soc_min, soc_max: giới hạn SOC sau mỗi block (scalar hoặc list n_blocks)
+        soc_end, jepx_delta, end_tolerance: điều kiện cuối như solve_dp
+
+    Returns:
+        array (N,) hoặc float: > 0 là không khả thi (NaN trong trajectory → inf)
+    """
+    soc = np.asarray(soc, dtype=np.float64)
+    after = np.atleast_2d(soc)[:, 1:]
+    n_blocks = after.shape[1]
+    violation = np.maximum((_per_block(soc_min, n_blocks) - after).max(axis=1),
+                           (after - _per_block(soc_max, n_blocks)).max(axis=1))
+    if soc_end is not None:
+        final = after[:, -1] + (jepx_delta if jepx_delta is not None else 0.0)
+        violation = np.maximum(violation, np.abs(final - soc_end) - end_tolerance)
+    violation = np.where(np.isnan(after).any(axis=1), np.inf, violation)
+    return violation if soc.ndim > 1 else float(violation[0])
+
+
+def solve_dp(n_blocks=7, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+             soc_resolution=0.1, baseline_min=BASELINE_MIN, baseline_max=BASELINE_MAX,
+             baseline_step=1.0, participating=None, jepx_delta=None, soc_end=None,
+             end_tolerance=0.5, grid_range=None, fixed_delta=None, terminal_value=None,
+             block_hours=BLOCK_HOURS,
+             slope=SLOPE, intercept=INTERCEPT, piecewise=None, substeps=PIECEWISE_SUBSTEPS):
+    """
+    Tìm pattern 基準値 tối ưu (Σ基準値 MAX) bằng DP ngược
+
+    Args:
+        n_blocks: số block
+        soc_start: SOC ban đầu (%)
+        soc_min, soc_max: giới hạn SOC sau mỗi block (scalar hoặc list n_blocks)
+        soc_resolution: bước lưới SOC (%)
+        baseline_min, baseline_max, baseline_step: lưới 基準値 (kW)
+        participating: list bool n_blocks, block False có 基準値 = 0
+            (ví dụ block 1,2 không có baseline). None = tất cả tham gia
+        jepx_delta: ΔSOC cố định của JEPX sau block cuối (%), None = không có
+        soc_end: SOC bắt buộc cuối chu kỳ (sau JEPX nếu có jepx_delta).
+            None = tự do (JEPX linh hoạt xả về 5% từ bất kỳ mức nào)
+        end_tolerance: sai số cho phép của soc_end (%)
+        grid_range: (lo, hi) mở rộng lưới SOC, ví dụ (0, 100) để policy
+            dùng được cho mọi SOC ban đầu
+        fixed_delta: ΔSOC cố định (%) của block không tham gia (scalar hoặc list
+            n_blocks, NaN/None = 基準値 0), ví dụ JEPX -85% ở giữa chuỗi nhiều ngày
+        terminal_value: array (S,) Σ基準値 tối ưu sau block cuối trên cùng lưới SOC
+            (ví dụ value[0] của lần giải ngày hôm sau), thay cho soc_end
+        block_hours: số giờ mỗi block
+        piecewise: mô hình soc_piecewise (fit_piecewise / load_piecewise) thay cho
+            slope/intercept, None = mô hình tuyến tính
+        substeps: số bước tích phân ΔSOC trong 1 block của mô hình piecewise
+
+    Returns:
+        dict:
+            'pattern': array (n_blocks,) 基準値 tối ưu hoặc None nếu không khả thi
+            'total': Σ基準値 tối ưu
+            'soc': SOC trajectory (n_blocks + 1,) tính bằng công thức liên tục
+            'soc_grid': array (S,) các mức SOC của lưới
+            'value': array (n_blocks + 1, S) Σ基準値 tối ưu từ block k với SOC s
+            'policy': array (n_blocks, S) 基準値 tối ưu tại block k với SOC s
+    """
+    soc_min = _per_block(soc_min, n_blocks)
+    soc_max = _per_block(soc_max, n_blocks)
+    if participating is None:
+        participating = np.ones(n_blocks, dtype=bool)
+    participating = np.asarray(participating, dtype=bool)
+
+    # Lưới SOC bao trùm cả SOC ban đầu và mọi giới hạn
+    grid_lo = min(float(soc_start), soc_min.min())
+    grid_hi = max(float(soc_start), soc_max.max())
+    if grid_range is not None:
+        grid_lo = min(grid_lo, float(grid_range[0]))
+        grid_hi = max(grid_hi, float(grid_range[1]))
+    n_states = int(round((grid_hi - grid_lo) / soc_resolution)) + 1
+    soc_grid = grid_lo + soc_resolution * np.arange(n_states)
+
+    # ΔSOC cố định của block không tham gia (NaN = theo mô hình với 基準値 0)
+    fixed = np.full(n_blocks, np.nan)
+    if fixed_delta is not None:
+        fixed_delta = _per_block(np.asarray(fixed_delta, dtype=np.float64), n_blocks)
+        fixed = np.where(participating, np.nan, fixed_delta)
+
+    result = {
+        'soc_grid': soc_grid,
+        'soc_resolution': soc_resolution,
+        'levels': np.arange(baseline_min, baseline_max + baseline_step / 2, baseline_step),
+        'tie_tolerance': TIE_FRACTION * baseline_step,
+        'participating': participating,
+        'fixed_delta': fixed,
+        'piecewise': piecewise,
+        'substeps': substeps,
+        'bounds': {'soc_min': soc_min, 'soc_max': soc_max,
+                   'soc_end': None if terminal_value is not None else soc_end,
+                   'jepx_delta': jepx_delta, 'end_tolerance': end_tolerance},
+    }
+
+    # Điều kiện cuối chu kỳ
+    value = np.full((n_blocks + 1, n_states), -np.inf)
+    if terminal_value is not None:
+        terminal_value = np.asarray(terminal_value, dtype=np.float64)
+        if terminal_value.shape != (n_states,):
+            raise ValueError(f"terminal_value cần {n_states} mức SOC, nhận {terminal_value.shape}")
+        value[n_blocks] = terminal_value
+    elif soc_end is None:
+        value[n_blocks] = 0.0
+    else:
+        soc_final = soc_grid + (jepx_delta if jepx_delta is not None else 0.0)
+        value[n_blocks] = np.where(np.abs(soc_final - soc_end) <= end_tolerance + 1e-9, 0.0, -np.inf)
+
+    policy = np.full((n_blocks, n_states), np.nan)
+    # Vị trí nội suy của SOC sau block tham gia giống nhau ở mọi block → tính 1 lần
+    moves = None
+    for k in range(n_blocks - 1, -1, -1):
+        if participating[k] and moves is not None:
+            block_levels, interpolation = moves
+        else:
+            block_levels, soc_next = _next_soc(result, soc_grid, k, block_hours, slope, intercept)
+            interpolation = _interpolation(soc_grid, soc_resolution, soc_next)
+            if participating[k]:
+                moves = (block_levels, interpolation)
+        candidate = block_levels + _future(result, value[k + 1], k, interpolation)
+        best = _best(candidate, result['tie_tolerance'])
+        value[k] = candidate[np.arange(n_states), best]
+        policy[k] = np.where(np.isfinite(value[k]), block_levels[best], np.nan)
+    result.update({'value': value, 'policy': policy})
+
+    # Đi xuôi từ SOC ban đầu bằng công thức liên tục
+    patterns, feasible, socs = rollout_policy(result, [soc_start], block_hours=block_hours,
+                                              slope=slope, intercept=intercept, return_soc=True)
+    if not feasible[0]:
+        result.update({'pattern': None, 'total': None, 'soc': None})
+        return result
+
+    pattern = patterns[0]
+    result.update({'pattern': pattern, 'total': float(pattern.sum()), 'soc': socs[0]})
+    return result
+
+
+def _next_soc(result, soc, k, block_hours, slope, intercept):
+    """
+    SOC liên tục sau block k từ các SOC đầu block
+
+    Returns:
+        (levels, soc_next): levels (L,) 基準値 được chọn, soc_next (N, L)
+    """
+    soc = np.asarray(soc, dtype=np.float64)[:, np.newaxis]
+    if not result['participating'][k]:
+        levels = np.zeros(1)
+        if not np.isnan(result['fixed_delta'][k]):
+            return levels, soc + result['fixed_delta'][k]
+    else:
+        levels = result['levels']
+    piecewise = result['piecewise']
+    if piecewise is not None:
+        import soc_piecewise
+
+        return levels, soc + soc_piecewise.delta_soc(piecewise, levels[np.newaxis, :], soc,
+                                                     block_hours, result['substeps'])
+    return levels, soc + delta_soc(levels, block_hours, slope=slope, intercept=intercept)[np.newaxis, :]
+
+
+def _best(candidate, tolerance):
+    """
+    Chỉ số 基準値 tốt nhất của mỗi dòng (levels tăng dần)
+
+    Với mô hình tuyến tính, Σ基準値 chỉ phụ thuộc SOC cuối nên rất nhiều lịch
+    hòa nhau. Các mức trong `tolerance` (kW) của mức tốt nhất coi là hòa và chọn
+    基準値 cao nhất (sạc sớm), để policy liên tục theo SOC thay vì nhảy theo sai
+    số nội suy.
+    """
+    near = candidate >= candidate.max(axis=1, keepdims=True) - tolerance
+    return candidate.shape[1] - 1 - np.argmax(near[:, ::-1], axis=1)
+
+
+def _interpolation(soc_grid, resolution, soc_next):
+    """
+    SOC liên tục → vị trí nội suy trên lưới
+
+    Returns:
+        (lower, upper, weight): chỉ số 2 mức lưới kề và trọng số của mức trên.
+        SOC ngoài lưới → chỉ số đệm (value -inf)
+    """
+    n_states = len(soc_grid)
+    position = (soc_next - soc_grid[0]) / resolution
+    # Trùng mức lưới (sai số dấu phẩy động) → lấy đúng mức đó
+    snapped = np.rint(position)
+    position = np.where(np.abs(position - snapped) < SOC_TOLERANCE, snapped, position)
+    lower = np.floor(position)
+    weight = position - lower
+    outside = (position < 0) | (position > n_states - 1)
+    lower = np.where(outside, n_states, lower).astype(np.int64)
+    weight = np.where(outside, 0.0, weight)
+    return lower, lower + (weight > 0), weight
+
+
+def _future(result, value_next, k, interpolation):
+    """
+    Σ基準値 tối ưu từ SOC liên tục sau block k (nội suy tuyến tính giữa 2 mức lưới)
+
+    -inf nếu 1 trong 2 mức lưới kề ngoài [soc_min, soc_max] của block k hoặc không
+    khả thi → SOC nội suy được luôn nằm trong giới hạn.
+    """
+    soc_grid = result['soc_grid']
+    bounds = result['bounds']
+    allowed = ((soc_grid >= bounds['soc_min'][k] - 1e-9) & (soc_grid <= bounds['soc_max'][k] + 1e-9))
+    padded = np.concatenate([np.where(allowed, value_next, -np.inf), [-np.inf, -np.inf]])
+    lower, upper, weight = interpolation
+    low, high = padded[lower], padded[upper]
+    with np.errstate(invalid='ignore'):
+        future = low + weight * (high - low)
+    return np.where(np.isnan(future), -np.inf, future)
+
+
+def rollout_policy(result, soc_starts, block_hours=BLOCK_HOURS, slope=SLOPE, intercept=INTERCEPT,
+                   return_soc=False):
+    """
+    Đi xuôi theo kết quả của solve_dp cho nhiều SOC ban đầu cùng lúc
+
+    SOC được tính bằng công thức liên tục (không làm tròn về lưới); ở mỗi block
+    chọn 基準値 tốt nhất từ SOC thực bằng value của block sau (nội suy giữa 2
+    mức lưới). Khả thi = SOC liên tục thỏa result['bounds'] (giới hạn SOC, soc_end).
+
+    Args:
+        result: kết quả của solve_dp
+        soc_starts: array (N,) SOC ban đầu (%)
+        return_soc: True → trả thêm SOC trajectory
+
+    Returns:
+        (patterns, feasible[, soc]): array (N, n_blocks) 基準値 (NaN nếu không khả
+        thi), mask bool (N,), array (N, n_blocks + 1) SOC (NaN nếu không khả thi)
+    """
+    value = result['value']
+    n_blocks = value.shape[0] - 1
+
+    soc_now = np.asarray(soc_starts, dtype=np.float64).copy()
+    feasible = np.ones(len(soc_now), dtype=bool)
+    soc = np.empty((len(soc_now), n_blocks + 1))
+    soc[:, 0] = soc_now
+    patterns = np.full((len(soc_now), n_blocks), np.nan)
+    for k in range(n_blocks):
+        block_levels, soc_next = _next_soc(result, soc_now, k, block_hours, slope, intercept)
+        interpolation = _interpolation(result['soc_grid'], result['soc_resolution'], soc_next)
+        candidate = block_levels + _future(result, value[k + 1], k, interpolation)
+        best = _best(candidate, result['tie_tolerance'])
+        rows = np.arange(len(soc_now))
+        feasible &= np.isfinite(candidate[rows, best])
+        patterns[:, k] = block_levels[best]
+        soc_now = soc_next[rows, best]
+        soc[:, k + 1] = soc_now
+
+    feasible &= soc_violation(soc, **result['bounds']) <= SOC_TOLERANCE
+    patterns[~feasible] = np.nan
+    soc[~feasible] = np.nan
+    if return_soc:
+        return patterns, feasible, soc
+    return patterns, feasible
+
+
+if __name__ == '__main__':
+    import time
+
+    print("=" * 80)
+    print("🧮 DP SOLVER: PATTERN TỐI ƯU TRÊN LƯỚI SOC")
+    print("=" * 80)
+
+    scenarios = [
+        ('7 blocks, JEPX -85%', dict(n_blocks=7, jepx_delta=-85.0, soc_end=5.0)),
+        ('7 blocks, JEPX linh hoạt', dict(n_blocks=7)),
+        ('Block 1,2 không baseline, JEPX -85%',
+         dict(n_blocks=7, jepx_delta=-85.0, soc_end=5.0,
+              participating=[False, False, True, True, True, True, True],
+              soc_min=[-100, -100, 5, 5, 5, 5, 5])),
+    ]
+
+    for name, params in scenarios:
+        t0 = time.perf_counter()
+        result = solve_dp(soc_resolution=0.1, baseline_step=1.0, **params)
+        elapsed = time.perf_counter() - t0
+
+        print(f"\n📋 {name} ({elapsed*1000:.0f} ms)")
+        if result['pattern'] is None:
+            print("   ❌ Không khả thi")
+            continue
+        print(f"   Pattern: {[int(b) for b in result['pattern']]}")
+        print(f"   Σ基準値: {result['total']:.0f}kW")
+        print(f"   SOC:     {' → '.join(f'{s:.1f}' for s in result['soc'])}")
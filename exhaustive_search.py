@@ -4,8 +4,10 @@
 TÌM PATTERN TỐI ƯU BẰNG SEARCH TOÀN DIỆN
 """
 
-import numpy as np
-from itertools import product
+import time
+
+from batch_pattern_evaluator import search_grid
+from dp_solver import solve_dp
 
 print("="*80)
 print("🔍 TÌM KIẾM TOÀN DIỆN: PATTERN TỐI ƯU")
@@ -24,26 +26,6 @@ def calc_delta_soc(b):
     return (SLOPE * b + INTERCEPT) * 3
 
 
-def check_pattern(blocks):
-    """Kiểm tra pattern có hợp lệ không"""
-    soc = SOC_MIN
-    
-    for b in blocks:
-        soc += calc_delta_soc(b)
-        if soc > SOC_MAX + 0.1 or soc < SOC_MIN - 0.1:
-            return False, None
-    
-    # After JEPX - must return to 5%
-    # JEPX can discharge from any level back to 5%
-    soc_after_jepx = soc + JEPX_DELTA
-    
-    # Check cycle: must end at 5%
-    if abs(soc_after_jepx - SOC_MIN) > 0.5:
-        return False, None
-    
-    return True, sum(blocks)
-
-
 print("""
 🎯 CHIẾN LƯỢC TÌM KIẾM:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -51,6 +33,7 @@ print("""
 2. Baseline values: 0, 100, 200, ..., 2000 (step 100)
 3. Tìm pattern cho Σ(基準値) MAX
 4. Constraint: SOC ∈ [5%, 90%], cycle hoàn hảo
+5. Kiểm tra TOÀN BỘ lưới bằng batch_pattern_evaluator (không heuristic)
 """)
 
 # Simplified search: limit to reasonable values
@@ -58,98 +41,50 @@ baseline_values = list(range(0, 2100, 100))  # 0, 100, 200, ..., 2000
 
 print(f"\nBaseline values: {baseline_values[0]} to {baseline_values[-1]} (step 100)")
 print(f"Total combinations: {len(baseline_values)**7:,}")
-print("\n⚠️  Quá nhiều! Sẽ dùng heuristic search...\n")
 
-# Heuristic: Start with high values, then adjust
-print("="*80)
-print("🔬 HEURISTIC SEARCH")
-print("="*80)
+print("\n" + "=" * 80)
+print("🔬 FULL GRID SEARCH (VECTORIZED)")
+print("=" * 80)
+
+t0 = time.perf_counter()
+result = search_grid(baseline_values, n_blocks=7, soc_start=SOC_MIN,
+                     soc_min=SOC_MIN, soc_max=SOC_MAX, jepx_delta=JEPX_DELTA,
+                     end_tolerance=0.5, bound_tolerance=0.1,
+                     slope=SLOPE, intercept=INTERCEPT)
+elapsed = time.perf_counter() - t0
+
+print(f"\n   Đã kiểm tra: {result['n_evaluated']:,} combinations "
+      f"({result['n_expanded']:,} prefixes thực sự tính)")
+print(f"   Hợp lệ:      {result['n_feasible']:,}")
+print(f"   Thời gian:   {elapsed:.2f}s")
 
 best_pattern = None
 best_total = 0
 
-# Strategy 1: Try patterns with front-loading
-print("\n1️⃣  Testing front-load patterns (1 big block + smaller fills)...")
-
-for big in range(1500, 2100, 100):
-    for small in range(0, 1000, 100):
-        # Pattern: [big, small, small, small, small, small, small]
-        pattern = [big] + [small] * 6
-        valid, total = check_pattern(pattern)
-        
-        if valid and total > best_total:
-            best_total = total
-            best_pattern = pattern
-            print(f"   ✅ Found: {pattern} = {total}kW")
-
-# Strategy 2: Try wave patterns
-print("\n2️⃣  Testing wave patterns (up-down-up-down)...")
-
-for peak in range(1000, 2100, 200):
-    for valley in range(0, 600, 100):
-        # Pattern: [peak, valley, peak, valley, peak, valley, peak]
-        pattern = []
-        for i in range(7):
-            pattern.append(peak if i % 2 == 0 else valley)
-        
-        valid, total = check_pattern(pattern)
-        
-        if valid and total > best_total:
-            best_total = total
-            best_pattern = pattern
-            print(f"   ✅ Found: {pattern} = {total}kW")
-
-# Strategy 3: Try with 0kW blocks (self-discharge)
-print("\n3️⃣  Testing patterns with 0kW blocks (self-discharge)...")
-
-for big in range(1800, 2100, 100):
-    for fill in range(400, 1200, 100):
-        # Pattern: [big, 0, fill, 0, fill, 0, fill]
-        pattern = [big, 0, fill, 0, fill, 0, fill]
-        valid, total = check_pattern(pattern)
-        
-        if valid and total > best_total:
-            best_total = total
-            best_pattern = pattern
-            print(f"   ✅ Found: {pattern} = {total}kW")
-
-# Strategy 4: Try gradient patterns
-print("\n4️⃣  Testing gradient patterns (decreasing or increasing)...")
-
-for start in range(1000, 2100, 200):
-    for step in range(-300, 300, 100):
-        pattern = []
-        val = start
-        for i in range(7):
-            pattern.append(max(0, min(2000, val)))
-            val += step
-        
-        valid, total = check_pattern(pattern)
-        
-        if valid and total > best_total:
-            best_total = total
-            best_pattern = pattern
-            print(f"   ✅ Found: {pattern} = {total}kW")
-
-# Strategy 5: Random targeted search around promising areas
-print("\n5️⃣  Testing random variations around best pattern...")
-
-if best_pattern:
-    np.random.seed(42)
-    for _ in range(1000):
-        # Create variation
-        pattern = []
-        for b in best_pattern:
-            variation = np.random.randint(-200, 200, step=100)
-            new_val = max(0, min(2000, b + variation))
-            pattern.append(new_val)
-        
-        valid, total = check_pattern(pattern)
-        
-        if valid and total > best_total:
-            best_total = total
-            best_pattern = pattern
-            print(f"   ✅ Found: {pattern} = {total}kW")
+if result['best_pattern'] is not None:
+    best_pattern = [int(b) for b in result['best_pattern']]
+    best_total = sum(best_pattern)
+    print(f"   ✅ Found: {best_pattern} = {best_total}kW")
+
+print("\n" + "=" * 80)
+print("🧮 DP TRÊN LƯỚI (SOC 0.1%, 基準値 1kW, kiểm tra lại bằng SOC liên tục)")
+print("=" * 80)
+
+t0 = time.perf_counter()
+dp_result = solve_dp(n_blocks=7, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                     soc_resolution=0.1, baseline_step=1.0,
+                     jepx_delta=JEPX_DELTA, soc_end=SOC_MIN, end_tolerance=0.5,
+                     slope=SLOPE, intercept=INTERCEPT)
+elapsed = time.perf_counter() - t0
+
+print(f"\n   Thời gian:   {elapsed*1000:.0f}ms")
+
+if dp_result['pattern'] is not None:
+    dp_pattern = [int(b) for b in dp_result['pattern']]
+    print(f"   ✅ DP: {dp_pattern} = {sum(dp_pattern)}kW")
+    if sum(dp_pattern) > best_total:
+        best_pattern = dp_pattern
+        best_total = sum(dp_pattern)
 
 print("\n" + "="*80)
 print("🏆 KẾT QUẢ CUỐI CÙNG")
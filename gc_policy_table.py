@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ゲートクローズ(GC)時の基準値決定ポリシーテーブル
+
+kansai_patent_formula_example.calculate_kansai_baseline は
+特許 JP 7377392 の式 B_{n+1}Ref = (X - (B_n SOC_N + B_n Ref × (T-N))) / T を
+1回ずつ計算する。本モジュールは同じ情報
+    (次ブロック, GC時の実測SOC, 前ブロックの基準値)
+から DP の最適ポリシーを事前計算した配列を作り、ブロック開始1時間前の判断を
+配列参照1回（マイクロ秒）にする。複数蓄電池（フリート）の一括参照にも対応。
+"""
+
+import numpy as np
+
+from dp_solver import solve_dp
+from parametric_schedule import load_schedule_table, save_schedule_table
+from soc_model import INTERCEPT, SLOPE, delta_soc
+
+# SOC制限
+SOC_MIN = 5.0
+SOC_MAX = 90.0
+
+# 基準値制限
+BASELINE_MIN = 0
+BASELINE_MAX = 2000
+
+BLOCK_HOURS = 3.0
+GATE_CLOSE_HOURS = 1.0  # ブロック開始の1時間前にGC
+
+
+def build_gc_policy_table(n_blocks=8, soc_step=0.5, baseline_step=10.0,
+                          gate_close_hours=GATE_CLOSE_HOURS,
+                          soc_min=SOC_MIN, soc_max=SOC_MAX,
+                          baseline_min=BASELINE_MIN, baseline_max=BASELINE_MAX,
+                          block_hours=BLOCK_HOURS, slope=SLOPE, intercept=INTERCEPT,
+                          **dp_kwargs):
+    """
+    ポリシーテーブルをオフラインで作成する
+
+    GC時点では前ブロックの残り gate_close_hours 時間が B_n Ref で動くので、
+    次ブロック開始時のSOCを
+        SOC_start = SOC_GC + (SLOPE × B_n Ref + INTERCEPT) × gate_close_hours
+    で予測し、DPポリシー（次ブロック, SOC_start）の基準値を格納する。
+
+    Args:
+        n_blocks: 1日のブロック数
+        soc_step: 実測SOC軸の刻み [%]（0〜100%）
+        baseline_step: 前ブロック基準値軸の刻み [kW]
+        gate_close_hours: GCからブロック開始までの時間 [h]
+        **dp_kwargs: solve_dp に渡す追加パラメータ（soc_end, participating,
+            fixed_delta 等）。終端条件なしでは各ブロックの基準値が一意に決まらない
+            ので、実運用と同じ終端条件（JEPX後のSOC）を与える。同点の基準値は
+            dp_solver の規則で最も高いものを選ぶ
+
+    Returns:
+        dict:
+            'soc_axis': 実測SOC軸 (S,)
+            'baseline_axis': 前ブロック基準値軸 (P,)
+            'policy': float32 (n_blocks, S, P) 次ブロックの基準値 [kW]（実行不可能は NaN）
+            'gate_close_hours': GC時間
+    """
+    soc_axis = np.arange(0.0, 100.0 + 1e-9, soc_step)
+    baseline_axis = np.arange(baseline_min, baseline_max + 1e-9, baseline_step)
+
+    result = solve_dp(n_blocks=n_blocks, soc_min=soc_min, soc_max=soc_max,
+                      baseline_min=baseline_min, baseline_max=baseline_max,
+                      grid_range=(0.0, 100.0), block_hours=block_hours,
+                      slope=slope, intercept=intercept, **dp_kwargs)
+    soc_grid = result['soc_grid']
+    resolution = result['soc_resolution']
+
+    # (S, P) の次ブロック開始時SOC → DPのSOC状態インデックス
+    soc_start = (soc_axis[:, np.newaxis] +
+                 delta_soc(baseline_axis[np.newaxis, :], gate_close_hours, slope=slope, intercept=intercept))
+    state = np.rint((soc_start - soc_grid[0]) / resolution).astype(np.int64)
+    inside = (state >= 0) & (state < len(soc_grid))
+    state = np.clip(state, 0, len(soc_grid) - 1)
+
+    policy = np.where(inside[np.newaxis], result['policy'][:, state], np.nan).astype(np.float32)
+
+    return {
+        'soc_axis': soc_axis,
+        'baseline_axis': baseline_axis,
+        'policy': policy,
+        'gate_close_hours': np.float64(gate_close_hours),
+    }
+
+
+def lookup_gc_baseline(table, block, soc_gc, previous_baseline):
+    """
+    GC時の基準値を参照する（スカラーでも配列でも可、フリート一括参照）
+
+    Args:
+        table: build_gc_policy_table / load_gc_policy_table の結果
+        block: 次ブロック番号 (1..n_blocks)
+        soc_gc: GC時の実測SOC [%]
+        previous_baseline: 前ブロックの基準値 B_n Ref [kW]
+
+    Returns:
+        次ブロックの基準値 [kW]（入力と同じ形状、実行不可能は NaN）
+    """
+    soc_axis = table['soc_axis']
+    baseline_axis = table['baseline_axis']
+
+    soc_step = soc_axis[1] - soc_axis[0]
+    baseline_step = baseline_axis[1] - baseline_axis[0]
+
+    # 単体参照: NumPy のオーバーヘッドを避けてPythonの演算で添字を計算
+    if np.ndim(block) == 0 and np.ndim(soc_gc) == 0 and np.ndim(previous_baseline) == 0:
+        i = min(max(round((soc_gc - soc_axis[0]) / soc_step), 0), len(soc_axis) - 1)
+        j = min(max(round((previous_baseline - baseline_axis[0]) / baseline_step), 0),
+                len(baseline_axis) - 1)
+        return table['policy'][int(block) - 1, int(i), int(j)]
+
+    b = np.asarray(block, dtype=np.int64) - 1
+    i = np.clip(np.rint((np.asarray(soc_gc, dtype=np.float64) - soc_axis[0]) / soc_step),
+                0, len(soc_axis) - 1).astype(np.int64)
+    j = np.clip(np.rint((np.asarray(previous_baseline, dtype=np.float64) - baseline_axis[0]) / baseline_step),
+                0, len(baseline_axis) - 1).astype(np.int64)
+
+    return table['policy'][b, i, j]
+
+
+def save_gc_policy_table(table, path):
+    """テーブルを .npz に保存"""
+    save_schedule_table(table, path)
+
+
+def load_gc_policy_table(path):
+    """テーブルを .npz から読み込み"""
+    return load_schedule_table(path)
+
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 80)
+    print("ゲートクローズ時 基準値ポリシーテーブル")
+    print("=" * 80)
+
+    # ブロック1〜7に基準値、ブロック8でJEPX -75%、JEPX後のSOCは5%
+    t0 = time.perf_counter()
+    table = build_gc_policy_table(participating=[True] * 7 + [False],
+                                  fixed_delta=[np.nan] * 7 + [-75.0], soc_end=SOC_MIN)
+    elapsed = time.perf_counter() - t0
+
+    n_blocks, n_soc, n_baseline = table['policy'].shape
+    print(f"\n作成: {n_blocks} ブロック × {n_soc} SOC × {n_baseline} 基準値 "
+          f"({table['policy'].nbytes / 1e6:.1f} MB, {elapsed:.2f}秒)")
+
+    output_file = 'gc_policy_table.npz'
+    save_gc_policy_table(table, output_file)
+    table = load_gc_policy_table(output_file)
+    print(f"保存: {output_file}")
+
+    print("\n【単体参照】")
+    for block, soc, prev in [(3, 20.0, 0.0), (5, 55.0, 1000.0), (7, 80.0, 500.0)]:
+        t0 = time.perf_counter()
+        baseline = lookup_gc_baseline(table, block, soc, prev)
+        elapsed = time.perf_counter() - t0
+        print(f"  ブロック{block}  SOC_GC={soc:5.1f}%  B_n={prev:6.0f}kW  →  "
+              f"B_n+1={float(baseline):7.0f}kW  ({elapsed*1e6:.1f} µs)")
+
+    print("\n【フリート一括参照】")
+    rng = np.random.default_rng(0)
+    n_batteries = 100_000
+    blocks = rng.integers(1, n_blocks + 1, n_batteries)
+    socs = rng.uniform(5, 90, n_batteries)
+    prevs = rng.uniform(0, 2000, n_batteries)
+
+    t0 = time.perf_counter()
+    baselines = lookup_gc_baseline(table, blocks, socs, prevs)
+    elapsed = time.perf_counter() - t0
+    print(f"  {n_batteries:,} 台: {elapsed*1000:.1f} ms "
+          f"({elapsed / n_batteries * 1e9:.0f} ns/台), 実行不可能 {np.isnan(baselines).sum():,} 台")
@@ -4,6 +4,8 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 
+from soc_model import get_model
+
 def calculate_optimal_baseline_smart(current_soc, target_soc_max=90, block_hours=3):
     """
     現在のSOCから最適な基準値を計算（90%制約付き）
@@ -25,9 +27,9 @@ def calculate_optimal_baseline_smart(current_soc, target_soc_max=90, block_hours
         予想される到達SOC (%)
     """
     
-    # 線形回帰式: SOC変化率 = 0.012804 × 基準値 - 1.9515 (%/時間)
-    SLOPE = 0.012804
-    INTERCEPT = -1.9515
+    # 線形回帰式: SOC変化率 = 0.012804 × 基準値 - 1.9515 (%/時間)（soc_model の kotohira/v1）
+    model = get_model('kotohira', 'v1')
+    SLOPE, INTERCEPT = model['slope'], model['intercept']
     
     # SOCが既に90%以上の場合
     if current_soc >= target_soc_max:
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BACKTEST CHÍNH SÁCH LẬP LỊCH TRÊN DỮ LIỆU THỰC TẾ
+
+Phát lại từng ngày lịch sử (琴平 2025-08→nay, 荒尾 2024-06→2025-04) theo
+từng block 3 giờ:
+- SOC đầu ngày = SOC thực đo lúc 00:00
+- Chính sách quyết định 基準値 từng block; SOC sau block dự đoán bằng soc_model.
+  closed_loop=True: mỗi block bắt đầu lại từ SOC thực đo (như vận hành thật)
+- Chấm điểm mỗi ngày: Σ基準値, số block vượt giới hạn SOC, độ lệch SOC dự đoán
+  so với thực tế (RMSE), độ lệch 基準値 so với 基準値 thực tế (nếu có)
+
+Chính sách:
+- daily_optimizer: luật mục tiêu của daily_schedule_optimizer.py
+- realistic: lịch thực tế của realistic_scheduler.py
+- balanced / morning_charge / evening_charge / maintain: new_day_scheduler.py
+  (SOC mục tiêu cuối ngày = SOC đầu ngày)
+- kansai_gc: luật GC của 関西電力 (特許 JP 7377392 B1, 式1): tại GC (1 giờ trước
+  block) dự đoán SOC đầu block từ SOC tại GC và B_n Ref, rồi chọn B_{n+1} Ref để
+  tới SOC mục tiêu (mặc định SOC_MAX) cuối block
+- actual: 基準値 thực tế (chỉ 琴平), để so sánh
+
+Mỗi chính sách được tính vector hóa cho cả khối ngày; các khối (chính sách ×
+khoảng ngày) chạy song song trên process pool.
+
+    python historical_backtest.py kotohira arao --closed-loop --workers 8
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import soc_model
+from daily_schedule_optimizer import block_soc_target
+from new_day_scheduler import strategy_soc_targets
+from realistic_scheduler import realistic_soc_targets
+
+# Giới hạn (giống các scheduler)
+SOC_MIN = 10
+SOC_MAX = 90
+BASELINE_MIN = 0
+BASELINE_MAX = 2000
+
+N_BLOCKS = 8
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+GATE_CLOSE_HOURS = 1.0
+
+# SOC thực đo cách mốc thời gian quá khoảng này thì coi như thiếu dữ liệu
+MAX_GAP = np.timedelta64(10, 'm')
+
+# Bảng block của worker (gán 1 lần trong _init_worker)
+_UNITS = None
+
+
+# ============================================================================
+# DỮ LIỆU THỰC TẾ → BẢNG (NGÀY × BLOCK)
+# ============================================================================
+
+def _value_at(times, values, at, max_gap=MAX_GAP):
+    """Giá trị mẫu gần nhất trước hoặc đúng thời điểm `at` (NaN nếu cách quá max_gap)"""
+    index = np.searchsorted(times, at, side='right') - 1
+    safe = np.clip(index, 0, len(times) - 1)
+    valid = (index >= 0) & (at - times[safe] <= max_gap)
+    return np.where(valid, values[safe], np.nan)
+
+
+def block_table(times, soc, baseline_times=None, baselines=None, block_hours=BLOCK_HOURS,
+                gate_close_hours=GATE_CLOSE_HOURS, max_gap=MAX_GAP):
+    """
+    Chuỗi SOC theo phút → bảng theo ngày × block
+
+    Args:
+        times, soc: thời điểm và SOC thực đo (%)
+        baseline_times, baselines: 基準値 thực tế (kW) theo thời gian, None = không có
+
+    Returns:
+        dict:
+            'days': array (D,) datetime64[D]
+            'soc': array (D, N_BLOCKS + 1) SOC thực đo tại đầu mỗi block và 24:00
+            'soc_gc': array (D, N_BLOCKS) SOC thực đo tại GC (gate_close_hours trước block)
+            'baseline': array (D, N_BLOCKS) 基準値 thực tế trung bình của block (NaN = không có)
+    """
+    times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]')
+    soc = np.asarray(soc, dtype=np.float64)
+    ok = ~np.isnan(soc) & ~np.isnat(times)
+    order = np.argsort(times[ok], kind='stable')
+    times, soc = times[ok][order], soc[ok][order]
+
+    block = np.timedelta64(int(block_hours * 3600), 's')
+    gate = np.timedelta64(int(gate_close_hours * 3600), 's')
+    days = np.unique(times.astype('datetime64[D]'))
+    starts = days.astype('datetime64[ns]')[:, np.newaxis] + block * np.arange(N_BLOCKS + 1)
+
+    table = {
+        'days': days,
+        'soc': _value_at(times, soc, starts, max_gap),
+        'soc_gc': _value_at(times, soc, starts[:, :N_BLOCKS] - gate, max_gap),
+        'baseline': np.full((len(days), N_BLOCKS), np.nan),
+    }
+
+    if baselines is not None:
+        b_times = pd.to_datetime(pd.Series(baseline_times)).to_numpy(dtype='datetime64[ns]')
+        b_values = np.asarray(baselines, dtype=np.float64)
+        ok = ~np.isnan(b_values) & ~np.isnat(b_times)
+        b_times, b_values = b_times[ok], b_values[ok]
+        if len(b_values):
+            # Số thứ tự block toàn cục kể từ ngày đầu → trung bình bằng bincount
+            origin = days[0].astype('datetime64[ns]')
+            index = ((b_times - origin) // block).astype(np.int64)
+            keep = index >= 0
+            index, b_values = index[keep], b_values[keep]
+            total = np.bincount(index, weights=b_values)
+            count = np.bincount(index)
+            wanted = ((days - days[0]).astype(np.int64)[:, np.newaxis] * N_BLOCKS +
+                      np.arange(N_BLOCKS))
+            inside = wanted < len(count)
+            safe = np.where(inside, wanted, 0)
+            table['baseline'] = np.where(inside & (count[safe] > 0),
+                                         total[safe] / np.maximum(count[safe], 1), np.nan)
+    return table
+
+
+def load_units(site, start=None, end=None):
+    """
+    Đọc dữ liệu thực tế của 1 site → list đơn vị (琴平: 1, 荒尾: mỗi 蓄電池 1 đơn vị)
+
+    Returns:
+        list of dict: 'site', 'unit', 'table' (block_table)
+    """
+    from batch_daily_report import load_arao, load_kotohira
+
+    def clip(df, column):
+        if start is not None:
+            df = df[df[column] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[column] < pd.Timestamp(end) + pd.Timedelta(days=1)]
+        return df
+
+    units = []
+    if site == 'kotohira':
+        data = clip(load_kotohira()['data'][0], 'timestamp')
+        table = block_table(data['timestamp'], data['battery_soc_percent'],
+                            data['timestamp'], data['demand_plan_kw_baseline'])
+        units.append({'site': site, 'unit': '琴平', 'table': table})
+    elif site == 'arao':
+        soc = clip(load_arao()['soc'][0], '時刻')
+        for battery, part in soc.groupby('蓄電池名', sort=True):
+            units.append({'site': site, 'unit': battery,
+                          'table': block_table(part['時刻'], part['SOC'])})
+    else:
+        raise ValueError(f"Site không hỗ trợ: {site}")
+    return units
+
+
+# ============================================================================
+# CHÍNH SÁCH: policy(k, soc_now, ctx) → 基準値 block k cho mọi ngày (D,)
+# ============================================================================
+
+def _required(soc_now, target, ctx, baseline_max=BASELINE_MAX):
+    return soc_model.required_baseline(soc_now, target, ctx['block_hours'], ctx['model'],
+                                       baseline_min=BASELINE_MIN, baseline_max=baseline_max)
+
+
+def _strategy_policy(strategy):
+    def policy(k, soc_now, ctx):
+        if k == 0:
+            ctx['targets'] = strategy_soc_targets(ctx['soc_initial'], ctx['soc_initial'], strategy)
+        return _required(soc_now, ctx['targets'][k], ctx)
+    return policy
+
+
+def policy_realistic(k, soc_now, ctx):
+    if k == 0:
+        ctx['targets'] = realistic_soc_targets(ctx['soc_initial'])
+    return _required(soc_now, ctx['targets'][k], ctx)
+
+
+def policy_daily_optimizer(k, soc_now, ctx):
+    # find_optimal_baseline của daily_schedule_optimizer chỉ chặn dưới (không âm)
+    return _required(soc_now, block_soc_target(k, soc_now), ctx, baseline_max=None)
+
+
+def policy_kansai_gc(k, soc_now, ctx):
+    previous = ctx['previous']
+    hours = ctx['gate_close_hours']
+    # SOC tại GC: thực đo khi closed_loop, ngược lại suy từ SOC dự đoán đầu block
+    estimated = soc_now - soc_model.delta_soc(previous, hours, ctx['model'])
+    soc_gc = ctx['soc_gc'][:, k] if ctx['closed_loop'] else estimated
+    soc_gc = np.where(np.isnan(soc_gc), estimated, soc_gc)
+    soc_start = soc_model.predict_soc(soc_gc, previous, hours, ctx['model'])
+    return _required(soc_start, ctx['kansai_target'], ctx)
+
+
+def policy_actual(k, soc_now, ctx):
+    return ctx['baseline_actual'][:, k]
+
+
+POLICIES = {
+    'daily_optimizer': policy_daily_optimizer,
+    'realistic': policy_realistic,
+    'balanced': _strategy_policy('balanced'),
+    'morning_charge': _strategy_policy('morning_charge'),
+    'evening_charge': _strategy_policy('evening_charge'),
+    'maintain': _strategy_policy('maintain'),
+    'kansai_gc': policy_kansai_gc,
+    'actual': policy_actual,
+}
+
+
+# ============================================================================
+# PHÁT LẠI
+# ============================================================================
+
+def replay(table, policy, closed_loop=False, model=None, previous=None, soc_min=SOC_MIN,
+           soc_max=SOC_MAX, kansai_target=SOC_MAX, block_hours=BLOCK_HOURS,
+           gate_close_hours=GATE_CLOSE_HOURS):
+    """
+    Phát lại 1 chính sách trên các ngày của bảng (vector hóa theo ngày)
+
+    Args:
+        table: block_table (có thể là lát cắt theo ngày)
+        policy: tên trong POLICIES hoặc hàm policy(k, soc_now, ctx)
+        closed_loop: True = mỗi block bắt đầu từ SOC thực đo (nếu có)
+        model: mô hình soc_model (None = mặc định)
+        previous: 基準値 block cuối của ngày trước (D,) cho B_n Ref của block 1
+            (None = lấy từ table['baseline'] dời 1 ngày)
+
+    Returns:
+        dict các array (D,): 'total', 'violations', 'max_violation', 'soc_rmse',
+        'baseline_mae', 'soc_end', và 'baselines', 'soc' (D, N_BLOCKS)
+    """
+    policy = POLICIES[policy] if isinstance(policy, str) else policy
+    actual = table['soc']
+    n_days = len(actual)
+    if previous is None:
+        previous = np.concatenate([[np.nan], table['baseline'][:-1, -1]])
+
+    ctx = {
+        'soc_initial': actual[:, 0],
+        'soc_gc': table['soc_gc'],
+        'baseline_actual': table['baseline'],
+        'previous': np.nan_to_num(np.asarray(previous, dtype=np.float64)),
+        'closed_loop': closed_loop,
+        'model': model,
+        'kansai_target': kansai_target,
+        'block_hours': block_hours,
+        'gate_close_hours': gate_close_hours,
+    }
+
+    baselines = np.full((n_days, N_BLOCKS), np.nan)
+    predicted = np.full((n_days, N_BLOCKS), np.nan)
+    soc_now = actual[:, 0].copy()
+    for k in range(N_BLOCKS):
+        if closed_loop and k > 0:
+            soc_now = np.where(np.isnan(actual[:, k]), soc_now, actual[:, k])
+        b = np.broadcast_to(np.asarray(policy(k, soc_now, ctx), dtype=np.float64), (n_days,))
+        soc_now = soc_model.predict_soc(soc_now, b, block_hours, model)
+        baselines[:, k] = b
+        predicted[:, k] = soc_now
+        ctx['previous'] = np.nan_to_num(b)
+
+    excess = np.maximum(np.maximum(soc_min - predicted, predicted - soc_max), 0.0)
+    with warnings.catch_warnings():
+        # Ngày không có SOC / 基準値 thực tế → NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        soc_rmse = np.sqrt(np.nanmean((predicted - actual[:, 1:]) ** 2, axis=1))
+        baseline_mae = np.nanmean(np.abs(baselines - table['baseline']), axis=1)
+
+    return {
+        'total': baselines.sum(axis=1),
+        'violations': (excess > 1e-9).sum(axis=1),
+        'max_violation': np.where(np.isnan(predicted).all(axis=1), np.nan, np.nanmax(
+            np.where(np.isnan(predicted), 0.0, excess), axis=1)),
+        'soc_rmse': soc_rmse,
+        'baseline_mae': baseline_mae,
+        'soc_end': predicted[:, -1],
+        'baselines': baselines,
+        'soc': predicted,
+    }
+
+
+def _init_worker(units, settings):
+    global _UNITS
+    _UNITS = (units, settings)
+
+
+def _replay_chunk(task):
+    """Phát lại 1 chính sách trên khoảng ngày [lo, hi) của 1 đơn vị (chạy trong worker)"""
+    units, settings = _UNITS
+    u, name, lo, hi = task
+    full = units[u]['table']
+    table = {key: value[lo:hi] for key, value in full.items()}
+    # B_n Ref của block 1 = block cuối ngày liền trước (nếu đúng là ngày liền trước)
+    previous = np.full(hi - lo, np.nan)
+    before = np.arange(lo, hi) - 1
+    consecutive = (before >= 0) & (full['days'][np.maximum(before, 0)] ==
+                                   full['days'][lo:hi] - np.timedelta64(1, 'D'))
+    previous[consecutive] = full['baseline'][before[consecutive], -1]
+    return u, name, lo, hi, replay(table, name, previous=previous, **settings)
+
+
+def run_backtest(units, policies=None, closed_loop=False, workers=None, chunk_days=None,
+                 model=None, **settings):
+    """
+    Backtest mọi chính sách trên mọi đơn vị, song song theo khối ngày
+
+    Args:
+        units: list từ load_units (hoặc dict 'site', 'unit', 'table' tự tạo)
+        policies: list tên chính sách (None = tất cả; 'actual' chỉ khi có 基準値 thực tế)
+        closed_loop: xem replay
+        workers: số tiến trình (None = số CPU, 1 = tuần tự)
+        chunk_days: số ngày mỗi task (None = tự chọn)
+        **settings: soc_min, soc_max, kansai_target, ... (xem replay)
+
+    Returns:
+        DataFrame 1 dòng / (đơn vị, chính sách, ngày); attrs['elapsed']
+    """
+    t0 = time.perf_counter()
+    policies = list(policies or POLICIES)
+    settings = dict(settings, closed_loop=closed_loop, model=model)
+    workers = workers or os.cpu_count() or 1
+
+    # Bỏ ngày không có SOC đầu ngày
+    units = [dict(unit, table={key: value[~np.isnan(unit['table']['soc'][:, 0])]
+                               for key, value in unit['table'].items()})
+             for unit in units]
+
+    tasks = []
+    for u, unit in enumerate(units):
+        n_days = len(unit['table']['days'])
+        has_actual = not np.isnan(unit['table']['baseline']).all()
+        size = chunk_days or max(1, -(-n_days // max(1, workers)))
+        for name in policies:
+            if name == 'actual' and not has_actual:
+                continue
+            tasks.extend((u, name, lo, min(lo + size, n_days)) for lo in range(0, n_days, size))
+
+    if workers == 1:
+        _init_worker(units, settings)
+        results = [_replay_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(units, settings)) as pool:
+            results = list(pool.map(_replay_chunk, tasks))
+
+    frames = []
+    for u, name, lo, hi, result in results:
+        unit = units[u]
+        frame = pd.DataFrame({
+            'site': unit['site'],
+            'unit': unit['unit'],
+            'policy': name,
+            'date': pd.to_datetime(unit['table']['days'][lo:hi]),
+            'soc_start': unit['table']['soc'][lo:hi, 0],
+            'soc_end_actual': unit['table']['soc'][lo:hi, -1],
+        })
+        for key in ('total', 'violations', 'max_violation', 'soc_rmse', 'baseline_mae', 'soc_end'):
+            frame[key] = result[key]
+        frames.append(frame)
+
+    result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    result.attrs['elapsed'] = time.perf_counter() - t0
+    return result
+
+
+def summarize(result):
+    """Tổng hợp theo (site, đơn vị, chính sách)"""
+    summary = result.groupby(['site', 'unit', 'policy'], sort=False).agg(
+        days=('date', 'size'),
+        total_mean=('total', 'mean'),
+        violation_days=('violations', lambda v: (v > 0).mean() * 100),
+        violations=('violations', 'sum'),
+        max_violation=('max_violation', 'max'),
+        soc_rmse=('soc_rmse', 'mean'),
+        baseline_mae=('baseline_mae', 'mean'),
+    )
+    return summary.reset_index()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest chính sách lập lịch trên dữ liệu thực tế')
+    parser.add_argument('sites', nargs='+', choices=['kotohira', 'arao'])
+    parser.add_argument('--policies', nargs='+', choices=sorted(POLICIES), default=None)
+    parser.add_argument('--closed-loop', action='store_true',
+                        help='mỗi block bắt đầu từ SOC thực đo')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='backtest_results.csv')
+    args = parser.parse_args()
+
+    print('=' * 100)
+    print('📼 BACKTEST TRÊN DỮ LIỆU THỰC TẾ')
+    print('=' * 100)
+
+    t0 = time.perf_counter()
+    units = [unit for site in args.sites for unit in load_units(site, args.start, args.end)]
+    print(f'\nĐọc dữ liệu: {len(units)} đơn vị, {time.perf_counter() - t0:.1f} giây')
+
+    result = run_backtest(units, policies=args.policies, closed_loop=args.closed_loop,
+                          workers=args.workers)
+    print(f"Backtest: {len(result):,} (đơn vị × chính sách × ngày), "
+          f"{result.attrs['elapsed']:.1f} giây\n")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(summarize(result).round(2).to_string(index=False))
+
+    result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f'\n✅ Đã lưu: {args.output}')
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ENGINE LP/MILP TỔNG QUÁT CHO LỊCH 基準値 NGÀY HÔM SAU
+
+Gộp các trường hợp đặc biệt của optimal_block12_allow_below5.py,
+optimal_without_block12.py, optimal_6h_to_18h.py, no_block12_no_jepx_analysis.py
+và final_jepx_optimization.py vào 1 engine:
+- Block tham gia (có 基準値), block JEPX (ΔSOC cố định hoặc linh hoạt), block nghỉ
+- Giới hạn SOC riêng cho từng block
+- 基準値 liên tục (LP) hoặc theo bước rời rạc (MILP)
+- Điều kiện cuối: SOC cố định, tự do, hoặc chu kỳ (SOC cuối = SOC đầu)
+
+Ma trận ràng buộc (sparse) chỉ phụ thuộc cấu trúc block nên được build 1 lần
+bằng build_schedule_problem, sau đó solve_schedule giải mọi kịch bản SOC.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from soc_model import INTERCEPT, SLOPE
+
+# Giới hạn SOC
+SOC_MIN = 5.0
+SOC_MAX = 90.0
+
+# Giới hạn 基準値
+BASELINE_MIN = 0
+BASELINE_MAX = 2000
+
+BLOCK_HOURS = 3.0
+
+
+def _per_block(value, n_blocks):
+    """Scalar hoặc list → array (n_blocks,)"""
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim == 0:
+        value = np.full(n_blocks, float(value))
+    if len(value) != n_blocks:
+        raise ValueError(f"Cần {n_blocks} giá trị, nhận {len(value)}")
+    return value
+
+
+def build_schedule_problem(n_blocks=8, participating=(1, 2, 3, 4, 5, 6, 7),
+                           jepx_blocks=None, idle_delta=0.0,
+                           baseline_min=BASELINE_MIN, baseline_max=BASELINE_MAX,
+                           baseline_step=None, jepx_min_delta=-100.0,
+                           cyclic=False, block_hours=BLOCK_HOURS,
+                           slope=SLOPE, intercept=INTERCEPT):
+    """
+    Build cấu trúc bài toán (ma trận SOC tích lũy dạng sparse)
+
+    Args:
+        n_blocks: số block trong ngày
+        participating: số thứ tự block (1..n_blocks) có 基準値
+        jepx_blocks: dict {block: ΔSOC}. ΔSOC = None → JEPX linh hoạt
+            (biến ΔSOC ∈ [jepx_min_delta, 0])
+        idle_delta: ΔSOC của block không tham gia, không JEPX
+            (scalar hoặc dict {block: ΔSOC}), mặc định 0
+        baseline_min, baseline_max: giới hạn 基準値 (kW)
+        baseline_step: None = LP liên tục, số = MILP với 基準値 là bội số của bước này
+        jepx_min_delta: ΔSOC nhỏ nhất của JEPX linh hoạt (%)
+        cyclic: True = SOC ban đầu là biến và SOC cuối = SOC ban đầu
+        block_hours: số giờ mỗi block
+
+    Returns:
+        dict mô tả bài toán, truyền cho solve_schedule
+    """
+    participating = sorted(int(b) for b in participating)
+    jepx_blocks = dict(jepx_blocks or {})
+    overlap = set(participating) & set(jepx_blocks)
+    if overlap:
+        raise ValueError(f"Block vừa tham gia vừa JEPX: {sorted(overlap)}")
+
+    flexible = sorted(b for b, d in jepx_blocks.items() if d is None)
+
+    # ΔSOC cố định của từng block (không phụ thuộc biến)
+    const_delta = np.zeros(n_blocks)
+    for k in range(1, n_blocks + 1):
+        if k in participating:
+            const_delta[k - 1] = intercept * block_hours
+        elif k in jepx_blocks:
+            const_delta[k - 1] = jepx_blocks[k] or 0.0
+        elif isinstance(idle_delta, dict):
+            const_delta[k - 1] = idle_delta.get(k, 0.0)
+        else:
+            const_delta[k - 1] = idle_delta
+
+    # Biến: [基準値 (hoặc số bước) của block tham gia, ΔSOC JEPX linh hoạt, SOC ban đầu]
+    scale = 1.0 if baseline_step is None else float(baseline_step)
+    n_vars = len(participating) + len(flexible) + (1 if cyclic else 0)
+
+    rows, cols, vals = [], [], []
+    for j, block in enumerate(participating):
+        for k in range(block - 1, n_blocks):
+            rows.append(k)
+            cols.append(j)
+            vals.append(slope * block_hours * scale)
+    for j, block in enumerate(flexible, start=len(participating)):
+        for k in range(block - 1, n_blocks):
+            rows.append(k)
+            cols.append(j)
+            vals.append(1.0)
+    if cyclic:
+        for k in range(n_blocks):
+            rows.append(k)
+            cols.append(n_vars - 1)
+            vals.append(1.0)
+
+    # soc_matrix @ x + soc_offset + soc_start = SOC sau mỗi block
+    soc_matrix = sparse.csr_matrix((vals, (rows, cols)), shape=(n_blocks, n_vars))
+    soc_offset = np.cumsum(const_delta)
+
+    # Ràng buộc chu kỳ: SOC cuối - SOC ban đầu = 0
+    cycle_row = None
+    if cyclic:
+        cycle_row = soc_matrix[n_blocks - 1].toarray().ravel()
+        cycle_row[-1] -= 1.0
+        cycle_row = sparse.csr_matrix(cycle_row)
+
+    lower = np.zeros(n_vars)
+    upper = np.zeros(n_vars)
+    integrality = np.zeros(n_vars)
+    n_part = len(participating)
+    if baseline_step is None:
+        lower[:n_part] = baseline_min
+        upper[:n_part] = baseline_max
+    else:
+        lower[:n_part] = np.ceil(baseline_min / scale - 1e-9)
+        upper[:n_part] = np.floor(baseline_max / scale + 1e-9)
+        integrality[:n_part] = 1
+    lower[n_part:n_part + len(flexible)] = jepx_min_delta
+    upper[n_part:n_part + len(flexible)] = 0.0
+    if cyclic:
+        lower[-1] = -np.inf
+        upper[-1] = np.inf
+
+    objective = np.zeros(n_vars)
+    objective[:n_part] = -scale  # maximize Σ基準値
+
+    return {
+        'n_blocks': n_blocks,
+        'participating': participating,
+        'flexible_jepx': flexible,
+        'const_delta': const_delta,
+        'soc_matrix': soc_matrix,
+        'soc_offset': soc_offset,
+        'cycle_row': cycle_row,
+        'objective': objective,
+        'lower': lower,
+        'upper': upper,
+        'integrality': integrality,
+        'scale': scale,
+        'cyclic': cyclic,
+        'block_hours': block_hours,
+        'slope': slope,
+        'intercept': intercept,
+    }
+
+
+def solve_schedule(problem, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                   soc_end=None, end_tolerance=0.0):
+    """
+    Giải 1 kịch bản trên bài toán đã build
+
+    Args:
+        problem: kết quả của build_schedule_problem
+        soc_start: SOC ban đầu (%). Bỏ qua khi cyclic (SOC ban đầu là biến,
+            chỉ bị giới hạn bởi SOC sau block cuối)
+        soc_min, soc_max: giới hạn SOC sau mỗi block (scalar hoặc list n_blocks),
+            dùng ±np.inf để bỏ giới hạn (ví dụ block 1,2 cho phép SOC < 5%)
+        soc_end: SOC sau block cuối (%), None = tự do
+        end_tolerance: sai số cho phép của soc_end (%)
+
+    Returns:
+        dict:
+            'success', 'message'
+            'baselines': array (n_blocks,) 基準値 (0 cho block không tham gia)
+            'delta': array (n_blocks,) ΔSOC từng block
+            'soc': array (n_blocks + 1,) SOC trajectory
+            'total': Σ基準値
+    """
+    n_blocks = problem['n_blocks']
+    soc_min = _per_block(soc_min, n_blocks)
+    soc_max = _per_block(soc_max, n_blocks)
+    start = 0.0 if problem['cyclic'] else float(soc_start)
+
+    lower = soc_min - problem['soc_offset'] - start
+    upper = soc_max - problem['soc_offset'] - start
+    if soc_end is not None:
+        lower[-1] = max(lower[-1], soc_end - end_tolerance - problem['soc_offset'][-1] - start)
+        upper[-1] = min(upper[-1], soc_end + end_tolerance - problem['soc_offset'][-1] - start)
+
+    constraints = [LinearConstraint(problem['soc_matrix'], lower, upper)]
+    if problem['cyclic']:
+        offset = -problem['soc_offset'][-1]
+        constraints.append(LinearConstraint(problem['cycle_row'], offset, offset))
+
+    result = milp(problem['objective'], constraints=constraints,
+                  bounds=Bounds(problem['lower'], problem['upper']),
+                  integrality=problem['integrality'])
+
+    if result.x is None:
+        return {
+            'success': False,
+            'message': result.message,
+            'baselines': None,
+            'delta': None,
+            'soc': None,
+            'total': None,
+        }
+
+    x = result.x
+    n_part = len(problem['participating'])
+    n_flex = len(problem['flexible_jepx'])
+
+    baselines = np.zeros(n_blocks)
+    baselines[np.array(problem['participating'], dtype=int) - 1] = x[:n_part] * problem['scale']
+
+    delta = problem['const_delta'].copy()
+    delta[np.array(problem['participating'], dtype=int) - 1] += (
+        problem['slope'] * problem['block_hours'] * x[:n_part] * problem['scale'])
+    if n_flex:
+        delta[np.array(problem['flexible_jepx'], dtype=int) - 1] = x[n_part:n_part + n_flex]
+
+    soc_0 = x[-1] if problem['cyclic'] else start
+    soc = np.concatenate([[soc_0], soc_0 + np.cumsum(delta)])
+
+    return {
+        'success': bool(result.success),
+        'message': result.message,
+        'baselines': baselines,
+        'delta': delta,
+        'soc': soc,
+        'total': float(baselines.sum()),
+    }
+
+
+def optimize_schedule(soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                      soc_end=None, end_tolerance=0.0, **problem_kwargs):
+    """Build + giải 1 lần (tham số giống build_schedule_problem và solve_schedule)"""
+    problem = build_schedule_problem(**problem_kwargs)
+    return solve_schedule(problem, soc_start=soc_start, soc_min=soc_min,
+                          soc_max=soc_max, soc_end=soc_end, end_tolerance=end_tolerance)
+
+
+if __name__ == '__main__':
+    import time
+
+    print("=" * 80)
+    print("📐 LP/MILP SCHEDULE ENGINE")
+    print("=" * 80)
+
+    inf = np.inf
+    scenarios = [
+        ('7 blocks + JEPX -85% (block 8)',
+         dict(participating=range(1, 8), jepx_blocks={8: -85.0}),
+         dict(soc_end=SOC_MIN)),
+        ('Block 1,2 không baseline, cho phép SOC < 5%',
+         dict(participating=range(3, 8), jepx_blocks={8: -85.0},
+              idle_delta={1: INTERCEPT * 3, 2: INTERCEPT * 3}),
+         dict(soc_min=[-inf, -inf, 5, 5, 5, 5, 5, 5], soc_end=SOC_MIN)),
+        ('Block 1,2 & JEPX không tham gia',
+         dict(participating=range(3, 8)),
+         dict(soc_end=SOC_MIN)),
+        ('JEPX linh hoạt, MILP bước 10kW',
+         dict(participating=range(1, 8), jepx_blocks={8: None}, baseline_step=10),
+         dict(soc_end=SOC_MIN)),
+        ('Chu kỳ (SOC cuối = SOC đầu), JEPX -75%',
+         dict(participating=range(1, 8), jepx_blocks={8: -75.0}, cyclic=True),
+         dict()),
+    ]
+
+    for name, problem_kwargs, solve_kwargs in scenarios:
+        problem = build_schedule_problem(**problem_kwargs)
+        t0 = time.perf_counter()
+        result = solve_schedule(problem, **solve_kwargs)
+        elapsed = time.perf_counter() - t0
+
+        print(f"\n📋 {name} ({elapsed*1000:.1f} ms)")
+        if not result['success']:
+            print(f"   ❌ {result['message']}")
+            continue
+        print(f"   基準値: {[round(b) for b in result['baselines']]}")
+        print(f"   Σ基準値: {result['total']:.0f}kW")
+        print(f"   SOC:    {' → '.join(f'{s:.1f}' for s in result['soc'])}")
@@ -5,9 +5,6 @@ Maximize: Σ(基準値) với điều kiện SOC cuối = SOC đầu
 
 import numpy as np
 import pandas as pd
-from scipy.optimize import linprog, minimize
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
 # Công thức
 SLOPE = 0.013545
@@ -235,6 +232,8 @@ def create_comparison_visualization(valid_patterns, soc_initial=15):
     """
     Visualization so sánh các patterns hợp lệ
     """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
     
     if len(valid_patterns) == 0:
         print('\n❌ Không có pattern nào hợp lệ để vẽ!')
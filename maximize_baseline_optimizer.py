@@ -12,9 +12,9 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from scipy.optimize import minimize
 
-# Công thức
-SLOPE = 0.013545
-INTERCEPT = -2.8197
+# Công thức (soc_model.py)
+from soc_model import INTERCEPT, SLOPE
+import soc_model
 
 # Giới hạn
 SOC_MIN = 10
@@ -25,13 +25,12 @@ BASELINE_MAX = 2000
 
 def calculate_soc_change_rate(baseline_kw):
     """Tính SOC変化率"""
-    return SLOPE * baseline_kw + INTERCEPT
+    return soc_model.soc_rate(baseline_kw)
 
 
 def predict_soc(soc_start, baseline_kw, hours):
     """Dự đoán SOC sau N giờ"""
-    change_rate = calculate_soc_change_rate(baseline_kw)
-    return soc_start + (change_rate * hours)
+    return soc_model.predict_soc(soc_start, baseline_kw, hours)
 
 
 def optimize_daily_baseline_max_sum(soc_initial=15, tolerance=5):
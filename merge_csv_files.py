@@ -1,7 +1,127 @@
+import hashlib
+import io
+import json
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
-def merge_three_csv_files():
+SOC_FILE = 'kotohira_soc_20250801~now (1).csv'
+JISEKI_FILE = 'kotohira_jiseki_20250801~now (1).csv'
+KIJYUNCHI_FILE = 'kotohira_kijyunchi_20250801~now (1).csv'
+OUTPUT_FILE = 'kotohira_integrated_data.csv'
+STATE_FILE = 'kotohira_integrated_data.state.json'
+
+# 元CSVの同一性確認に使う先頭・offset直前のバイト数
+FINGERPRINT_BYTES = 4096
+
+OUTPUT_COLUMNS = ['timestamp', 'battery_soc_percent', 'actual_power_kw', 'demand_plan_kw_baseline']
+
+
+def _to_epoch_ns(times):
+    """datetime列 → int64 (UTC epoch ns)。タイムゾーン有無の両方に対応"""
+    times = pd.to_datetime(times)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.astype('datetime64[ns]').astype('int64').to_numpy()
+
+
+def assign_interval_values(times, start_times, end_times, values):
+    """
+    各時刻に、その時刻を含む計画行 [start_time, end_time]（両端含む）の値を割り当てる
+
+    計画行が重複する場合はファイル上で後ろの行が優先される
+    （行ごとにマスクで上書きしていた従来処理と同じ結果）。
+    境界点でソートし searchsorted で区間を引くので O(n log n)。
+
+    Args:
+        times: 割り当て先の時刻 (Series)
+        start_times, end_times: 計画行の開始・終了時刻 (Series, ファイル順)
+        values: 計画行の値 (Series, ファイル順)
+
+    Returns:
+        np.ndarray: 各時刻の値（該当なしは NaN）
+    """
+    t = _to_epoch_ns(times)
+    starts = _to_epoch_ns(start_times)
+    ends = _to_epoch_ns(end_times)
+    values = np.asarray(values, dtype=np.float64)
+
+    result = np.full(len(t), np.nan)
+    valid = starts <= ends
+    if not valid.any():
+        return result
+
+    # 境界点 p_i と、その間の開区間 (p_i, p_{i+1}) を「ピース」とする
+    #   点 p_i → ピース 2i、開区間 (p_i, p_{i+1}) → ピース 2i+1
+    points = np.unique(np.concatenate([starts[valid], ends[valid]]))
+    n_pieces = 2 * len(points) - 1
+    first_piece = 2 * np.searchsorted(points, starts)
+    last_piece = 2 * np.searchsorted(points, ends)
+
+    # 後ろの行から順に、まだ値のないピースだけを埋める（各ピースは1回だけ処理）
+    piece_row = np.full(n_pieces, -1, dtype=np.int64)
+    next_free = np.arange(n_pieces + 1)
+
+    def find(i):
+        root = i
+        while next_free[root] != root:
+            root = next_free[root]
+        while next_free[i] != root:
+            next_free[i], i = root, next_free[i]
+        return root
+
+    for row in np.flatnonzero(valid)[::-1]:
+        piece = find(first_piece[row])
+        while piece <= last_piece[row]:
+            piece_row[piece] = row
+            next_free[piece] = piece + 1
+            piece = find(piece + 1)
+
+    # 各時刻 → ピース
+    pos = np.searchsorted(points, t)
+    exact = (pos < len(points)) & (points[np.minimum(pos, len(points) - 1)] == t)
+    piece = np.where(exact, 2 * pos, 2 * pos - 1)
+    inside = (piece >= 0) & (piece < n_pieces)
+
+    rows = piece_row[np.clip(piece, 0, n_pieces - 1)]
+    hit = inside & (rows >= 0)
+    result[hit] = values[rows[hit]]
+    return result
+
+
+def _read_soc(source):
+    """SOCデータ (time, soc) を読み込む"""
+    soc_df = pd.read_csv(source)
+    soc_df['time'] = pd.to_datetime(soc_df['time'])
+    # nameカラムは不要なので削除
+    return soc_df[['time', 'soc']]
+
+
+def _read_jiseki(source):
+    """実績値kWデータ (time, actual_power_kw) を読み込む"""
+    jiseki_df = pd.read_csv(source)
+    jiseki_df['time'] = pd.to_datetime(jiseki_df['time'])
+    # カラム名を変更
+    return jiseki_df.rename(columns={'実績値kW': 'actual_power_kw'})
+
+
+def _read_kijyunchi(source):
+    """需要計画kW(基準値)データ (start_time, end_time, 需要計画kW) を読み込む"""
+    kijyunchi_df = pd.read_csv(source)
+    kijyunchi_df['start_time'] = pd.to_datetime(kijyunchi_df['start_time'])
+    kijyunchi_df['end_time'] = pd.to_datetime(kijyunchi_df['end_time'])
+
+    # 需要計画kWのみを抽出
+    kijyunchi_demand = kijyunchi_df[['start_time', 'end_time', '需要計画kW']].copy()
+    kijyunchi_demand = kijyunchi_demand[pd.notna(kijyunchi_demand['需要計画kW'])]
+    kijyunchi_demand['需要計画kW'] = pd.to_numeric(kijyunchi_demand['需要計画kW'], errors='coerce')
+    return kijyunchi_demand
+
+
+def merge_three_csv_files(output_file=OUTPUT_FILE):
     """
     3つのCSVファイルを1つに統合する
     - kotohira_soc_20250801~now (1).csv
@@ -15,30 +135,17 @@ def merge_three_csv_files():
     
     # 1. SOCデータの読み込み
     print("\n1️⃣  SOCデータを読み込んでいます...")
-    soc_df = pd.read_csv('kotohira_soc_20250801~now (1).csv')
-    soc_df['time'] = pd.to_datetime(soc_df['time'])
-    # nameカラムは不要なので削除
-    soc_df = soc_df[['time', 'soc']]
+    soc_df = _read_soc(SOC_FILE)
     print(f"   レコード数: {len(soc_df):,}")
     
     # 2. 実績値kWデータの読み込み
     print("\n2️⃣  実績値kWデータを読み込んでいます...")
-    jiseki_df = pd.read_csv('kotohira_jiseki_20250801~now (1).csv')
-    jiseki_df['time'] = pd.to_datetime(jiseki_df['time'])
-    # カラム名を変更
-    jiseki_df = jiseki_df.rename(columns={'実績値kW': 'actual_power_kw'})
+    jiseki_df = _read_jiseki(JISEKI_FILE)
     print(f"   レコード数: {len(jiseki_df):,}")
     
     # 3. 基準値(需要計画kW)データの読み込み
     print("\n3️⃣  需要計画kW(基準値)データを読み込んでいます...")
-    kijyunchi_df = pd.read_csv('kotohira_kijyunchi_20250801~now (1).csv')
-    kijyunchi_df['start_time'] = pd.to_datetime(kijyunchi_df['start_time'])
-    kijyunchi_df['end_time'] = pd.to_datetime(kijyunchi_df['end_time'])
-    
-    # 需要計画kWのみを抽出
-    kijyunchi_demand = kijyunchi_df[['start_time', 'end_time', '需要計画kW']].copy()
-    kijyunchi_demand = kijyunchi_demand[pd.notna(kijyunchi_demand['需要計画kW'])]
-    kijyunchi_demand['需要計画kW'] = pd.to_numeric(kijyunchi_demand['需要計画kW'], errors='coerce')
+    kijyunchi_demand = _read_kijyunchi(KIJYUNCHI_FILE)
     print(f"   レコード数: {len(kijyunchi_demand):,}")
     
     # SOCと実績値kWをマージ（時間で結合）
@@ -49,11 +156,12 @@ def merge_three_csv_files():
     
     # 需要計画kWを追加（時間範囲に基づいて）
     print("\n🔄 需要計画kW(基準値)を追加しています...")
-    merged_df['demand_plan_kw'] = None
-    
-    for idx, row in kijyunchi_demand.iterrows():
-        mask = (merged_df['time'] >= row['start_time']) & (merged_df['time'] <= row['end_time'])
-        merged_df.loc[mask, 'demand_plan_kw'] = row['需要計画kW']
+    merged_df['demand_plan_kw'] = assign_interval_values(
+        merged_df['time'],
+        kijyunchi_demand['start_time'],
+        kijyunchi_demand['end_time'],
+        kijyunchi_demand['需要計画kW'],
+    )
     
     # カラム名を分かりやすく変更
     merged_df = merged_df.rename(columns={
@@ -67,7 +175,6 @@ def merge_three_csv_files():
     merged_df['timestamp'] = merged_df['timestamp'].dt.tz_localize(None)
     
     # CSVに保存
-    output_file = 'kotohira_integrated_data.csv'
     merged_df.to_csv(output_file, index=False, encoding='utf-8-sig')
     
     print(f"\n✅ 統合完了！")
@@ -117,5 +224,217 @@ def merge_three_csv_files():
     return merged_df
 
 
+def _to_local_naive(times):
+    """タイムゾーン付き時刻 → ローカル時刻のまま tz なし（統合CSVと同じ表記）"""
+    times = pd.to_datetime(times)
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)
+    return times
+
+
+def _read_appended(path, offset):
+    """
+    offset バイト以降に追記された完結行だけを読む
+
+    Returns:
+        (DataFrame読み込み用バッファ or None, 新しいoffset)
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = max(offset, len(header))
+        f.seek(start)
+        data = f.read()
+
+    # 書き込み途中の最終行は次回に回す
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return None, start
+    return io.BytesIO(header + data[:end]), start + end
+
+
+def _find_row_offset(path, timestamp):
+    """統合CSV（時刻順）で timestamp 以降の最初の行の開始バイト位置を二分探索で求める"""
+    key = str(timestamp).encode('utf-8')
+
+    with open(path, 'rb') as f:
+        header_end = len(f.readline())
+        size = f.seek(0, os.SEEK_END)
+
+        def line_from(position):
+            # position を含む行の次の行（position 以降に始まる最初の行）
+            f.seek(position - 1)
+            f.readline()
+            line_start = f.tell()
+            return line_start, f.readline()
+
+        lo, hi = header_end, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, line = line_from(mid)
+            if not line or line[:len(key)] >= key:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return line_from(lo)[0] if lo < size else size
+
+
+def _fingerprint(path, offset):
+    """
+    元CSVの先頭と offset 直前の FINGERPRINT_BYTES バイトのハッシュ
+
+    全件再出力されたファイルはサイズが増えていても先頭か offset 直前の内容が
+    変わる（offset が行の途中になる）ので、保存時と一致しなければ作り直し扱い
+    """
+    with open(path, 'rb') as f:
+        head = f.read(min(offset, FINGERPRINT_BYTES))
+        start = max(offset - FINGERPRINT_BYTES, 0)
+        f.seek(start)
+        tail = f.read(offset - start)
+    return {'head': hashlib.sha256(head).hexdigest(), 'tail': hashlib.sha256(tail).hexdigest()}
+
+
+def _save_state(state_file, last_timestamp, offsets, open_plans):
+    """増分取り込みの状態を保存"""
+    state = {
+        'last_timestamp': str(last_timestamp),
+        'offsets': offsets,
+        'fingerprints': {path: _fingerprint(path, offset) for path, offset in offsets.items()},
+        'open_plans': [[str(s), str(e), None if pd.isna(v) else float(v)]
+                       for s, e, v in open_plans.itertuples(index=False)],
+    }
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def _full_rebuild(output_file, state_file):
+    """全件統合し直して状態ファイルを作成"""
+    offsets = {path: os.path.getsize(path) for path in (SOC_FILE, JISEKI_FILE, KIJYUNCHI_FILE)}
+    merged_df = merge_three_csv_files(output_file)
+
+    last_timestamp = merged_df['timestamp'].max()
+    plans = _read_kijyunchi(KIJYUNCHI_FILE)
+    plans['start_time'] = _to_local_naive(plans['start_time'])
+    plans['end_time'] = _to_local_naive(plans['end_time'])
+    open_plans = plans[plans['end_time'] >= last_timestamp]
+
+    _save_state(state_file, last_timestamp, offsets, open_plans)
+    return merged_df
+
+
+def update_integrated_data(output_file=OUTPUT_FILE, state_file=STATE_FILE):
+    """
+    統合CSVを増分更新する
+
+    - 前回取り込んだ位置（バイトoffset）以降に追記された行だけを読む
+    - 新しい時刻の行は統合CSVの末尾に追記
+    - 統合済みの時間帯に対する遅れてきた計画値の修正・実績値は、
+      その時刻以降の末尾部分だけを書き直して反映（それ以前の行は触らない）
+    - 状態ファイルがない / 元CSVが縮んだ、または先頭・前回offset直前の内容が
+      変わった（全件再出力された）場合は全件統合
+
+    Returns:
+        追記・修正した行の DataFrame
+    """
+    print("=" * 70)
+    print("統合CSVを増分更新中...")
+    print("=" * 70)
+
+    if not (os.path.exists(output_file) and os.path.exists(state_file)):
+        print("\n⚠️  状態ファイルがないため全件統合します")
+        return _full_rebuild(output_file, state_file)
+
+    with open(state_file, encoding='utf-8') as f:
+        state = json.load(f)
+    offsets = state['offsets']
+    last_timestamp = pd.Timestamp(state['last_timestamp'])
+
+    fingerprints = state.get('fingerprints', {})
+    for path in (SOC_FILE, JISEKI_FILE, KIJYUNCHI_FILE):
+        offset = offsets.get(path, 0)
+        if (os.path.getsize(path) < offset or path not in fingerprints
+                or _fingerprint(path, offset) != fingerprints[path]):
+            print(f"\n⚠️  {path} が作り直されたため全件統合します")
+            return _full_rebuild(output_file, state_file)
+
+    # 1. 追記分だけ読み込み
+    soc_buffer, offsets[SOC_FILE] = _read_appended(SOC_FILE, offsets.get(SOC_FILE, 0))
+    jiseki_buffer, offsets[JISEKI_FILE] = _read_appended(JISEKI_FILE, offsets.get(JISEKI_FILE, 0))
+    plan_buffer, offsets[KIJYUNCHI_FILE] = _read_appended(KIJYUNCHI_FILE, offsets.get(KIJYUNCHI_FILE, 0))
+
+    soc_df = _read_soc(soc_buffer) if soc_buffer else pd.DataFrame(columns=['time', 'soc'])
+    jiseki_df = (_read_jiseki(jiseki_buffer) if jiseki_buffer
+                 else pd.DataFrame(columns=['time', 'actual_power_kw']))
+    new_plans = (_read_kijyunchi(plan_buffer) if plan_buffer
+                 else pd.DataFrame(columns=['start_time', 'end_time', '需要計画kW']))
+    print(f"\n   追記行: SOC {len(soc_df):,} / 実績値kW {len(jiseki_df):,} / 計画 {len(new_plans):,}")
+
+    soc_df['time'] = _to_local_naive(soc_df['time'])
+    jiseki_df['time'] = _to_local_naive(jiseki_df['time'])
+    new_plans['start_time'] = _to_local_naive(new_plans['start_time'])
+    new_plans['end_time'] = _to_local_naive(new_plans['end_time'])
+
+    open_plans = pd.DataFrame(state['open_plans'], columns=['start_time', 'end_time', '需要計画kW'])
+    open_plans['start_time'] = pd.to_datetime(open_plans['start_time'])
+    open_plans['end_time'] = pd.to_datetime(open_plans['end_time'])
+    open_plans['需要計画kW'] = pd.to_numeric(open_plans['需要計画kW'])
+
+    new_rows = pd.merge(soc_df, jiseki_df, on='time', how='outer').rename(columns={
+        'time': 'timestamp',
+        'soc': 'battery_soc_percent',
+    })
+
+    # 2. 書き直しが必要な範囲（統合済み時間帯への修正）の開始時刻
+    patch_candidates = [new_rows.loc[new_rows['timestamp'] <= last_timestamp, 'timestamp'].min(),
+                        new_plans.loc[new_plans['start_time'] <= last_timestamp, 'start_time'].min()]
+    patch_candidates = [t for t in patch_candidates if pd.notna(t)]
+
+    if patch_candidates:
+        patch_offset = _find_row_offset(output_file, min(patch_candidates))
+        with open(output_file, 'rb') as f:
+            header = f.readline()
+            f.seek(patch_offset)
+            tail = pd.read_csv(io.BytesIO(header + f.read()), encoding='utf-8-sig')
+        tail['timestamp'] = pd.to_datetime(tail['timestamp'])
+    else:
+        patch_offset = os.path.getsize(output_file)
+        tail = pd.DataFrame(columns=OUTPUT_COLUMNS)
+    print(f"   書き直し行: {len(tail):,}")
+
+    # 3. 既存行 + 追記行（同じ時刻は新しい値で上書き、欠損は既存値を維持）
+    combined = pd.concat([tail, new_rows], ignore_index=True)
+    combined = combined.groupby('timestamp', sort=True, as_index=False).last()
+
+    # 4. 計画値: 統合済み時間帯は新しい計画行で上書き、新しい時間帯は未消化の計画 + 新しい計画
+    revised = assign_interval_values(combined['timestamp'], new_plans['start_time'],
+                                     new_plans['end_time'], new_plans['需要計画kW'])
+    plans = pd.concat([open_plans, new_plans], ignore_index=True)
+    fresh = assign_interval_values(combined['timestamp'], plans['start_time'],
+                                   plans['end_time'], plans['需要計画kW'])
+    existing = pd.to_numeric(combined['demand_plan_kw_baseline']).to_numpy(dtype=np.float64)
+    is_new = (combined['timestamp'] > last_timestamp).to_numpy()
+    combined['demand_plan_kw_baseline'] = np.where(
+        is_new, fresh, np.where(np.isnan(revised), existing, revised))
+
+    combined = combined[OUTPUT_COLUMNS]
+
+    # 5. 末尾を切り詰めて書き直し
+    with open(output_file, 'r+b') as f:
+        f.seek(patch_offset)
+        f.truncate()
+        f.write(combined.to_csv(index=False, header=False).encode('utf-8'))
+
+    if len(combined) > 0:
+        last_timestamp = max(last_timestamp, combined['timestamp'].max())
+    _save_state(state_file, last_timestamp, offsets,
+                plans[plans['end_time'] >= last_timestamp])
+
+    print(f"\n✅ 増分更新完了！ 最終時刻: {last_timestamp}")
+    return combined
+
+
 if __name__ == "__main__":
-    merged_data = merge_three_csv_files()
+    if '--incremental' in sys.argv:
+        updated_rows = update_integrated_data()
+    else:
+        merged_data = _full_rebuild(OUTPUT_FILE, STATE_FILE)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KIỂM ĐỊNH CHÉO: HỒI QUY THEO BLOCK 3 GIỜ vs HỒI QUY TỪNG PHÚT
+
+why_3hour_is_better.py, compare_formulas.py và final_formula_conclusion.py so
+sánh 2 cách hồi quy SOC変化率 = slope × 基準値 + intercept bằng R² trên vài ngày
+chọn tay. Harness này đo sai số dự báo SOC ngoài mẫu:
+- 'block':  1 điểm / block 3 giờ (基準値 trung bình, ΔSOC / 3h), giống
+  analyze_extended_4days.py (gom block bằng soc_rls.block_observations)
+- 'minute': 1 điểm / phút (coefficient_fits.minute_rates), giống
+  minute_by_minute_analysis.py
+- 'current': hệ số đang dùng trong soc_model (không fit, để tham chiếu)
+
+Fold (ngày kiểm tra d):
+- 'lodo':    train = mọi ngày khác (leave-one-day-out)
+- 'rolling': train = WINDOW_DAYS ngày ngay trước d (chỉ dùng quá khứ)
+
+Thống kê đủ (n, Σx, Σy, Σx², Σxy, Σy²) của cả 2 cách được cộng theo ngày 1 lần;
+train của mọi fold = hiệu của tổng tích lũy → mỗi fold chỉ là vài phép cộng +
+hồi quy dạng đóng. Các fold chạy song song theo khoảng ngày trên process pool.
+
+Sai số theo horizon h block (3h … 24h): từ SOC thực đầu block i của ngày kiểm
+tra, dự báo SOC sau h block bằng 基準値 thực tế, so với SOC thực đo:
+    e = Σ_{b=i}^{i+h-1} [(slope × 基準値_b + intercept) × 3 − ΔSOC_b]
+(chỉ các block liên tiếp trong cùng ngày; mọi mô hình dùng chung tập block).
+
+    python model_selection.py --folds lodo rolling --window 30 --workers 8
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import soc_model
+import soc_rls
+from coefficient_fits import _STATS, group_statistics, minute_rates, ols
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+N_BLOCKS = int(24 // BLOCK_HOURS)
+
+MODELS = ('block', 'minute', 'current')
+FOLDS = ('lodo', 'rolling')
+WINDOW_DAYS = 30
+
+# Fold cần ít nhất chừng này block train cho cả 2 cách fit
+MIN_TRAIN_BLOCKS = 8
+
+# Dữ liệu dùng chung của worker (gán 1 lần trong _init_worker)
+_DATA = None
+
+
+# ============================================================================
+# THỐNG KÊ THEO NGÀY (tính 1 lần, dùng cho mọi fold)
+# ============================================================================
+
+def _daily(days, day_of_row, columns):
+    """Cộng các cột (n, 6) theo ngày → (D, 6)"""
+    index = np.searchsorted(days, day_of_row)
+    return np.column_stack([np.bincount(index, column, len(days)) for column in columns.T])
+
+
+def build_aggregates(times, soc, baselines):
+    """
+    Thống kê đủ theo ngày của 2 cách fit và bảng block dùng để đánh giá
+
+    Returns:
+        dict:
+            'days' (D,) datetime64[D]
+            'minute', 'block' (D, 6): (n, Σx, Σy, Σx², Σxy, Σy²) theo ngày
+            'block_id' (B,): số thứ tự block (epoch / 3h), tăng dần
+            'block_day' (B,): chỉ số ngày của block, 'baseline' (B,), 'delta' (B,) ΔSOC thực tế
+    """
+    data = minute_rates(times, soc, baselines)
+    stats = group_statistics(data)
+    blocks = soc_rls.block_observations(soc_rls.init_state(), times, soc, baselines)
+
+    block_day = (blocks['block'] // N_BLOCKS).astype('datetime64[D]')
+    days = np.union1d(stats['day'], block_day)
+
+    x, y = blocks['baseline'], blocks['rate']
+    block_columns = np.column_stack([np.ones_like(x), x, y, x * x, x * y, y * y])
+    minute_columns = np.column_stack([stats[key] for key in _STATS])
+    return {
+        'days': days,
+        'minute': _daily(days, stats['day'], minute_columns),
+        'block': _daily(days, block_day, block_columns),
+        'block_id': blocks['block'],
+        'block_day': np.searchsorted(days, block_day),
+        'baseline': x,
+        'delta': y * BLOCK_HOURS,
+    }
+
+
+# ============================================================================
+# FOLD (chạy trong worker)
+# ============================================================================
+
+def _init_worker(aggregates, settings):
+    global _DATA
+    _DATA = (aggregates, settings)
+
+
+def _train_statistics(daily, scheme, lo, hi, settings):
+    """Thống kê đủ của tập train cho các ngày kiểm tra [lo, hi) → (hi - lo, 6)"""
+    prefix = np.vstack([np.zeros((1, daily.shape[1])), np.cumsum(daily, axis=0)])
+    if scheme == 'lodo':
+        return prefix[-1] - daily[lo:hi]
+    first = settings['window_first'][lo:hi]
+    return prefix[lo:hi] - prefix[first]
+
+
+def _evaluate_folds(scheme, lo, hi):
+    """
+    Ngày kiểm tra [lo, hi): hệ số của từng fold và tổng sai số theo horizon
+
+    Returns:
+        (scheme, lo, hi, coefficients, sums): coefficients {model: (slope, intercept)}
+        mảng (hi - lo,), sums {model: (H, 4)} = (số mẫu, Σ|e|, Σe², Σe) theo horizon
+    """
+    aggregates, settings = _DATA
+    horizons = settings['horizons']
+
+    coefficients = {}
+    for model in ('block', 'minute'):
+        train = _train_statistics(aggregates[model], scheme, lo, hi, settings)
+        slope, intercept, _ = ols(*train[:, :5].T)
+        coefficients[model] = (slope, intercept)
+    enough = _train_statistics(aggregates['block'], scheme, lo, hi, settings)[:, 0]
+    valid = ((enough >= settings['min_train_blocks'])
+             & np.isfinite(coefficients['block'][0]) & np.isfinite(coefficients['minute'][0]))
+    current = soc_model.get_model()
+    coefficients['current'] = (np.full(hi - lo, current['slope']),
+                               np.full(hi - lo, current['intercept']))
+
+    # Block của các ngày kiểm tra (block_id tăng dần → 1 đoạn liên tục)
+    start, stop = np.searchsorted(aggregates['block_day'], [lo, hi])
+    ids = aggregates['block_id'][start:stop]
+    day = aggregates['block_day'][start:stop] - lo
+    x = aggregates['baseline'][start:stop]
+    actual = aggregates['delta'][start:stop]
+    keep = valid[day]
+
+    sums = {}
+    for model in MODELS:
+        slope, intercept = coefficients[model]
+        error = (slope[day] * x + intercept[day]) * BLOCK_HOURS - actual
+        cumulative = np.concatenate([[0.0], np.cumsum(np.where(keep, error, 0.0))])
+        table = np.zeros((len(horizons), 4))
+        for row, h in enumerate(horizons):
+            if len(ids) < h:
+                continue
+            # Cửa sổ h block liên tiếp, không vượt qua cuối ngày
+            begin = np.arange(len(ids) - h + 1)
+            window = ((ids[begin + h - 1] - ids[begin] == h - 1)
+                      & (ids[begin] % N_BLOCKS + h <= N_BLOCKS) & keep[begin])
+            e = (cumulative[begin + h] - cumulative[begin])[window]
+            table[row] = (len(e), np.abs(e).sum(), (e * e).sum(), e.sum())
+        sums[model] = table
+    return scheme, lo, hi, coefficients, sums
+
+
+def _run_task(task):
+    return _evaluate_folds(*task)
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def cross_validate(times=None, soc=None, baselines=None, aggregates=None, folds=FOLDS,
+                   window_days=WINDOW_DAYS, horizons=range(1, N_BLOCKS + 1),
+                   min_train_blocks=MIN_TRAIN_BLOCKS, workers=None, chunk=None):
+    """
+    Kiểm định chéo 2 cách fit trên toàn bộ lịch sử
+
+    Args:
+        times, soc, baselines: dữ liệu từng phút (bỏ qua khi có aggregates)
+        aggregates: kết quả build_aggregates (dùng lại giữa các lần gọi)
+        folds: các kiểu fold ('lodo', 'rolling')
+        window_days: số ngày train của 'rolling'
+        horizons: số block dự báo (1 = 3h … 8 = 24h)
+        min_train_blocks: số block train tối thiểu của 1 fold
+        workers: số tiến trình (None = số CPU, 1 = tuần tự)
+        chunk: số ngày kiểm tra mỗi task (None = tự chọn)
+
+    Returns:
+        dict:
+            'errors': DataFrame (fold, model, horizon_hours, n, mae, rmse, bias)
+            'coefficients': DataFrame 1 dòng / (fold, ngày kiểm tra, model)
+            'aggregates', 'elapsed'
+    """
+    t0 = time.perf_counter()
+    if aggregates is None:
+        aggregates = build_aggregates(times, soc, baselines)
+    days = aggregates['days']
+    horizons = [int(h) for h in horizons]
+    settings = {
+        'horizons': horizons,
+        'min_train_blocks': min_train_blocks,
+        'window_first': np.searchsorted(days, days - np.timedelta64(window_days, 'D')),
+    }
+    workers = workers or os.cpu_count() or 1
+    day_chunk = chunk or max(1, -(-len(days) // (4 * workers)))
+    tasks = [(scheme, lo, min(lo + day_chunk, len(days)))
+             for scheme in folds for lo in range(0, len(days), day_chunk)]
+
+    if workers == 1:
+        _init_worker(aggregates, settings)
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(aggregates, settings)) as pool:
+            results = list(pool.map(_run_task, tasks))
+
+    totals = {(scheme, model): np.zeros((len(horizons), 4)) for scheme in folds for model in MODELS}
+    frames = []
+    for scheme, lo, hi, coefficients, sums in results:
+        for model in MODELS:
+            totals[scheme, model] += sums[model]
+            slope, intercept = coefficients[model]
+            frames.append(pd.DataFrame({'fold': scheme, 'date': pd.to_datetime(days[lo:hi]),
+                                        'model': model, 'slope': slope, 'intercept': intercept}))
+
+    rows = []
+    for (scheme, model), table in totals.items():
+        for h, (n, abs_sum, square_sum, total) in zip(horizons, table):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rows.append({'fold': scheme, 'model': model, 'horizon_hours': h * BLOCK_HOURS,
+                             'n': int(n), 'mae': abs_sum / n, 'rmse': np.sqrt(square_sum / n),
+                             'bias': total / n})
+    return {
+        'errors': pd.DataFrame(rows),
+        'coefficients': pd.concat(frames, ignore_index=True),
+        'aggregates': aggregates,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Kiểm định chéo: fit theo block 3h vs từng phút')
+    parser.add_argument('--folds', nargs='+', choices=FOLDS, default=list(FOLDS))
+    parser.add_argument('--window', type=int, default=WINDOW_DAYS,
+                        help='số ngày train của fold rolling')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='model_selection_errors.csv')
+    args = parser.parse_args()
+
+    from batch_daily_report import load_kotohira
+
+    print('=' * 100)
+    print('🧪 KIỂM ĐỊNH CHÉO: HỒI QUY THEO BLOCK 3 GIỜ vs TỪNG PHÚT')
+    print('=' * 100)
+
+    data = load_kotohira()['data'][0]
+    result = cross_validate(data['timestamp'], data['battery_soc_percent'],
+                            data['demand_plan_kw_baseline'], folds=args.folds,
+                            window_days=args.window, workers=args.workers)
+    errors = result['errors']
+    aggregates = result['aggregates']
+    print(f"\n{len(aggregates['days'])} ngày, {len(aggregates['block_id']):,} block: "
+          f"{result['elapsed']:.1f} giây")
+
+    for scheme, part in errors.groupby('fold', sort=False):
+        table = part.pivot(index='horizon_hours', columns='model', values='rmse')[list(MODELS)]
+        counts = part[part['model'] == 'block'].set_index('horizon_hours')['n']
+        print(f"\n📋 Fold {scheme}: RMSE SOC ngoài mẫu (%)")
+        print(f"   {'horizon':>8} {'mẫu':>7} " + ''.join(f'{m:>10}' for m in MODELS) + '   tốt nhất')
+        for horizon, row in table.iterrows():
+            best = row.idxmin() if row.notna().any() else '-'
+            print(f"   {horizon:>7.0f}h {counts[horizon]:>7,} "
+                  + ''.join(f'{v:>10.2f}' for v in row) + f'   {best}')
+
+    errors.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f'\n✅ Đã lưu: {args.output}')
@@ -7,12 +7,10 @@ Output: Lịch 基準値 tối ưu cho 8 blocks 3 giờ
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
-# Công thức regression
-SLOPE = 0.013545
-INTERCEPT = -2.8197
+# Công thức regression (soc_model.py)
+from soc_model import INTERCEPT, SLOPE
+import soc_model
 
 # Giới hạn SOC
 SOC_MIN = 10
@@ -25,21 +23,72 @@ BASELINE_MAX = 2000
 
 def calculate_soc_change_rate(baseline_kw):
     """Tính SOC変化率 từ 基準値"""
-    return SLOPE * baseline_kw + INTERCEPT
+    return soc_model.soc_rate(baseline_kw)
 
 
 def predict_soc(soc_start, baseline_kw, hours):
     """Dự đoán SOC sau N giờ"""
-    change_rate = calculate_soc_change_rate(baseline_kw)
-    return soc_start + (change_rate * hours)
+    return soc_model.predict_soc(soc_start, baseline_kw, hours)
 
 
 def find_required_baseline(soc_current, soc_target, hours):
     """Tìm 基準値 cần thiết để đạt SOC mục tiêu"""
-    change_needed = soc_target - soc_current
-    rate_needed = change_needed / hours
-    baseline = (rate_needed - INTERCEPT) / SLOPE
-    return max(BASELINE_MIN, min(BASELINE_MAX, baseline))
+    return soc_model.required_baseline(soc_current, soc_target, hours,
+                                       baseline_min=BASELINE_MIN, baseline_max=BASELINE_MAX)
+
+
+def strategy_soc_targets(initial_soc, final_soc_target, strategy='balanced'):
+    """
+    SOC mục tiêu sau từng block (8 blocks) theo chiến lược của create_smart_schedule
+
+    initial_soc / final_soc_target có thể là array (ví dụ SOC đầu ngày của
+    nhiều ngày khi backtest), mỗi mục tiêu khi đó là array cùng shape.
+
+    Returns:
+        list 8 SOC mục tiêu (%), đã cắt về [SOC_MIN, SOC_MAX]
+    """
+    initial_soc = np.asarray(initial_soc, dtype=np.float64)
+    final_soc_target = np.asarray(final_soc_target, dtype=np.float64)
+
+    if strategy == 'balanced':
+        # Tăng đều từ initial đến final
+        soc_increment = (final_soc_target - initial_soc) / 8
+        soc_targets = [initial_soc + soc_increment * (i + 1) for i in range(8)]
+        
+    elif strategy == 'morning_charge':
+        # Sạc mạnh 06:00-09:00, sau đó duy trì
+        soc_targets = []
+        for i in range(8):
+            if i < 2:  # 00:00-06:00: tăng nhẹ
+                soc_targets.append(initial_soc + 5)
+            elif i == 2:  # 06:00-09:00: sạc mạnh
+                soc_targets.append(initial_soc + (final_soc_target - initial_soc) * 0.7)
+            else:  # sau 09:00: tăng nhẹ đến target
+                remaining = final_soc_target - soc_targets[-1]
+                soc_targets.append(soc_targets[-1] + remaining / (8 - i))
+                
+    elif strategy == 'evening_charge':
+        # Duy trì ban ngày, sạc mạnh tối
+        soc_targets = []
+        for i in range(8):
+            if i < 6:  # 00:00-18:00: duy trì
+                soc_targets.append(initial_soc + 5)
+            else:  # 18:00-24:00: sạc mạnh
+                progress = (i - 5) / 3
+                soc_targets.append(initial_soc + (final_soc_target - initial_soc) * progress)
+                
+    elif strategy == 'maintain':
+        # Duy trì SOC ổn định quanh giá trị hiện tại
+        target_soc = (initial_soc + final_soc_target) / 2
+        soc_targets = [target_soc] * 8
+        
+    else:
+        # Default: balanced
+        soc_increment = (final_soc_target - initial_soc) / 8
+        soc_targets = [initial_soc + soc_increment * (i + 1) for i in range(8)]
+    
+    # Đảm bảo targets trong giới hạn
+    return [np.clip(t, SOC_MIN, SOC_MAX) for t in soc_targets]
 
 
 def create_smart_schedule(initial_soc, final_soc_target, strategy='balanced'):
@@ -84,45 +133,7 @@ def create_smart_schedule(initial_soc, final_soc_target, strategy='balanced'):
     soc_current = initial_soc
     
     # Xác định SOC targets cho từng block theo strategy
-    if strategy == 'balanced':
-        # Tăng đều từ initial đến final
-        soc_increment = (final_soc_target - initial_soc) / 8
-        soc_targets = [initial_soc + soc_increment * (i + 1) for i in range(8)]
-        
-    elif strategy == 'morning_charge':
-        # Sạc mạnh 06:00-09:00, sau đó duy trì
-        soc_targets = []
-        for i in range(8):
-            if i < 2:  # 00:00-06:00: tăng nhẹ
-                soc_targets.append(initial_soc + 5)
-            elif i == 2:  # 06:00-09:00: sạc mạnh
-                soc_targets.append(initial_soc + (final_soc_target - initial_soc) * 0.7)
-            else:  # sau 09:00: tăng nhẹ đến target
-                remaining = final_soc_target - soc_targets[-1]
-                soc_targets.append(soc_targets[-1] + remaining / (8 - i))
-                
-    elif strategy == 'evening_charge':
-        # Duy trì ban ngày, sạc mạnh tối
-        soc_targets = []
-        for i in range(8):
-            if i < 6:  # 00:00-18:00: duy trì
-                soc_targets.append(initial_soc + 5)
-            else:  # 18:00-24:00: sạc mạnh
-                progress = (i - 5) / 3
-                soc_targets.append(initial_soc + (final_soc_target - initial_soc) * progress)
-                
-    elif strategy == 'maintain':
-        # Duy trì SOC ổn định quanh giá trị hiện tại
-        target_soc = (initial_soc + final_soc_target) / 2
-        soc_targets = [target_soc] * 8
-        
-    else:
-        # Default: balanced
-        soc_increment = (final_soc_target - initial_soc) / 8
-        soc_targets = [initial_soc + soc_increment * (i + 1) for i in range(8)]
-    
-    # Đảm bảo targets trong giới hạn
-    soc_targets = [max(SOC_MIN, min(SOC_MAX, t)) for t in soc_targets]
+    soc_targets = strategy_soc_targets(initial_soc, final_soc_target, strategy)
     
     print(f'\n{"="*100}')
     print('📋 LỊCH TỐI ƯU 8 BLOCKS')
@@ -187,6 +198,8 @@ def create_smart_schedule(initial_soc, final_soc_target, strategy='balanced'):
 
 def visualize_schedule(schedule_df, title='最適スケジュール'):
     """Tạo visualization cho lịch"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
     
     fig = make_subplots(
         rows=3, cols=1,
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from soc_model import get_model
+
 def calculate_optimal_baseline(current_soc, target_soc_max=90, block_hours=3):
     """
     現在のSOCから最適な基準値を計算
@@ -23,9 +25,9 @@ def calculate_optimal_baseline(current_soc, target_soc_max=90, block_hours=3):
         予想される到達SOC (%)
     """
     
-    # 線形回帰式: SOC変化率 = 0.012804 × 基準値 - 1.9515 (%/時間)
-    SLOPE = 0.012804
-    INTERCEPT = -1.9515
+    # 線形回帰式: SOC変化率 = 0.012804 × 基準値 - 1.9515 (%/時間)（soc_model の kotohira/v1）
+    model = get_model('kotohira', 'v1')
+    SLOPE, INTERCEPT = model['slope'], model['intercept']
     
     # 利用可能なSOC増加量
     available_soc_increase = target_soc_max - current_soc
@@ -10,9 +10,10 @@ Ràng buộc:
 """
 
 import numpy as np
-from scipy.optimize import linprog
 import matplotlib.pyplot as plt
 
+from lp_scheduler import build_schedule_problem, solve_schedule
+
 # ===== CÔNG THỨC CƠ BẢN =====
 def calc_delta_soc(baseline):
     """ΔSOC cho 1 block 3h"""
@@ -79,48 +80,30 @@ print("\n" + "=" * 80)
 print("PHƯƠNG PHÁP 1: LINEAR PROGRAMMING")
 print("=" * 80)
 
-# Biến: b₃, b₄, b₅, b₆, b₇ (5 biến)
-c = -np.ones(5)
-
-# Ràng buộc bất đẳng thức
-A_ub = []
-b_ub = []
-
-# Ràng buộc: SOC(k) ≤ 90 cho k=3,4,5,6,7
-# SOC(k) = soc_after_block2 + Σⱼ₌₃ᵏ (0.040635×bⱼ - 8.4591)
-for k_idx in range(5):  # k = 3,4,5,6,7
-    row = np.zeros(5)
-    row[:k_idx+1] = 0.040635
-    # soc_after_block2 + 0.040635×Σbⱼ - (k_idx+1)×8.4591 ≤ 90
-    A_ub.append(row)
-    b_ub.append(SOC_MAX - soc_after_block2 + (k_idx+1)*8.4591)
-
-# Ràng buộc: SOC(k) ≥ 5 cho k=3,4,5,6,7
-for k_idx in range(5):
-    row = np.zeros(5)
-    row[:k_idx+1] = -0.040635
-    # soc_after_block2 + 0.040635×Σbⱼ - (k_idx+1)×8.4591 ≥ 5
-    A_ub.append(row)
-    b_ub.append(soc_after_block2 - SOC_MIN - (k_idx+1)*8.4591)
-
-A_ub = np.array(A_ub)
-b_ub = np.array(b_ub)
-
-# Ràng buộc đẳng thức: SOC(7) = 90
-A_eq = np.array([[0.040635] * 5])
-b_eq = np.array([required_delta + 5*8.4591])
-
-# Giới hạn: 0 ≤ bᵢ ≤ 2000
-bounds = [(0, BASELINE_MAX)] * 5
+# Biến: b₃, b₄, b₅, b₆, b₇ (5 biến) - build bằng lp_scheduler
+# Block 1,2: baseline = 0 (ΔSOC = calc_delta_soc(0)), cho phép SOC < 5%
+# Block 3-7: 5% ≤ SOC ≤ 90%, Block 8: JEPX 90% → 5%
+problem = build_schedule_problem(
+    n_blocks=8,
+    participating=[3, 4, 5, 6, 7],
+    jepx_blocks={8: -(SOC_MAX - SOC_MIN)},
+    idle_delta={1: calc_delta_soc(0), 2: calc_delta_soc(0)},
+    baseline_min=0,
+    baseline_max=BASELINE_MAX,
+    block_hours=3,
+    slope=0.040635 / 3,
+    intercept=-8.4591 / 3,
+)
 
 print("\n🔧 Giải bài toán LP...")
-result = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq,
-                 bounds=bounds, method='highs')
+result = solve_schedule(problem, soc_start=SOC_MIN,
+                        soc_min=[-np.inf, -np.inf] + [SOC_MIN] * 6,
+                        soc_max=SOC_MAX, soc_end=SOC_MIN)
 
-if result.success:
+if result['success']:
     print("\n✅ TÌM RA NGHIỆM TỐI ƯU!")
     
-    optimal_pattern = result.x
+    optimal_pattern = result['baselines'][2:7]
     total_baseline = sum(optimal_pattern)
     
     print(f"\n🎯 Pattern tối ưu (Blocks 3-7):")
@@ -192,7 +175,7 @@ if result.success:
         print(f"  Range: {max(optimal_pattern) - min(optimal_pattern):.2f} kW")
 
 else:
-    print(f"\n❌ Không tìm được nghiệm: {result.message}")
+    print(f"\n❌ Không tìm được nghiệm: {result['message']}")
 
 # ===== PHƯƠNG PHÁP 2: GIẢI TÍCH =====
 print("\n" + "=" * 80)
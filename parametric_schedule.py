@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BẢNG LỊCH TỐI ƯU CHO MỌI SOC BAN ĐẦU (PARAMETRIC)
+
+create_smart_schedule / generate_optimal_daily_schedule / maximize_baseline_optimizer
+chỉ giải cho 1 initial_soc mỗi lần gọi. Module này:
+- Giải DP 1 lần (mỗi SOC mục tiêu cuối ngày) → policy cho mọi SOC trên lưới 0–100%
+- Đi xuôi policy cho tất cả SOC ban đầu cùng lúc → bảng (SOC ban đầu × 8 blocks)
+- Mỗi dòng được đi lại bằng SOC liên tục (từ 基準値 float32 đã lưu); dòng vượt
+  giới hạn bị đánh dấu không khả thi
+- Lưu bảng .npz gọn nhẹ, tra cứu O(1) (nội suy tuyến tính giữa 2 điểm lưới)
+"""
+
+import numpy as np
+
+from dp_solver import SOC_TOLERANCE, rollout_policy, soc_violation, solve_dp
+from soc_model import INTERCEPT, SLOPE, delta_soc
+
+# Giới hạn SOC (giống new_day_scheduler.py)
+SOC_MIN = 10
+SOC_MAX = 90
+
+BLOCK_HOURS = 3.0
+
+
+def build_schedule_table(soc_starts=None, soc_ends=None, n_blocks=8,
+                         soc_min=SOC_MIN, soc_max=SOC_MAX, soc_resolution=0.1,
+                         baseline_step=1.0, end_tolerance=0.5, block_hours=BLOCK_HOURS,
+                         slope=SLOPE, intercept=INTERCEPT, **dp_kwargs):
+    """
+    Tính lịch tối ưu cho mọi SOC ban đầu (và SOC mục tiêu cuối ngày)
+
+    Args:
+        soc_starts: lưới SOC ban đầu (%), mặc định 0–100% bước 0.5%
+        soc_ends: list SOC mục tiêu cuối ngày (%). None = cuối ngày tự do
+        n_blocks, soc_min, soc_max, soc_resolution, baseline_step, end_tolerance:
+            truyền cho solve_dp
+        **dp_kwargs: tham số khác của solve_dp (participating, jepx_delta, ...)
+
+    Returns:
+        dict:
+            'soc_starts': array (S,)
+            'soc_ends': array (E,) (NaN = tự do)
+            'baselines': float32 (E, S, n_blocks), NaN nếu không khả thi
+            'total': float32 (E, S) Σ基準値
+            'feasible': bool (E, S), đã kiểm tra lại bằng SOC liên tục
+            'interpolate': True nếu lookup được nội suy giữa 2 dòng (mô hình tuyến tính)
+    """
+    if soc_starts is None:
+        soc_starts = np.arange(0.0, 100.0 + 1e-9, 0.5)
+    soc_starts = np.asarray(soc_starts, dtype=np.float64)
+    ends = [None] if soc_ends is None else list(soc_ends)
+
+    baselines = np.full((len(ends), len(soc_starts), n_blocks), np.nan, dtype=np.float32)
+    feasible = np.zeros((len(ends), len(soc_starts)), dtype=bool)
+
+    for e, soc_end in enumerate(ends):
+        result = solve_dp(n_blocks=n_blocks, soc_start=float(soc_starts[0]),
+                          soc_min=soc_min, soc_max=soc_max,
+                          soc_resolution=soc_resolution, baseline_step=baseline_step,
+                          soc_end=soc_end, end_tolerance=end_tolerance,
+                          grid_range=(soc_starts.min(), soc_starts.max()),
+                          block_hours=block_hours, slope=slope, intercept=intercept,
+                          **dp_kwargs)
+        patterns, ok = rollout_policy(result, soc_starts, block_hours=block_hours,
+                                      slope=slope, intercept=intercept)
+        baselines[e] = patterns
+
+        # Kiểm tra lại đúng giá trị sẽ lưu (float32), không tin cờ của solver
+        soc = _replay(result, soc_starts, baselines[e], block_hours, slope, intercept)
+        feasible[e] = ok & (soc_violation(soc, **result['bounds']) <= SOC_TOLERANCE)
+        baselines[e][~feasible[e]] = np.nan
+
+    return {
+        'soc_starts': soc_starts,
+        'soc_ends': np.array([np.nan if s is None else s for s in ends], dtype=np.float64),
+        'baselines': baselines,
+        'total': np.nansum(baselines, axis=2, dtype=np.float32) * np.where(feasible, 1, np.nan),
+        'feasible': feasible,
+        'interpolate': np.array(dp_kwargs.get('piecewise') is None),
+    }
+
+
+def _replay(result, soc_starts, baselines, block_hours, slope, intercept):
+    """SOC liên tục (S, n_blocks + 1) của các lịch trong bảng, cùng mô hình với DP"""
+    fixed = result['fixed_delta']
+    baselines = np.nan_to_num(baselines.astype(np.float64))
+    if result['piecewise'] is not None:
+        import soc_piecewise
+
+        return soc_piecewise.soc_trajectory(result['piecewise'], soc_starts, baselines,
+                                            block_hours, result['substeps'], fixed_delta=fixed)
+    delta = np.where(np.isnan(fixed), delta_soc(baselines, block_hours, slope=slope,
+                                                intercept=intercept), fixed)
+    return np.column_stack([soc_starts, soc_starts[:, np.newaxis] + np.cumsum(delta, axis=1)])
+
+
+def save_schedule_table(table, path):
+    """Lưu bảng ra file .npz"""
+    np.savez_compressed(path, **table)
+
+
+def load_schedule_table(path):
+    """Đọc bảng từ file .npz"""
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def lookup_schedule(table, initial_soc, soc_end=None):
+    """
+    Tra lịch tối ưu cho 1 SOC ban đầu, O(1), không gọi solver
+
+    Nội suy tuyến tính giữa 2 điểm lưới SOC ban đầu. Với mô hình tuyến tính, SOC
+    là hàm affine của (SOC ban đầu, 基準値) nên tổ hợp lồi của 2 dòng khả thi vẫn
+    khả thi (các dòng đã được kiểm tra lại khi build). Nếu 1 trong 2 điểm không
+    khả thi, hoặc bảng theo mô hình từng khúc (không affine), thì trả về lịch của
+    điểm lưới gần nhất; lịch đó chỉ được coi là khả thi khi initial_soc nằm đúng
+    trên điểm lưới (lệch SOC ban đầu làm lệch cả trajectory).
+
+    Args:
+        table: kết quả của build_schedule_table / load_schedule_table
+        initial_soc: SOC ban đầu (%); ngoài [soc_starts[0], soc_starts[-1]] của bảng
+            → feasible=False (không lấy dòng 0% / 100%)
+        soc_end: SOC mục tiêu cuối ngày (%), lấy mức gần nhất trong bảng.
+            None = cột "tự do" (hoặc cột đầu tiên)
+
+    Returns:
+        dict: 'baselines' array (n_blocks,), 'total', 'feasible'
+    """
+    starts = table['soc_starts']
+    ends = table['soc_ends']
+
+    if soc_end is None or np.all(np.isnan(ends)):
+        e = int(np.argmax(np.isnan(ends))) if np.any(np.isnan(ends)) else 0
+    else:
+        e = int(np.nanargmin(np.abs(ends - soc_end)))
+
+    if not starts[0] - SOC_TOLERANCE <= initial_soc <= starts[-1] + SOC_TOLERANCE:
+        return {'baselines': np.full(table['baselines'].shape[2], np.nan),
+                'total': None, 'feasible': False}
+
+    # Lưới đều → chỉ số tính trực tiếp
+    step = starts[1] - starts[0] if len(starts) > 1 else 1.0
+    position = np.clip((initial_soc - starts[0]) / step, 0, len(starts) - 1)
+    i = min(int(position), len(starts) - 2) if len(starts) > 1 else 0
+    weight = position - i
+
+    feasible = table['feasible'][e]
+    interpolate = bool(table.get('interpolate', True))
+    if interpolate and len(starts) > 1 and feasible[i] and feasible[i + 1]:
+        baselines = ((1 - weight) * table['baselines'][e, i] +
+                     weight * table['baselines'][e, i + 1])
+        ok = True
+    else:
+        nearest = int(round(position))
+        baselines = table['baselines'][e, nearest].astype(np.float64)
+        ok = bool(feasible[nearest]) and abs(initial_soc - starts[nearest]) < SOC_TOLERANCE
+
+    return {
+        'baselines': baselines,
+        'total': float(np.sum(baselines)) if ok else None,
+        'feasible': ok,
+    }
+
+
+if __name__ == '__main__':
+    import time
+
+    print('=' * 100)
+    print('📅 BẢNG LỊCH TỐI ƯU CHO MỌI SOC BAN ĐẦU')
+    print('=' * 100)
+
+    t0 = time.perf_counter()
+    table = build_schedule_table(soc_ends=np.arange(10, 91, 5))
+    elapsed = time.perf_counter() - t0
+
+    n_ends, n_starts, n_blocks = table['baselines'].shape
+    print(f'\nĐã tính {n_ends} SOC mục tiêu × {n_starts} SOC ban đầu trong {elapsed:.2f}s')
+    print(f'Khả thi: {table["feasible"].sum():,} / {table["feasible"].size:,}')
+
+    output_file = 'parametric_schedule_table.npz'
+    save_schedule_table(table, output_file)
+    print(f'✅ Đã lưu: {output_file}')
+
+    table = load_schedule_table(output_file)
+    for initial_soc, soc_end in [(20, 80), (5, 50), (37.3, 60), (50, 50)]:
+        t0 = time.perf_counter()
+        plan = lookup_schedule(table, initial_soc, soc_end)
+        elapsed = time.perf_counter() - t0
+        print(f'\nSOC {initial_soc}% → {soc_end}% ({elapsed*1e6:.0f} µs)')
+        if plan['feasible']:
+            print(f'   基準値: {[round(float(b)) for b in plan["baselines"]]}')
+            print(f'   Σ基準値: {plan["total"]:.0f} kW')
+        else:
+            print('   ❌ Không khả thi')
@@ -6,8 +6,6 @@ CHỨNG MINH TOÁN HỌC: TẠI SAO 7 BLOCKS @ 507KW LÀ TỐI ƯU NHẤT?
 
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
 print("="*80)
 print("📐 CHỨNG MINH: 7 BLOCKS @ 507KW LÀ TỐI ƯU")
@@ -268,6 +266,10 @@ print("\n" + "="*80)
 print("📊 MINH HỌA BẰNG ĐỒ THỊ")
 print("="*80)
 
+# Plotly chỉ cần cho phần vẽ đồ thị
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
 # Calculate for different patterns
 patterns_compare = [
     ("Đều: 7×507", [507]*7, 'green'),
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TỐI ƯU NHIỀU NGÀY THEO CỬA SỔ TRƯỢT (ROLLING HORIZON)
+
+Thay cho create_multi_day_simulation của realistic_scheduler.py (nối lịch
+viết tay từng ngày, SOC cuối ngày như 80% hay initial_soc là đoán):
+- Mỗi ngày giải DP cho cả cửa sổ nhìn trước `horizon_days` ngày × 8 blocks
+  (Σ基準値 MAX trên toàn cửa sổ), nhưng chỉ chốt lịch của ngày đầu tiên
+- SOC cuối ngày (dự đoán hoặc thực đo qua `observe`) là SOC ban đầu của cửa sổ sau
+- Warm start: cửa sổ được giải ngược từng ngày (value function của ngày sau
+  là điều kiện cuối của ngày trước). Cửa sổ sau trùng cửa sổ trước ở mọi ngày
+  trừ ngày cuối, nên các đoạn đuôi đã giải được dùng lại từ cache; policy của
+  solve_dp phủ mọi SOC trên lưới nên SOC thực tế lệch dự đoán cũng không cần
+  giải lại. Lịch theo tuần (JEPX khác nhau ngày thường / cuối tuần) chỉ cần
+  vài chục lần giải DP 1 ngày cho cả năm.
+"""
+
+import time
+
+import numpy as np
+
+from dp_solver import SOC_TOLERANCE, rollout_policy, soc_violation, solve_dp
+from soc_model import BLOCK_HOURS, INTERCEPT, SLOPE, delta_soc
+
+# Giới hạn SOC (giống realistic_scheduler.py)
+SOC_MIN = 10
+SOC_MAX = 90
+
+# Giới hạn vật lý của SOC khi mô phỏng (pin rỗng không xả JEPX tiếp được)
+SOC_FLOOR = 0.0
+SOC_CEIL = 100.0
+
+BLOCKS_PER_DAY = 8
+HORIZON_DAYS = 3
+
+
+def make_day(participating=None, jepx=None, soc_min=SOC_MIN, soc_max=SOC_MAX,
+             blocks_per_day=BLOCKS_PER_DAY):
+    """
+    Cấu hình 1 ngày
+
+    Args:
+        participating: số thứ tự block (1..blocks_per_day) có 基準値.
+            None = mọi block trừ block JEPX
+        jepx: dict {block: ΔSOC (%)} cho block JEPX, ví dụ {8: -85.0}
+        soc_min, soc_max: giới hạn SOC sau mỗi block (scalar hoặc list blocks_per_day)
+
+    Returns:
+        dict: 'participating' (bool), 'fixed_delta' (NaN = 基準値 0 khi không tham gia),
+        'soc_min', 'soc_max' — các array (blocks_per_day,)
+    """
+    jepx = dict(jepx or {})
+    if participating is None:
+        participating = [b for b in range(1, blocks_per_day + 1) if b not in jepx]
+    active = np.isin(np.arange(1, blocks_per_day + 1), list(participating))
+    fixed_delta = np.full(blocks_per_day, np.nan)
+    for block, delta in jepx.items():
+        fixed_delta[block - 1] = delta
+    return {
+        'participating': active,
+        'fixed_delta': fixed_delta,
+        'soc_min': np.broadcast_to(np.asarray(soc_min, dtype=np.float64), blocks_per_day).copy(),
+        'soc_max': np.broadcast_to(np.asarray(soc_max, dtype=np.float64), blocks_per_day).copy(),
+    }
+
+
+def _day_key(day):
+    """Khóa so sánh cấu hình ngày (NaN → None để tuple so sánh được)"""
+    return tuple(tuple(None if np.isnan(v) else float(v) for v in np.asarray(day[name], dtype=np.float64))
+                 for name in ('participating', 'fixed_delta', 'soc_min', 'soc_max'))
+
+
+def solve_window(days, keys=None, cache=None, soc_end=None, end_tolerance=0.5,
+                 soc_resolution=0.1, baseline_step=1.0, grid_range=(0, 100),
+                 block_hours=BLOCK_HOURS, slope=SLOPE, intercept=INTERCEPT):
+    """
+    Giải DP cho 1 cửa sổ nhiều ngày, trả về nghiệm của ngày đầu tiên
+
+    Giải ngược từng ngày: value[0] (Σ基準値 tối ưu từ đầu ngày với mọi SOC) của
+    ngày sau là terminal_value của ngày trước. Nghiệm của mỗi đoạn đuôi
+    (cấu hình các ngày còn lại + điều kiện cuối) được lưu trong cache, nên
+    cửa sổ sau dùng lại mọi đoạn đuôi trùng với cửa sổ trước (warm start).
+
+    Args:
+        days: list cấu hình ngày (make_day)
+        keys: khóa cấu hình của từng ngày (_day_key), None = tự tính
+        cache: dict dùng chung giữa các lần gọi, None = không lưu
+        soc_end: SOC bắt buộc cuối cửa sổ (%), None = tự do
+        grid_range: lưới SOC chung của mọi ngày (policy dùng được cho mọi SOC trong đó)
+
+    Returns:
+        (result, solves): kết quả solve_dp của ngày đầu (value đã tính cả các ngày
+        nhìn trước) và số lần giải DP mới
+    """
+    if keys is None:
+        keys = [_day_key(day) for day in days]
+    if cache is None:
+        cache = {}
+
+    solves = 0
+    result = None
+    for i in range(len(days) - 1, -1, -1):
+        key = (tuple(keys[i:]), soc_end, end_tolerance, soc_resolution, baseline_step,
+               tuple(grid_range), block_hours, slope, intercept)
+        if key not in cache:
+            day = days[i]
+            tail = {'soc_end': soc_end} if result is None else {'terminal_value': result['value'][0]}
+            cache[key] = solve_dp(n_blocks=len(day['participating']), soc_start=grid_range[0],
+                                  soc_min=day['soc_min'], soc_max=day['soc_max'],
+                                  participating=day['participating'], fixed_delta=day['fixed_delta'],
+                                  end_tolerance=end_tolerance, soc_resolution=soc_resolution,
+                                  baseline_step=baseline_step, grid_range=grid_range,
+                                  block_hours=block_hours, slope=slope, intercept=intercept, **tail)
+            solves += 1
+        result = cache[key]
+    return result, solves
+
+
+def simulate_rolling_horizon(days, soc_initial=15.0, horizon_days=HORIZON_DAYS, soc_end=None,
+                             observe=None, block_hours=BLOCK_HOURS, slope=SLOPE,
+                             intercept=INTERCEPT, **solve_kwargs):
+    """
+    Mô phỏng nhiều ngày: mỗi ngày tối ưu cửa sổ `horizon_days` ngày, chốt ngày đầu
+
+    Args:
+        days: list cấu hình ngày (make_day), hoặc (cấu hình, số ngày) để lặp lại
+        soc_initial: SOC lúc 00:00 ngày đầu (%)
+        horizon_days: số ngày nhìn trước (gồm cả ngày chốt). Cuối dữ liệu thì
+            cửa sổ ngắn lại
+        soc_end: SOC bắt buộc cuối mỗi cửa sổ (%), None = tự do
+        observe: hàm (day_index, baselines, soc_predicted) → SOC thực tế cuối ngày.
+            None = SOC dự đoán theo công thức
+        **solve_kwargs: truyền cho solve_window (soc_resolution, baseline_step, grid_range, ...)
+
+    Returns:
+        dict:
+            'baselines': array (D, blocks) 基準値 đã chốt (ngày không khả thi: policy
+                của mức SOC khả thi gần nhất)
+            'soc': array (D, blocks + 1) SOC dự đoán trong từng ngày (cắt về 0–100%)
+            'soc_end': array (D,) SOC cuối ngày dùng cho ngày sau
+            'feasible': mask bool (D,), lịch đã chốt giữ SOC liên tục (không cắt
+                0–100%) trong soc_min / soc_max của ngày (và soc_end ở ngày cuối)
+            'total': array (D,) Σ基準値 mỗi ngày
+            'solves': số lần giải DP 1 ngày thật sự, 'elapsed': thời gian (giây)
+    """
+    if isinstance(days, tuple):
+        day, n_days = days
+        days = [day] * n_days
+    n_days = len(days)
+    keys = [_day_key(day) for day in days]
+    blocks = len(days[0]['participating'])
+
+    baselines = np.full((n_days, blocks), np.nan)
+    soc = np.full((n_days, blocks + 1), np.nan)
+    soc_final = np.full(n_days, np.nan)
+    feasible = np.zeros(n_days, dtype=bool)
+
+    t0 = time.perf_counter()
+    cache = {}
+    solves = 0
+    soc_current = float(soc_initial)
+
+    for d in range(n_days):
+        window = slice(d, min(d + horizon_days, n_days))
+        result, new_solves = solve_window(days[window], keys[window], cache, soc_end=soc_end,
+                                          block_hours=block_hours, slope=slope,
+                                          intercept=intercept, **solve_kwargs)
+        solves += new_solves
+
+        patterns, ok = rollout_policy(result, [soc_current], block_hours=block_hours,
+                                      slope=slope, intercept=intercept)
+        feasible[d] = ok[0]
+        if not ok[0]:
+            # Không khả thi từ SOC hiện tại: dùng policy của mức SOC khả thi gần nhất
+            grid = result['soc_grid'][np.isfinite(result['value'][0])]
+            if len(grid):
+                nearest = grid[np.argmin(np.abs(grid - soc_current))]
+                patterns, _ = rollout_policy(result, [nearest], block_hours=block_hours,
+                                             slope=slope, intercept=intercept)
+            else:
+                patterns = np.zeros((1, blocks))
+        day_pattern = patterns[0]
+
+        fixed = days[d]['fixed_delta']
+        active = days[d]['participating']
+        delta = delta_soc(day_pattern, block_hours, slope=slope, intercept=intercept)
+        delta = np.where(~active & ~np.isnan(fixed), fixed, delta)
+
+        # Kiểm tra lại ngày đã chốt bằng SOC liên tục; soc_end chỉ ràng buộc ngày cuối
+        last = d == n_days - 1
+        violation = soc_violation(soc_current + np.concatenate([[0.0], np.cumsum(delta)]),
+                                  days[d]['soc_min'], days[d]['soc_max'],
+                                  soc_end=soc_end if last else None,
+                                  end_tolerance=solve_kwargs.get('end_tolerance', 0.5))
+        feasible[d] &= violation <= SOC_TOLERANCE
+
+        trajectory = [soc_current]
+        for step in delta:
+            trajectory.append(min(SOC_CEIL, max(SOC_FLOOR, trajectory[-1] + step)))
+
+        baselines[d] = day_pattern
+        soc[d] = trajectory
+        if observe is not None:
+            trajectory[-1] = float(observe(d, day_pattern, np.array(trajectory)))
+        soc_current = min(SOC_CEIL, max(SOC_FLOOR, trajectory[-1]))
+        soc_final[d] = soc_current
+
+    return {
+        'baselines': baselines,
+        'soc': soc,
+        'soc_end': soc_final,
+        'feasible': feasible,
+        'total': baselines.sum(axis=1),
+        'solves': solves,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+def to_dataframe(result, start_date=None):
+    """Kết quả → DataFrame 1 dòng / block (giống multi_day_simulation.csv)"""
+    import pandas as pd
+
+    n_days, blocks = result['baselines'].shape
+    day = np.repeat(np.arange(1, n_days + 1), blocks)
+    block = np.tile(np.arange(1, blocks + 1), n_days)
+    hours = 24 // blocks
+    df = pd.DataFrame({
+        'day': day,
+        'block': block,
+        'time_range': [f'{(b - 1) * hours:02d}:00-{b * hours - 1:02d}:59' for b in block],
+        'soc_start': result['soc'][:, :-1].ravel(),
+        'soc_predicted': result['soc'][:, 1:].ravel(),
+        'baseline_kw': result['baselines'].ravel(),
+    })
+    df['soc_change'] = df['soc_predicted'] - df['soc_start']
+    if start_date is not None:
+        df.insert(1, 'date', pd.Timestamp(start_date) + pd.to_timedelta(day - 1, unit='D'))
+    return df
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('🔁 ROLLING HORIZON NHIỀU NGÀY')
+    print('=' * 80)
+
+    # 1) 8 blocks đều có 基準値, SOC 10–90% (giống create_multi_day_simulation)
+    result = simulate_rolling_horizon((make_day(), 3), soc_initial=15)
+    print(f"\n3 ngày, 8 blocks, nhìn trước {HORIZON_DAYS} ngày: {result['solves']} lần giải DP 1 ngày, "
+          f"{result['elapsed']:.2f} giây")
+    for d in range(3):
+        print(f"   Ngày {d + 1}: 基準値 {np.round(result['baselines'][d]).astype(int).tolist()}, "
+              f"SOC cuối {result['soc_end'][d]:.1f}%")
+
+    # 2) 365 ngày: 7 blocks + JEPX block 8 (-85% ngày thường, -75% cuối tuần).
+    # Sau JEPX được phép thấp hơn 5% tới 0.5% (như end_tolerance): với cận 5%
+    # đúng bằng 90% − 85%, chỉ có SOC 90.000% trước JEPX là khả thi
+    after_jepx = [5.0] * 7 + [4.5]
+    weekday = make_day(jepx={8: -85.0}, soc_min=after_jepx, soc_max=90)
+    weekend = make_day(jepx={8: -75.0}, soc_min=after_jepx, soc_max=90)
+    year = [weekend if d % 7 in (5, 6) else weekday for d in range(365)]
+
+    result = simulate_rolling_horizon(year, soc_initial=5.0)
+    print(f"\n365 ngày (JEPX -85%/-75%): {result['solves']} lần giải DP 1 ngày, "
+          f"{result['elapsed']:.2f} giây")
+    print(f"   Khả thi: {result['feasible'].sum()}/365 ngày, "
+          f"Σ基準値 trung bình {result['total'].mean():.0f} kW/ngày")
+    print(f"   SOC cuối ngày: {result['soc_end'].min():.1f}% – {result['soc_end'].max():.1f}%")
+
+    # 3) SOC thực tế lệch khỏi dự đoán (nhiễu ±2%) → cửa sổ sau tự điều chỉnh
+    rng = np.random.default_rng(0)
+    noisy = simulate_rolling_horizon(
+        year, soc_initial=5.0,
+        observe=lambda d, pattern, soc: soc[-1] + rng.normal(0, 2.0))
+    print(f"\nCó nhiễu SOC ±2%: khả thi {noisy['feasible'].sum()}/365 ngày, "
+          f"{noisy['solves']} lần giải, {noisy['elapsed']:.2f} giây")
+
+    output_file = 'rolling_horizon_simulation.csv'
+    to_dataframe(result, start_date='2025-01-01').to_csv(output_file, index=False,
+                                                         encoding='utf-8-sig')
+    print(f'\n✅ Đã lưu: {output_file}')
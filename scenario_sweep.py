@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QUÉT KỊCH BẢN SONG SONG (SCENARIO SWEEP)
+
+Thay cho all_scenarios.csv / optimal_24h_schedules.csv (vài kịch bản chọn tay,
+mỗi kịch bản 1 lần sửa script): khai báo lưới tham số, engine tự sinh mọi tổ hợp
+và giải trên tất cả CPU.
+
+    grid = {
+        'soc_start': np.arange(0, 91, 1.0),
+        'soc_end': [5, 10],
+        'soc_min': [5, 10], 'soc_max': [85, 90],
+        'jepx_delta': [-85, -75, None],          # None = không có JEPX
+        'participating': ['1-7', '3-7'],         # block có 基準値
+        'model': ['kotohira/v1', 'kotohira/v2'],  # hoặc 'slope' / 'intercept'
+    }
+    table = run_sweep(grid, output='sweep_results.csv')
+
+- Kịch bản được gom nhóm theo mọi tham số trừ soc_start: mỗi nhóm giải DP 1 lần
+  (policy phủ mọi SOC ban đầu) rồi đi xuôi policy cho cả cột soc_start cùng lúc.
+  method='lp' giải LP liên tục cho từng kịch bản, ma trận build 1 lần mỗi nhóm.
+- Bảng tham số (array NumPy chỉ đọc) được gửi cho mỗi worker 1 lần qua
+  initializer; task chỉ là khoảng chỉ số nhóm (chunk), nên chi phí pickle nhỏ.
+- Kết quả được ghi dần vào 1 file CSV theo thứ tự chunk khi worker trả về.
+
+    python scenario_sweep.py --grid grid.json --output sweep_results.csv --workers 8
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dp_solver import SOC_TOLERANCE, rollout_policy, soc_violation, solve_dp
+from soc_model import BLOCK_HOURS, get_model, soc_trajectory
+
+N_BLOCKS = 7
+
+# Giá trị mặc định của tham số không khai báo trong lưới
+DEFAULTS = {
+    'soc_start': 5.0,
+    'soc_end': 5.0,
+    'soc_min': 5.0,
+    'soc_max': 90.0,
+    'jepx_delta': -85.0,
+    'participating': '1-7',
+    'model': None,
+}
+
+# Cột của bảng nhóm (mọi tham số trừ soc_start)
+GROUP_COLUMNS = ('soc_end', 'soc_min', 'soc_max', 'jepx_delta', 'participating', 'slope', 'intercept')
+
+# Bảng tham số của worker (gán 1 lần trong _init_worker)
+_TABLE = None
+
+
+def _parse_blocks(value):
+    """'1-7', '3,4,5' hoặc list → bitmask block tham gia"""
+    if isinstance(value, str):
+        blocks = []
+        for part in value.split(','):
+            if '-' in part:
+                lo, hi = part.split('-')
+                blocks.extend(range(int(lo), int(hi) + 1))
+            elif part:
+                blocks.append(int(part))
+    else:
+        blocks = list(value)
+    mask = 0
+    for b in blocks:
+        mask |= 1 << (int(b) - 1)
+    return mask
+
+
+def _blocks_text(mask, n_blocks=N_BLOCKS):
+    return ','.join(str(b) for b in range(1, n_blocks + 1) if mask >> (b - 1) & 1)
+
+
+def _values(grid, name):
+    value = grid.get(name, DEFAULTS.get(name))
+    if isinstance(value, (str, bytes)) or not np.iterable(value):
+        return [value]
+    return list(value)
+
+
+def expand_grid(grid):
+    """
+    Lưới khai báo → bảng tham số
+
+    Args:
+        grid: dict {tham số: list giá trị hoặc 1 giá trị}. Tham số:
+            soc_start, soc_end (None = tự do), soc_min, soc_max,
+            jepx_delta (None = không có JEPX), participating,
+            model ('site/version' của soc_model) hoặc slope, intercept
+
+    Returns:
+        dict:
+            'soc_starts': array (S,)
+            'groups': array (G, len(GROUP_COLUMNS)) float (NaN = None)
+            'n_scenarios': G × S
+    """
+    unknown = set(grid) - set(DEFAULTS) - {'slope', 'intercept'}
+    if unknown:
+        raise ValueError(f"Tham số không hỗ trợ: {sorted(unknown)}")
+
+    # Hệ số mô hình: theo tên phiên bản, hoặc slope × intercept
+    if 'slope' in grid or 'intercept' in grid:
+        default = get_model()
+        coefficients = list(itertools.product(
+            _values({'slope': default['slope'], **grid}, 'slope'),
+            _values({'intercept': default['intercept'], **grid}, 'intercept')))
+    else:
+        coefficients = []
+        for name in _values(grid, 'model'):
+            model = get_model(*name.split('/')) if name else get_model()
+            coefficients.append((model['slope'], model['intercept']))
+
+    def number(v):
+        return np.nan if v is None else float(v)
+
+    rows = []
+    for soc_end, soc_min, soc_max, jepx, blocks, (slope, intercept) in itertools.product(
+            _values(grid, 'soc_end'), _values(grid, 'soc_min'), _values(grid, 'soc_max'),
+            _values(grid, 'jepx_delta'), _values(grid, 'participating'), coefficients):
+        rows.append((number(soc_end), float(soc_min), float(soc_max), number(jepx),
+                     float(_parse_blocks(blocks)), float(slope), float(intercept)))
+
+    soc_starts = np.asarray(_values(grid, 'soc_start'), dtype=np.float64)
+    groups = np.array(rows, dtype=np.float64).reshape(-1, len(GROUP_COLUMNS))
+    return {'soc_starts': soc_starts, 'groups': groups,
+            'n_scenarios': len(groups) * len(soc_starts)}
+
+
+def solve_group(group, soc_starts, method='dp', n_blocks=N_BLOCKS, soc_resolution=0.1,
+                baseline_step=1.0, end_tolerance=0.5, block_hours=BLOCK_HOURS):
+    """
+    Giải 1 nhóm tham số cho mọi SOC ban đầu
+
+    Block không tham gia có 基準値 = 0 và được phép xuống dưới soc_min
+    (giống optimal_block12_allow_below5.py). JEPX (nếu có) sau block cuối.
+
+    Returns:
+        dict: 'feasible' (S,), 'baselines' (S, n_blocks), 'soc' (S, n_blocks + 1),
+        'soc_final' (S,) SOC sau JEPX
+    """
+    soc_end, soc_min, soc_max, jepx, mask, slope, intercept = group
+    soc_end = None if np.isnan(soc_end) else soc_end
+    jepx = None if np.isnan(jepx) else jepx
+    active = np.array([int(mask) >> k & 1 for k in range(n_blocks)], dtype=bool)
+    block_min = np.where(active, soc_min, -100.0)
+
+    if method == 'dp':
+        result = solve_dp(n_blocks=n_blocks, soc_start=float(soc_starts[0]), soc_min=block_min,
+                          soc_max=soc_max, soc_resolution=soc_resolution,
+                          baseline_step=baseline_step, participating=active,
+                          jepx_delta=jepx, soc_end=soc_end, end_tolerance=end_tolerance,
+                          grid_range=(soc_starts.min(), soc_starts.max()),
+                          block_hours=block_hours, slope=slope, intercept=intercept)
+        baselines, feasible = rollout_policy(result, soc_starts, block_hours=block_hours,
+                                             slope=slope, intercept=intercept)
+    else:
+        from lp_scheduler import build_schedule_problem, solve_schedule
+
+        participating = [k + 1 for k in range(n_blocks) if active[k]]
+        problem = build_schedule_problem(
+            n_blocks=n_blocks, participating=participating,
+            idle_delta={k + 1: intercept * block_hours for k in range(n_blocks) if not active[k]},
+            baseline_step=None, block_hours=block_hours, slope=slope, intercept=intercept)
+        target = None if soc_end is None else soc_end - (jepx or 0.0)
+        baselines = np.full((len(soc_starts), n_blocks), np.nan)
+        feasible = np.zeros(len(soc_starts), dtype=bool)
+        for i, soc_start in enumerate(soc_starts):
+            plan = solve_schedule(problem, soc_start=soc_start, soc_min=block_min,
+                                  soc_max=soc_max, soc_end=target, end_tolerance=end_tolerance)
+            if plan['success']:
+                baselines[i], feasible[i] = plan['baselines'], True
+
+    # Kiểm tra lại bằng SOC liên tục (cả DP lẫn LP) trước khi ghi kết quả
+    soc = soc_trajectory(soc_starts, np.nan_to_num(baselines), block_hours,
+                         slope=slope, intercept=intercept)
+    feasible &= soc_violation(soc, block_min, soc_max, soc_end, jepx, end_tolerance) <= SOC_TOLERANCE
+    baselines[~feasible] = np.nan
+    soc[~feasible] = np.nan
+    return {
+        'feasible': feasible,
+        'baselines': baselines,
+        'soc': soc,
+        'soc_final': soc[:, -1] + (jepx or 0.0),
+    }
+
+
+def _init_worker(table, solve_kwargs):
+    global _TABLE
+    _TABLE = (table, solve_kwargs)
+
+
+def _solve_chunk(bounds):
+    """Giải các nhóm [lo, hi) (chạy trong worker)"""
+    table, solve_kwargs = _TABLE
+    lo, hi = bounds
+    soc_starts = table['soc_starts']
+    results = [solve_group(table['groups'][g], soc_starts, **solve_kwargs) for g in range(lo, hi)]
+    return lo, hi, results
+
+
+def _chunk_frame(table, lo, hi, results, n_blocks):
+    """Kết quả 1 chunk → DataFrame 1 dòng / kịch bản"""
+    import pandas as pd
+
+    soc_starts = table['soc_starts']
+    groups = np.repeat(table['groups'][lo:hi], len(soc_starts), axis=0)
+    frame = pd.DataFrame(groups, columns=GROUP_COLUMNS)
+    frame['participating'] = [_blocks_text(int(m), n_blocks) for m in frame['participating']]
+    frame.insert(0, 'soc_start', np.tile(soc_starts, hi - lo))
+    frame.insert(0, 'scenario', np.arange(lo * len(soc_starts), hi * len(soc_starts)))
+
+    feasible = np.concatenate([r['feasible'] for r in results])
+    baselines = np.concatenate([r['baselines'] for r in results])
+    soc = np.concatenate([r['soc'] for r in results])
+    frame['feasible'] = feasible
+    frame['total'] = np.where(feasible, np.nansum(baselines, axis=1), np.nan)
+    frame['soc_peak'] = soc.max(axis=1)
+    frame['soc_final'] = np.concatenate([r['soc_final'] for r in results])
+    for k in range(n_blocks):
+        frame[f'b{k + 1}'] = baselines[:, k]
+    return frame
+
+
+def run_sweep(grid, output=None, workers=None, chunk_groups=None, method='dp',
+              n_blocks=N_BLOCKS, **solve_kwargs):
+    """
+    Quét toàn bộ lưới kịch bản trên process pool
+
+    Args:
+        grid: lưới tham số (xem expand_grid)
+        output: file CSV ghi dần kết quả (None = chỉ trả về)
+        workers: số tiến trình (None = số CPU, 1 = chạy tuần tự không tạo pool)
+        chunk_groups: số nhóm mỗi task (None = tự chọn ~4 task / worker)
+        method: 'dp' (gom nhóm theo soc_start) hoặc 'lp' (LP liên tục từng kịch bản)
+        **solve_kwargs: soc_resolution, baseline_step, end_tolerance, block_hours
+
+    Returns:
+        DataFrame 1 dòng / kịch bản: tham số, feasible, total, soc_peak, soc_final, b1..bn
+    """
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    table = expand_grid(grid)
+    n_groups = len(table['groups'])
+    workers = workers or os.cpu_count() or 1
+    if chunk_groups is None:
+        chunk_groups = max(1, -(-n_groups // (workers * 4)))
+    bounds = [(lo, min(lo + chunk_groups, n_groups)) for lo in range(0, n_groups, chunk_groups)]
+    solve_kwargs = dict(solve_kwargs, method=method, n_blocks=n_blocks)
+
+    if output and os.path.exists(output):
+        os.remove(output)
+
+    frames = []
+
+    def collect(lo, hi, results):
+        frame = _chunk_frame(table, lo, hi, results, n_blocks)
+        if output:
+            # BOM chỉ ở đầu file (giống các CSV utf-8-sig khác)
+            frame.to_csv(output, mode='a', header=not frames, index=False,
+                         encoding='utf-8' if frames else 'utf-8-sig')
+        frames.append(frame)
+
+    if workers == 1:
+        _init_worker(table, solve_kwargs)
+        for chunk in bounds:
+            collect(*_solve_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(table, solve_kwargs)) as pool:
+            for lo, hi, results in pool.map(_solve_chunk, bounds):
+                collect(lo, hi, results)
+
+    result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    result.attrs['elapsed'] = time.perf_counter() - t0
+    result.attrs['workers'] = workers
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quét kịch bản 基準値 song song')
+    parser.add_argument('--grid', help='file JSON lưới tham số (mặc định: lưới demo)')
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-groups', type=int, default=None)
+    parser.add_argument('--method', choices=['dp', 'lp'], default='dp')
+    parser.add_argument('--soc-resolution', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.grid:
+        with open(args.grid, encoding='utf-8') as f:
+            grid = json.load(f)
+    else:
+        grid = {
+            'soc_start': np.arange(0, 91, 1.0),
+            'soc_end': [5.0, 10.0],
+            'soc_min': [5.0, 10.0],
+            'soc_max': [85.0, 90.0],
+            'jepx_delta': [-85.0, -75.0],
+            'participating': ['1-7', '3-7'],
+            'model': ['kotohira/v1', 'kotohira/v2'],
+        }
+
+    print('=' * 80)
+    print('🧪 QUÉT KỊCH BẢN')
+    print('=' * 80)
+    table = expand_grid(grid)
+    print(f"\n{table['n_scenarios']:,} kịch bản = {len(table['groups']):,} nhóm × "
+          f"{len(table['soc_starts'])} SOC ban đầu")
+
+    result = run_sweep(grid, output=args.output, workers=args.workers,
+                       chunk_groups=args.chunk_groups, method=args.method,
+                       soc_resolution=args.soc_resolution)
+    elapsed = result.attrs['elapsed']
+    print(f"Xong: {elapsed:.1f} giây ({len(result) / elapsed:,.0f} kịch bản/giây, "
+          f"{result.attrs['workers']} worker)")
+    print(f"Khả thi: {result['feasible'].sum():,}/{len(result):,}")
+
+    best = result[result['feasible']].sort_values('total', ascending=False).head(5)
+    print('\nTop 5 Σ基準値:')
+    print(best[['soc_start', 'soc_end', 'soc_min', 'soc_max', 'jepx_delta', 'participating',
+                'slope', 'total']].to_string(index=False))
+    print(f'\n✅ Đã lưu: {args.output}')
@@ -7,9 +7,8 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-# Công thức
-SLOPE = 0.013545
-INTERCEPT = -2.8197
+# Công thức (soc_model.py)
+import soc_model
 
 # Giới hạn
 SOC_MIN = 10
@@ -18,12 +17,11 @@ BASELINE_MAX = 2000
 
 
 def calculate_soc_change_rate(baseline_kw):
-    return SLOPE * baseline_kw + INTERCEPT
+    return soc_model.soc_rate(baseline_kw)
 
 
 def predict_soc(soc_start, baseline_kw, hours=3.0):
-    change_rate = calculate_soc_change_rate(baseline_kw)
-    return soc_start + (change_rate * hours)
+    return soc_model.predict_soc(soc_start, baseline_kw, hours)
 
 
 def test_strategy(num_charge_blocks, soc_initial=15):
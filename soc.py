@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LỆNH `soc` THỐNG NHẤT
+
+    python soc.py optimize --soc-start 5 --jepx -85          # lịch 基準値 tối ưu (DP, chỉ NumPy)
+    python soc.py optimize --method lp --blocks 3-7          # LP/MILP (SciPy)
+    python soc.py optimize --table parametric_schedule_table.npz --soc-start 37.3 --soc-end 60
+    python soc.py backtest 507 507 507 507 507 507 507 --soc-start 5
+    python soc.py fit arao_nijisanji_soc_data.csv            # hồi quy ΔSOC theo 計画値
+    python soc.py plot arao 2024-08-01 --format html png     # đồ thị 1 ngày
+    python soc.py report kotohira --workers 8                # báo cáo mọi ngày
+    python soc.py replay kotohira arao --closed-loop         # backtest chính sách trên lịch sử
+
+Thư viện nặng (SciPy, pandas, Plotly, Kaleido) chỉ được import bên trong
+subcommand cần đến. Thời gian chạy trọn lệnh (đo trên máy dev, ~0.1 s trong đó
+là import NumPy):
+- --help: ~0.05 s
+- optimize --table: ~0.17 s (tra bảng precompute, nhanh nhất)
+- backtest: ~0.2 s
+- optimize (DP): ~0.55 s (~0.45 s là giải DP)
+Gọi từ cron hoặc service khác theo chu kỳ ngắn: dùng --table.
+Thêm --json để in kết quả dạng JSON.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+
+def _parse_blocks(text):
+    """'1-7' hoặc '3,4,5,6,7' → [1, ..., 7]"""
+    blocks = []
+    for part in text.split(','):
+        if '-' in part:
+            lo, hi = part.split('-')
+            blocks.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            blocks.append(int(part))
+    return sorted(set(blocks))
+
+
+def _jepx(text):
+    return None if text.lower() in ('none', 'flex', 'flexible') else float(text)
+
+
+def _emit(result, as_json):
+    if as_json:
+        json.dump(result, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return
+    for key, value in result.items():
+        if isinstance(value, list):
+            value = ', '.join(f'{v:.1f}' if isinstance(v, float) else str(v) for v in value)
+        elif isinstance(value, float):
+            value = f'{value:.4f}'
+        print(f'{key:>12}: {value}')
+
+
+# ============================================================================
+# SUBCOMMANDS
+# ============================================================================
+
+def cmd_optimize(args):
+    t0 = time.perf_counter()
+    n_blocks = 7
+    participating = [b for b in args.blocks if 1 <= b <= n_blocks]
+    soc_end = args.soc_end
+    if soc_end is None and args.jepx is not None:
+        soc_end = args.soc_min
+
+    if args.table:
+        from parametric_schedule import load_schedule_table, lookup_schedule
+
+        plan = lookup_schedule(load_schedule_table(args.table), args.soc_start, soc_end)
+        pattern, feasible = plan['baselines'], plan['feasible']
+
+    elif args.method == 'dp':
+        from dp_solver import solve_dp
+
+        active = [b in participating for b in range(1, n_blocks + 1)]
+        # Block không tham gia được phép xuống dưới soc_min (giống optimal_block12_allow_below5)
+        soc_min = [args.soc_min if a else -100.0 for a in active]
+        result = solve_dp(n_blocks=n_blocks, soc_start=args.soc_start, soc_min=soc_min,
+                          soc_max=args.soc_max, soc_resolution=args.soc_resolution,
+                          participating=active, jepx_delta=args.jepx, soc_end=soc_end,
+                          end_tolerance=args.end_tolerance)
+        pattern, feasible = result['pattern'], result['pattern'] is not None
+
+    else:
+        import numpy as np
+
+        from lp_scheduler import INTERCEPT, optimize_schedule
+
+        inf = np.inf
+        idle = {b: INTERCEPT * 3 for b in range(1, n_blocks + 1) if b not in participating}
+        soc_min = [args.soc_min if b in participating else -inf for b in range(1, n_blocks + 1)]
+        jepx_blocks = {n_blocks + 1: args.jepx}
+        result = optimize_schedule(
+            soc_start=args.soc_start, soc_min=soc_min + [-inf],
+            soc_max=[args.soc_max] * n_blocks + [inf], soc_end=soc_end,
+            end_tolerance=args.end_tolerance, n_blocks=n_blocks + 1,
+            participating=participating, jepx_blocks=jepx_blocks, idle_delta=idle,
+            baseline_step=args.baseline_step)
+        feasible = result['success']
+        pattern = result['baselines'][:n_blocks] if feasible else None
+
+    out = {'feasible': bool(feasible)}
+    if feasible:
+        pattern = [float(b) for b in pattern]
+        out['baselines'] = pattern
+        out['total'] = float(sum(pattern))
+    out['elapsed_ms'] = (time.perf_counter() - t0) * 1000
+    _emit(out, args.json)
+    return 0 if feasible else 1
+
+
+def cmd_backtest(args):
+    from batch_pattern_evaluator import evaluate_patterns
+
+    result = evaluate_patterns(args.baselines, soc_start=args.soc_start, soc_min=args.soc_min,
+                               soc_max=args.soc_max, jepx_delta=args.jepx,
+                               soc_end=args.soc_end, end_tolerance=args.end_tolerance)
+    out = {
+        'feasible': bool(result['feasible'][0]),
+        'soc': [float(s) for s in result['soc'][0]],
+        'jepx_delta': float(result['jepx_delta'][0]),
+        'soc_after_jepx': float(result['soc_after_jepx'][0]),
+        'total': float(result['total'][0]),
+    }
+    _emit(out, args.json)
+    return 0 if out['feasible'] else 1
+
+
+def cmd_fit(args):
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(args.csv, encoding='utf-8-sig')
+    if args.nonzero:
+        df = df[df[args.x] != 0]
+    x = df[args.x].to_numpy(dtype=np.float64)
+    y = df[args.y].to_numpy(dtype=np.float64)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (slope * x + intercept)
+    r_squared = 1 - residual.var() / y.var()
+    _emit({'n': int(len(x)), 'slope': float(slope), 'intercept': float(intercept),
+           'r_squared': float(r_squared)}, args.json)
+    return 0
+
+
+def cmd_plot(args):
+    from batch_daily_report import render_daily_reports
+
+    result = render_daily_reports(args.site, output_dir=args.output_dir, formats=args.formats,
+                                  workers=1, force=True, days=[args.date])
+    _emit({'rendered': [f'{d:%Y-%m-%d}' for d in result['rendered']],
+           'elapsed_s': result['elapsed']}, args.json)
+    return 0 if result['rendered'] else 1
+
+
+def cmd_report(args):
+    from batch_daily_report import render_daily_reports
+
+    result = render_daily_reports(args.site, output_dir=args.output_dir, formats=args.formats,
+                                  workers=args.workers, force=args.force)
+    _emit({'rendered': len(result['rendered']), 'skipped': len(result['skipped']),
+           'failed': [f'{d:%Y-%m-%d}' for d in result['failed']],
+           'elapsed_s': result['elapsed']}, args.json)
+    return 1 if result['failed'] else 0
+
+
+def cmd_replay(args):
+    from historical_backtest import load_units, run_backtest, summarize
+
+    units = [unit for site in args.sites for unit in load_units(site, args.start, args.end)]
+    result = run_backtest(units, policies=args.policies, closed_loop=args.closed_loop,
+                          workers=args.workers)
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    summary = summarize(result)
+    if args.json:
+        _emit({'summary': summary.to_dict(orient='records'),
+               'elapsed_s': result.attrs['elapsed']}, True)
+    else:
+        print(summary.round(2).to_string(index=False))
+        print(f"\n{result.attrs['elapsed']:.1f} giây")
+    return 0
+
+
+# ============================================================================
+# PARSER
+# ============================================================================
+
+def _add_soc_arguments(parser):
+    parser.add_argument('--soc-start', type=float, default=5.0)
+    parser.add_argument('--soc-min', type=float, default=5.0)
+    parser.add_argument('--soc-max', type=float, default=90.0)
+    parser.add_argument('--soc-end', type=float, default=None,
+                        help='SOC sau JEPX (mặc định = soc-min khi có JEPX)')
+    parser.add_argument('--end-tolerance', type=float, default=0.5)
+    parser.add_argument('--jepx', type=_jepx, default=-85.0,
+                        help='ΔSOC JEPX sau block 7 (%%), "none" = linh hoạt')
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true', help='in kết quả dạng JSON')
+
+    parser = argparse.ArgumentParser(prog='soc', description='Công cụ lịch 基準値 / SOC')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('optimize', parents=[common], help='tìm lịch 基準値 tối ưu')
+    _add_soc_arguments(p)
+    p.add_argument('--blocks', type=_parse_blocks, default=list(range(1, 8)),
+                   help='block có 基準値, ví dụ 1-7 hoặc 3,4,5,6,7')
+    p.add_argument('--method', choices=['dp', 'lp'], default='dp')
+    p.add_argument('--baseline-step', type=float, default=None, help='LP: bước 基準値 (MILP)')
+    p.add_argument('--soc-resolution', type=float, default=0.1, help='DP: bước lưới SOC (%%)')
+    p.add_argument('--table', help='bảng .npz của parametric_schedule (tra O(1))')
+    p.set_defaults(func=cmd_optimize)
+
+    p = sub.add_parser('backtest', parents=[common], help='kiểm tra 1 pattern 基準値')
+    _add_soc_arguments(p)
+    p.add_argument('baselines', type=float, nargs='+')
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser('fit', parents=[common], help='hồi quy tuyến tính ΔSOC theo 計画値')
+    p.add_argument('csv', nargs='?', default='arao_nijisanji_soc_data.csv')
+    p.add_argument('--x', default='計画値')
+    p.add_argument('--y', default='ΔSOC_per_30min')
+    p.add_argument('--nonzero', action='store_true', help='bỏ các dòng 計画値 = 0')
+    p.set_defaults(func=cmd_fit)
+
+    p = sub.add_parser('plot', parents=[common], help='đồ thị 1 ngày')
+    p.add_argument('site', choices=['arao', 'kotohira'])
+    p.add_argument('date')
+    p.add_argument('--format', nargs='+', default=['html'], dest='formats')
+    p.add_argument('--output-dir', default='daily_reports')
+    p.set_defaults(func=cmd_plot)
+
+    p = sub.add_parser('report', parents=[common], help='báo cáo đồ thị cho mọi ngày (song song)')
+    p.add_argument('site', choices=['arao', 'kotohira'])
+    p.add_argument('--format', nargs='+', default=['html'], dest='formats')
+    p.add_argument('--output-dir', default='daily_reports')
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--force', action='store_true')
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser('replay', parents=[common],
+                       help='backtest các chính sách trên dữ liệu lịch sử (song song)')
+    p.add_argument('sites', nargs='+', choices=['arao', 'kotohira'])
+    p.add_argument('--policies', nargs='+', default=None,
+                   help='tên chính sách trong historical_backtest.POLICIES (mặc định: tất cả)')
+    p.add_argument('--closed-loop', action='store_true', help='mỗi block bắt đầu từ SOC thực đo')
+    p.add_argument('--start', default=None)
+    p.add_argument('--end', default=None)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--output', default=None, help='CSV kết quả theo ngày')
+    p.set_defaults(func=cmd_replay)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SOC 3時間ブロック集計テーブル（全期間・差分更新）
+
+analyze_extended_4days.py や daily_schedule_optimizer.py が日ごと・ブロックごとに
+1分粒度のデータを絞り込んで求めていたブロックの開始・終了SOCを、
+(site, date, block) ごとに1行のテーブルとして保持する。
+- 列: 開始・終了SOC（とその時刻）、最小・最大SOC、基準値平均、実績値電力量、サンプル数
+- 並べ替え1回 + reduceat で全ブロックを一度に集計
+- ブロックごとの内容ハッシュを保存し、更新時は全行のハッシュだけを計算して
+  最初に内容が変わったブロック（新しいブロック、計画値の修正や遅れて届いた行）
+  以降だけを集計し直す（merge_csv_files.py の増分更新は過去の行も書き直す）
+- 差分更新を繰り返した結果は全期間を一度に集計した結果と同じ
+
+    python soc_block_table.py kotohira_integrated_data.csv --table soc_block_table.csv
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import soc_model
+from batch_daily_report import KOTOHIRA_FILE, _naive
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+N_BLOCKS = int(24 // BLOCK_HOURS)
+
+TABLE_FILE = 'soc_block_table.csv'
+
+# 実績値 (kW) のサンプル間隔（1分粒度）
+SAMPLE_HOURS = 1 / 60
+
+KEYS = ['site', 'date', 'block']
+COLUMNS = KEYS + [
+    'soc_start', 'soc_end', 'soc_min', 'soc_max', 'soc_start_time', 'soc_end_time',
+    'baseline_mean', 'baseline_count', 'energy_kwh', 'count', 'last_time', 'content_hash',
+]
+_TIME_COLUMNS = ['date', 'soc_start_time', 'soc_end_time', 'last_time']
+
+
+def _sorted_columns(times, soc, baselines, actual_power):
+    """時刻順に並べた (times, soc, baselines, power, key)。key = (日, ブロック) の通し番号"""
+    times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]')
+    columns = [np.asarray(soc, dtype=np.float64), np.asarray(baselines, dtype=np.float64),
+               np.full(len(times), np.nan) if actual_power is None
+               else np.asarray(actual_power, dtype=np.float64)]
+    ok = ~np.isnat(times)
+    order = np.argsort(times[ok], kind='stable')
+    times = times[ok][order]
+    soc, baselines, power = (column[ok][order] for column in columns)
+    day = times.astype('datetime64[D]')
+    block = (times - day) // np.timedelta64(int(BLOCK_HOURS * 3600), 's')
+    return times, soc, baselines, power, day.astype(np.int64) * N_BLOCKS + block
+
+
+def _content_hash(times, soc, baselines, power, first):
+    """
+    ブロックごとの内容ハッシュ (int64)
+
+    行ごとに時刻と値のビット列を混ぜたハッシュの和（オーバーフローは循環）なので
+    ブロック内の行の順序によらない。値が1つでも変われば（NaN との入れ替えを含む）変わる
+    """
+    row = times.view(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    for i, values in enumerate((soc, baselines, power)):
+        bits = np.where(np.isnan(values), np.nan, values).view(np.uint64)
+        row ^= (bits + np.uint64(i + 1)) * np.uint64(0xBF58476D1CE4E5B9)
+        row ^= row >> np.uint64(31)
+    return np.add.reduceat(row, first).view(np.int64)
+
+
+def _reduce(values, first):
+    """欠損値を除いたグループごとの合計と件数"""
+    valid = np.isfinite(values)
+    return (np.add.reduceat(np.where(valid, values, 0.0), first),
+            np.add.reduceat(valid.astype(np.float64), first))
+
+
+def aggregate_blocks(times, soc, baselines, actual_power=None, site='kotohira'):
+    """
+    1分粒度のデータを (date, block) ごとに集計する
+
+    Args:
+        times: 時刻（tz なしの現地時刻）
+        soc: SOC (%)、baselines: 基準値 (kW)、actual_power: 実績値 (kW)、None = なし
+        site: サイト名
+
+    Returns:
+        DataFrame (COLUMNS): 1行 / ブロック
+            soc_start / soc_end: ブロック内の最初・最後のSOCサンプル（時刻は *_time）
+            baseline_mean: 基準値の平均（baseline_count 件）
+            energy_kwh: 実績値 × SAMPLE_HOURS の合計、count: 行数、last_time: 最終行の時刻
+            content_hash: ブロックの内容ハッシュ（変更検出用）
+    """
+    times, soc, baselines, power, key = _sorted_columns(times, soc, baselines, actual_power)
+    if len(times) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    day = times.astype('datetime64[D]')
+    block = key - day.astype(np.int64) * N_BLOCKS
+    first = np.flatnonzero(np.diff(key, prepend=key[0] - 1))
+    count = np.diff(np.append(first, len(key)))
+    baseline_sum, baseline_count = _reduce(baselines, first)
+    power_sum, _ = _reduce(power, first)
+
+    # SOC は有効なサンプルだけで集計してブロックへ戻す
+    groups = len(first)
+    soc_start, soc_end, soc_min, soc_max = (np.full(groups, np.nan) for _ in range(4))
+    soc_start_time, soc_end_time = (np.full(groups, np.datetime64('NaT'), 'datetime64[ns]')
+                                    for _ in range(2))
+    valid = np.isfinite(soc)
+    if valid.any():
+        group = np.repeat(np.arange(groups), count)[valid]
+        values, value_times = soc[valid], times[valid]
+        starts = np.flatnonzero(np.diff(group, prepend=-1))
+        ends = np.append(starts[1:], len(group)) - 1
+        index = group[starts]
+        soc_start[index], soc_end[index] = values[starts], values[ends]
+        soc_start_time[index], soc_end_time[index] = value_times[starts], value_times[ends]
+        soc_min[index] = np.minimum.reduceat(values, starts)
+        soc_max[index] = np.maximum.reduceat(values, starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        baseline_mean = baseline_sum / baseline_count
+    return pd.DataFrame({
+        'site': site,
+        'date': day[first],
+        'block': block[first].astype(np.int64),
+        'soc_start': soc_start,
+        'soc_end': soc_end,
+        'soc_min': soc_min,
+        'soc_max': soc_max,
+        'soc_start_time': soc_start_time,
+        'soc_end_time': soc_end_time,
+        'baseline_mean': baseline_mean,
+        'baseline_count': baseline_count.astype(np.int64),
+        'energy_kwh': power_sum * SAMPLE_HOURS,
+        'count': count.astype(np.int64),
+        'last_time': times[first + count - 1],
+        'content_hash': _content_hash(times, soc, baselines, power, first),
+    })
+
+
+def update_table(table, times, soc, baselines, actual_power=None, site='kotohira'):
+    """
+    サイトの全期間のデータでテーブルを更新する
+
+    全行のブロックごとの内容ハッシュを保存済みの値と比べ、最初に変わった
+    ブロック（新しいブロックを含む）以降だけを集計し直す。過去の行の修正
+    （計画値の改訂、遅れて届いた行）も反映され、データから消えたブロックは削除される。
+
+    Args:
+        table: 既存のテーブル（None = 新規）
+        times, soc, baselines, actual_power, site: aggregate_blocks と同じ（全期間）
+
+    Returns:
+        DataFrame: (site, date, block) 順の新しいテーブル
+    """
+    others = None
+    old = None
+    if table is not None and len(table):
+        mine = (table['site'] == site).to_numpy()
+        others, old = table[~mine], table[mine]
+        if 'content_hash' not in table:
+            old = None  # ハッシュのない古いテーブルは作り直す
+
+    columns = _sorted_columns(times, soc, baselines, actual_power)
+    key = columns[-1]
+    if old is None or len(old) == 0 or len(key) == 0:
+        new = aggregate_blocks(times, soc, baselines, actual_power, site)
+    else:
+        first = np.flatnonzero(np.diff(key, prepend=key[0] - 1))
+        hashes = pd.Series(_content_hash(*columns[:4], first), index=key[first])
+        old_dates = pd.to_datetime(old['date']).to_numpy(dtype='datetime64[D]')
+        old_key = old_dates.astype(np.int64) * N_BLOCKS + old['block'].to_numpy(dtype=np.int64)
+        stored = old['content_hash'].to_numpy(dtype=np.int64)
+
+        # 内容が変わった / 新しいブロックと、データから消えたブロックの最初の位置
+        position = pd.Index(old_key).get_indexer(hashes.index)
+        differs = (position < 0) | (stored[position] != hashes.to_numpy())
+        changed = np.concatenate([hashes.index[differs],
+                                  np.setdiff1d(old_key, hashes.index)])
+        if len(changed) == 0:
+            return table
+        start = changed.min()
+
+        rows = key >= start
+        new = pd.concat([old[old_key < start],
+                         aggregate_blocks(*(column[rows] for column in columns[:4]), site=site)],
+                        ignore_index=True)
+
+    parts = [new] if others is None or len(others) == 0 else [others, new]
+    merged = pd.concat(parts, ignore_index=True)[COLUMNS]
+    return merged.sort_values(KEYS, kind='stable').reset_index(drop=True)
+
+
+def load_table(path=TABLE_FILE):
+    """保存済みテーブル（なければ None）"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, parse_dates=_TIME_COLUMNS, encoding='utf-8-sig')
+
+
+def save_table(table, path=TABLE_FILE):
+    table.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def refresh(csv_path=KOTOHIRA_FILE, path=TABLE_FILE, site='kotohira'):
+    """
+    統合CSVの内容でテーブルを更新して保存する（変わったブロック以降だけ集計）
+
+    Returns:
+        DataFrame: 更新後のテーブル（全サイト）
+    """
+    from dataset_cache import load_dataset
+
+    data = load_dataset(csv_path)
+    power = data['actual_power_kw'] if 'actual_power_kw' in data else None
+    table = update_table(load_table(path), _naive(data['timestamp']),
+                         data['battery_soc_percent'], data['demand_plan_kw_baseline'],
+                         power, site)
+    save_table(table, path)
+    return table
+
+
+def load_blocks(site='kotohira', path=TABLE_FILE, csv_path=KOTOHIRA_FILE):
+    """
+    サイトのブロック集計（統合CSVがあれば先に差分更新する）
+
+    Returns:
+        DataFrame: site の行のみ、(date, block) 順
+    """
+    table = refresh(csv_path, path, site) if os.path.exists(csv_path) else load_table(path)
+    if table is None:
+        raise FileNotFoundError(f'{csv_path} も {path} も見つかりません')
+    return table[table['site'] == site].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SOC 3時間ブロック集計テーブルの差分更新')
+    parser.add_argument('csv', nargs='?', default=KOTOHIRA_FILE)
+    parser.add_argument('--site', default='kotohira')
+    parser.add_argument('--table', default=TABLE_FILE, help='集計テーブルのCSV')
+    args = parser.parse_args()
+
+    print('=' * 80)
+    print('📦 SOC 3時間ブロック集計テーブル')
+    print('=' * 80)
+
+    before = load_table(args.table)
+    t0 = time.perf_counter()
+    table = refresh(args.csv, args.table, args.site)
+    elapsed = time.perf_counter() - t0
+
+    rows = table[table['site'] == args.site]
+    print(f"\n{args.site}: {0 if before is None else len(before):,} → {len(table):,} 行"
+          f"（{elapsed:.2f} 秒）")
+    if len(rows):
+        print(f"期間: {rows['date'].min():%Y-%m-%d} ～ {rows['date'].max():%Y-%m-%d}")
+        print(f"SOCあり: {rows['soc_start'].notna().sum():,} ブロック、"
+              f"基準値あり: {(rows['baseline_count'] > 0).sum():,} ブロック")
+    print(f'✅ 保存しました: {args.table}')
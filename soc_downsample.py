@@ -0,0 +1,278 @@
+"""
+1分粒度SOC時系列の間引き（マルチ解像度ピラミッド）
+
+荒尾の1分粒度SOC（約11ヶ月 × 4バッテリ）をそのまま Plotly に渡すと
+HTML が巨大になりブラウザが固まるため、
+- min/max バケット（各バケットの最小値・最大値を時刻順に残す）または
+  LTTB（Largest-Triangle-Three-Buckets）で点数を予算内に間引く
+- 1分 → 10分 → 1時間 → 1日 のピラミッドを事前計算し、
+  表示範囲に応じて予算内に収まる最も細かい階層を選ぶ
+- HTML にはピラミッドの粗い階層（既定は 1時間・1日）だけを計算して埋め込み、
+  ズーム時に JavaScript で表示範囲の階層に差し替える。HTML 上の最細解像度は
+  1時間（約40日以内の表示で1時間粒度）。10分を埋め込むと1トレースあたり
+  約 2.8 MB（11ヶ月分）増えるため、細かく見るときは対象日の個別グラフを使う
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# ピラミッドの階層（細かい順）
+PYRAMID_LEVELS = ('1min', '10min', '1h', '1D')
+
+# 1トレースあたりの表示点数の予算（画面幅のピクセル数程度）
+POINT_BUDGET = 2000
+
+# HTML に埋め込む階層（細かい順、1分・10分は大きすぎるので既定では埋め込まない）
+EMBED_LEVELS = ('1h', '1D')
+
+
+def _to_naive_ns(times):
+    """時刻列 → int64 ns（タイムゾーン付きは現地時刻のまま tz を外す）"""
+    times = pd.to_datetime(pd.Series(times))
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+
+def minmax_downsample(times_ns, values, width_ns):
+    """
+    幅 width_ns のバケットごとに最小値・最大値の2点を時刻順で残す
+
+    Args:
+        times_ns: int64 ns（昇順）
+        values: 値
+        width_ns: バケット幅 [ns]
+
+    Returns:
+        (times_ns, values): 間引き後の配列
+    """
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    times_ns, values = times_ns[valid], values[valid]
+    if len(values) == 0:
+        return times_ns, values
+
+    bucket = times_ns // width_ns
+    order = np.lexsort((values, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+
+    low, high = order[starts], order[ends]
+    first, second = np.minimum(low, high), np.maximum(low, high)
+    index = np.stack([first, second], axis=1).ravel()
+    index = index[np.r_[True, index[1:] != index[:-1]]]
+    return times_ns[index], values[index]
+
+
+def lttb(times_ns, values, n_out):
+    """
+    LTTB で n_out 点に間引く（先頭・末尾の点は必ず残す）
+
+    Returns:
+        (times_ns, values): 間引き後の配列
+    """
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    times_ns, values = times_ns[valid], values[valid]
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return times_ns, values
+
+    x = (times_ns - times_ns[0]).astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 次のバケットの平均点（最後のバケットは末尾の点）
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = values[next_lo:next_hi].mean()
+
+        area = np.abs((x[previous] - avg_x) * (values[lo:hi] - values[previous]) -
+                      (x[previous] - x[lo:hi]) * (avg_y - values[previous]))
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+
+    return times_ns[selected], values[selected]
+
+
+def build_pyramid(times, values, levels=PYRAMID_LEVELS, method='minmax'):
+    """
+    間引きピラミッドを作る
+
+    Args:
+        times: 時刻（昇順）
+        values: 値
+        levels: 階層のバケット幅（pandas の周期文字列、細かい順）
+        method: 'minmax'（バケットごとに最小・最大）または 'lttb'（バケットごとに1点）
+
+    Returns:
+        list of dict: [{'level': '1min', 'x': int64 ns, 'y': float}, ...]（細かい順）
+    """
+    times_ns = _to_naive_ns(times)
+    values = np.asarray(values, dtype=np.float64)
+
+    pyramid = []
+    for level in levels:
+        width = pd.Timedelta(level).value
+        if method == 'lttb':
+            n_buckets = len(np.unique(times_ns // width))
+            x, y = lttb(times_ns, values, n_buckets)
+        else:
+            x, y = minmax_downsample(times_ns, values, width)
+        pyramid.append({'level': level, 'x': x, 'y': y})
+    return pyramid
+
+
+def select_level(pyramid, start=None, end=None, budget=POINT_BUDGET):
+    """
+    表示範囲 [start, end] の点数が予算以下になる最も細かい階層を選ぶ
+
+    Returns:
+        (level, x, y): 表示範囲の配列（どの階層も予算を超える場合は最も粗い階層）
+    """
+    lo = None if start is None else pd.Timestamp(start).tz_localize(None).value
+    hi = None if end is None else pd.Timestamp(end).tz_localize(None).value
+
+    for entry in pyramid:
+        x = entry['x']
+        i = 0 if lo is None else np.searchsorted(x, lo, side='left')
+        j = len(x) if hi is None else np.searchsorted(x, hi, side='right')
+        if j - i <= budget or entry is pyramid[-1]:
+            return entry['level'], x[i:j], entry['y'][i:j]
+
+
+def _to_strings(times_ns):
+    """int64 ns → Plotly 用の ISO 時刻文字列（辞書順 = 時刻順、JS側で二分探索）"""
+    return np.datetime_as_string(times_ns.astype('datetime64[ns]'), unit='s').tolist()
+
+
+def add_downsampled_trace(fig, times, values, budget=POINT_BUDGET,
+                          embed_levels=EMBED_LEVELS, row=None, col=None, **scatter_kwargs):
+    """
+    間引いた SOC トレースを追加する（go.Scatter の代わり）
+
+    embed_levels の階層だけを計算し、全期間表示で予算に収まる階層を初期表示に、
+    全階層をズーム用に fig に登録する（write_downsampled_html で HTML に埋め込む）。
+
+    Returns:
+        追加したトレースの番号
+    """
+    embedded = build_pyramid(times, values, levels=embed_levels)
+    level, x, y = select_level(embedded, budget=budget)
+
+    fig.add_trace(go.Scatter(x=_to_strings(x), y=y, **scatter_kwargs), row=row, col=col)
+    index = len(fig.data) - 1
+
+    registry = getattr(fig, '_soc_pyramids', {})
+    registry[index] = [{'level': entry['level'], 'x': _to_strings(entry['x']),
+                        'y': np.round(entry['y'], 2).tolist()} for entry in embedded]
+    fig._soc_pyramids = registry
+    fig._soc_budget = budget
+    return index
+
+
+_POST_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+var pyramids = %(pyramids)s;
+var budget = %(budget)d;
+
+function lowerBound(a, v) {
+    var lo = 0, hi = a.length;
+    while (lo < hi) { var m = (lo + hi) >> 1; if (a[m] < v) lo = m + 1; else hi = m; }
+    return lo;
+}
+function upperBound(a, v) {
+    var lo = 0, hi = a.length;
+    while (lo < hi) { var m = (lo + hi) >> 1; if (a[m] <= v) lo = m + 1; else hi = m; }
+    return lo;
+}
+function toKey(v) { return String(v).replace(' ', 'T'); }
+
+function update(lo, hi) {
+    var xs = [], ys = [], indices = [];
+    Object.keys(pyramids).forEach(function (k) {
+        var levels = pyramids[k];
+        for (var n = 0; n < levels.length; n++) {
+            var x = levels[n].x;
+            var i = lo === null ? 0 : lowerBound(x, lo);
+            var j = hi === null ? x.length : upperBound(x, hi);
+            if (j - i <= budget || n === levels.length - 1) {
+                xs.push(x.slice(i, j)); ys.push(levels[n].y.slice(i, j));
+                break;
+            }
+        }
+        indices.push(Number(k));
+    });
+    Plotly.restyle(gd, {x: xs, y: ys}, indices);
+}
+
+gd.on('plotly_relayout', function (e) {
+    var lo = null, hi = null, found = false;
+    Object.keys(e).forEach(function (key) {
+        if (/^xaxis\\d*\\.range\\[0\\]$/.test(key)) { lo = toKey(e[key]); found = true; }
+        if (/^xaxis\\d*\\.range\\[1\\]$/.test(key)) { hi = toKey(e[key]); found = true; }
+        if (/^xaxis\\d*\\.range$/.test(key)) { lo = toKey(e[key][0]); hi = toKey(e[key][1]); found = true; }
+        if (/^xaxis\\d*\\.autorange$/.test(key)) { found = true; }
+    });
+    if (found) update(lo, hi);
+});
+"""
+
+
+def write_downsampled_html(fig, path, **write_kwargs):
+    """fig.write_html + ズーム時に階層を差し替える JavaScript"""
+    pyramids = getattr(fig, '_soc_pyramids', {})
+    if pyramids:
+        script = _POST_SCRIPT % {'pyramids': json.dumps(pyramids), 'budget': fig._soc_budget}
+        write_kwargs['post_script'] = script
+    fig.write_html(path, **write_kwargs)
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    # 11ヶ月分の1分粒度SOCを模擬
+    times = pd.date_range('2024-06-01', '2025-04-30 23:59', freq='1min')
+    rng = np.random.default_rng(0)
+    soc = np.clip(50 + np.cumsum(rng.normal(0, 0.3, len(times))) % 80, 5, 90)
+
+    print("=" * 70)
+    print("SOC時系列の間引き")
+    print("=" * 70)
+
+    t0 = time.perf_counter()
+    pyramid = build_pyramid(times, soc)
+    print(f"\nピラミッド作成: {(time.perf_counter() - t0) * 1000:.0f} ms")
+    for entry in pyramid:
+        print(f"  {entry['level']:>6}: {len(entry['x']):>8,} 点")
+
+    level, x, _ = select_level(pyramid, '2024-08-01', '2024-08-02')
+    print(f"\n1日表示 → {level} ({len(x)} 点)")
+    level, x, _ = select_level(pyramid)
+    print(f"全期間表示 → {level} ({len(x)} 点)")
+
+    t0 = time.perf_counter()
+    x, y = lttb(_to_naive_ns(times), soc, POINT_BUDGET)
+    print(f"LTTB {len(times):,} → {len(x):,} 点: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    for name, build in [('全点', lambda f: f.add_trace(go.Scatter(x=times, y=soc))),
+                        ('間引き', lambda f: add_downsampled_trace(f, times, soc))]:
+        fig = go.Figure()
+        build(fig)
+        path = f'downsample_demo_{name}.html'
+        t0 = time.perf_counter()
+        write_downsampled_html(fig, path, include_plotlyjs='cdn')
+        elapsed = time.perf_counter() - t0
+        print(f"HTML ({name}): {os.path.getsize(path) / 1e6:.1f} MB, {elapsed:.2f} 秒")
+        os.remove(path)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MÔ HÌNH PHẢN ỨNG SOC DÙNG CHUNG
+
+    SOC変化率 (%/h) = slope × 基準値 (kW) + intercept
+    ΔSOC (%)        = SOC変化率 × số giờ
+
+Hệ số được đánh phiên bản theo site, thay cho SLOPE/INTERCEPT chép tay trong
+từng script:
+- kotohira/v1: 0.012804 / −1.9515 (hồi quy ban đầu, 6 điểm, R² = 0.9997;
+  generate_optimal_schedule.py, optimal_baseline_calculator.py)
+- kotohira/v2: 0.013545 / −2.8197 (hồi quy từng phút, mặc định của mọi optimizer)
+- <site>/rls: hệ số RLS mới nhất, đọc từ soc_rls_state.json (soc_rls.py) mỗi lần gọi
+
+Các hàm nhận scalar hoặc array NumPy với shape bất kỳ (broadcast như ufunc).
+Hệ số lấy theo thứ tự ưu tiên: slope/intercept truyền trực tiếp → model → mặc định.
+"""
+
+import json
+import os
+
+import numpy as np
+
+BLOCK_HOURS = 3.0
+
+# Giới hạn 基準値
+BASELINE_MIN = 0
+BASELINE_MAX = 2000
+
+# {site: {version: model}}
+MODELS = {
+    'kotohira': {
+        'v1': {
+            'site': 'kotohira', 'version': 'v1',
+            'slope': 0.012804, 'intercept': -1.9515,
+            'note': 'Hồi quy ban đầu (6 điểm, R² = 0.9997)',
+        },
+        'v2': {
+            'site': 'kotohira', 'version': 'v2',
+            'slope': 0.013545, 'intercept': -2.8197,
+            'note': 'Hồi quy từng phút (coefficient_explanation_japanese.md)',
+        },
+    },
+}
+
+# Phiên bản mặc định của từng site
+DEFAULT_VERSIONS = {'kotohira': 'v2'}
+DEFAULT_SITE = 'kotohira'
+
+# Phiên bản đọc từ file trạng thái của soc_rls.py
+RLS_VERSION = 'rls'
+RLS_STATE_FILE = 'soc_rls_state.json'
+
+
+def get_model(site=DEFAULT_SITE, version=None):
+    """
+    Lấy hệ số của 1 site
+
+    Args:
+        site: tên site ('kotohira', ...)
+        version: phiên bản ('v1', 'v2', 'rls', ...), None = phiên bản mặc định của site
+
+    Returns:
+        dict: 'site', 'version', 'slope', 'intercept', 'note'
+    """
+    if version == RLS_VERSION:
+        return load_rls_model(site)
+    if site not in MODELS:
+        raise KeyError(f"Không có mô hình cho site '{site}'")
+    version = version or DEFAULT_VERSIONS[site]
+    if version not in MODELS[site]:
+        raise KeyError(f"Site '{site}' không có phiên bản '{version}' "
+                       f"(có: {sorted(MODELS[site])})")
+    return MODELS[site][version]
+
+
+def load_rls_model(site=DEFAULT_SITE, path=None):
+    """
+    Hệ số RLS đã lưu của 1 site (theta trong file trạng thái của soc_rls.py)
+
+    Args:
+        path: file JSON trạng thái, None = RLS_STATE_FILE
+    """
+    path = path or RLS_STATE_FILE
+    states = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            states = json.load(f)
+    if site not in states:
+        raise KeyError(f"Chưa có trạng thái RLS cho site '{site}' trong {path} "
+                       f"(chạy soc_rls.py trước)")
+    state = states[site]
+    slope, intercept = state['theta']
+    return {'site': site, 'version': RLS_VERSION, 'slope': float(slope),
+            'intercept': float(intercept),
+            'note': f"RLS λ={state['forgetting']}, {state['updates']} block ({path})"}
+
+
+def register_model(site, version, slope, intercept, note='', default=False):
+    """
+    Thêm phiên bản hệ số mới (ví dụ sau khi hồi quy lại)
+
+    Returns:
+        dict mô hình vừa thêm
+    """
+    model = {'site': site, 'version': version, 'slope': float(slope),
+             'intercept': float(intercept), 'note': note}
+    MODELS.setdefault(site, {})[version] = model
+    if default or site not in DEFAULT_VERSIONS:
+        DEFAULT_VERSIONS[site] = version
+    return model
+
+
+def _coefficients(model=None, slope=None, intercept=None):
+    if model is None:
+        model = get_model()
+    return (model['slope'] if slope is None else slope,
+            model['intercept'] if intercept is None else intercept)
+
+
+# Hệ số mặc định, cho các module cần hằng số
+SLOPE, INTERCEPT = _coefficients()
+
+
+def soc_rate(baseline, model=None, slope=None, intercept=None):
+    """基準値 (kW) → SOC変化率 (%/h)"""
+    slope, intercept = _coefficients(model, slope, intercept)
+    return slope * np.asarray(baseline, dtype=np.float64) + intercept
+
+
+def delta_soc(baseline, hours=BLOCK_HOURS, model=None, slope=None, intercept=None):
+    """基準値 (kW) → ΔSOC (%) sau `hours` giờ"""
+    return soc_rate(baseline, model, slope, intercept) * hours
+
+
+def baseline_for_delta(delta, hours=BLOCK_HOURS, model=None, slope=None, intercept=None,
+                       baseline_min=None, baseline_max=None):
+    """
+    Hàm ngược: ΔSOC (%) sau `hours` giờ → 基準値 (kW)
+
+    baseline_min/baseline_max: cắt về giới hạn (None = không cắt)
+    """
+    slope, intercept = _coefficients(model, slope, intercept)
+    baseline = (np.asarray(delta, dtype=np.float64) / hours - intercept) / slope
+    if baseline_min is not None or baseline_max is not None:
+        baseline = np.clip(baseline, baseline_min, baseline_max)
+    return baseline
+
+
+def predict_soc(soc_start, baseline, hours=BLOCK_HOURS, model=None, slope=None, intercept=None):
+    """SOC sau `hours` giờ với 基準値 cố định"""
+    return np.asarray(soc_start, dtype=np.float64) + delta_soc(baseline, hours, model,
+                                                               slope, intercept)
+
+
+def required_baseline(soc_current, soc_target, hours=BLOCK_HOURS, model=None,
+                      baseline_min=BASELINE_MIN, baseline_max=BASELINE_MAX):
+    """基準値 cần để đi từ soc_current tới soc_target trong `hours` giờ (đã cắt giới hạn)"""
+    delta = np.asarray(soc_target, dtype=np.float64) - np.asarray(soc_current, dtype=np.float64)
+    return baseline_for_delta(delta, hours, model, baseline_min=baseline_min,
+                              baseline_max=baseline_max)
+
+
+def soc_trajectory(soc_start, baselines, hours=BLOCK_HOURS, model=None,
+                   slope=None, intercept=None):
+    """
+    SOC sau từng block (cumsum theo trục cuối)
+
+    Args:
+        soc_start: scalar hoặc array broadcast được với baselines[..., 0]
+        baselines: array (..., n_blocks)
+
+    Returns:
+        array (..., n_blocks + 1), cột 0 = soc_start
+    """
+    delta = delta_soc(baselines, hours, model, slope, intercept)
+    start = np.broadcast_to(np.asarray(soc_start, dtype=np.float64)[..., np.newaxis],
+                            delta.shape[:-1] + (1,))
+    return np.concatenate([start, start + np.cumsum(delta, axis=-1)], axis=-1)
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('📐 MÔ HÌNH PHẢN ỨNG SOC')
+    print('=' * 80)
+
+    for site, versions in MODELS.items():
+        for version, model in versions.items():
+            mark = '⭐' if DEFAULT_VERSIONS[site] == version else '  '
+            print(f"\n{mark} {site}/{version}: SOC変化率 = {model['slope']:.6f} × 基準値 "
+                  f"{model['intercept']:+.4f}  ({model['note']})")
+            baselines = np.array([0, 507, 1000, 2000])
+            print(f"   ΔSOC 3h @ {baselines.tolist()} kW: "
+                  f"{np.round(delta_soc(baselines, model=model), 2).tolist()}")
+            print(f"   基準値 cho ΔSOC +20%/3h: {float(baseline_for_delta(20, model=model)):.0f} kW")
+
+    rng = np.random.default_rng(0)
+    patterns = rng.uniform(0, 2000, (1_000_000, 7))
+    soc = soc_trajectory(5.0, patterns)
+    print(f'\nTrajectory 1,000,000 pattern × 7 block: shape {soc.shape}')
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MÔ HÌNH SOC TUYẾN TÍNH TỪNG KHÚC: HIỆU SUẤT SẠC / XẢ VÀ MỨC SOC
+
+Mô hình tuyến tính ΔSOC = (SLOPE × 基準値 + INTERCEPT) × h dùng 1 hệ số cho cả
+sạc lẫn xả và cho mọi mức SOC, nên không biểu diễn được:
+- hiệu suất sạc ≠ hiệu suất xả (độ dốc khác nhau 2 phía điểm cân bằng
+  基準値₀ = −INTERCEPT / SLOPE, nơi SOC変化率 = 0)
+- sạc chậm lại gần 90% (taper), xả yếu đi ở SOC thấp
+(xem analyze_15_18h_anomaly.py, why_3hour_is_better.py)
+
+Mô hình ở đây: SOC変化率 tuyến tính từng khúc theo 基準値 (nút cố định, mặc
+định có 1 nút tại 基準値₀ để phía xả và phía sạc có độ dốc riêng) và nội suy
+tuyến tính giữa các mốc SOC (ngoài mốc đầu / cuối thì giữ nguyên). Liên tục theo
+SOC: nội suy giá trị giữa 2 mức lưới SOC của DP không nhảy vùng.
+- Fit từ dữ liệu từng phút (coefficient_fits.minute_rates): bình phương tối
+  thiểu trên cơ sở hàm nón 2 chiều (mốc SOC × nút 基準値), ridge kéo về mô
+  hình tuyến tính để ô ít dữ liệu không lệch
+- Biên dịch thành bảng 'rates' (n_mốc SOC, n_nút): dự báo = 2 searchsorted +
+  gather 4 điểm, vector hóa mọi shape
+- Lập lịch: dp_solver.solve_dp(piecewise=...) dùng bảng này thay cho
+  SLOPE/INTERCEPT (ma trận SOC sau block theo SOC × 基準値 tính 1 lần, lịch trả
+  về được đi xuôi và kiểm tra bằng SOC liên tục của chính mô hình này). Không
+  đưa vào LP: đường cong lõm theo 基準値 (sạc kém hiệu suất hơn xả) và phụ
+  thuộc SOC nên tối đa Σ基準値 trên nó không lồi; MILP chính xác (biến nhị
+  phân theo block × vùng SOC × khúc) mất vài giây mỗi kịch bản
+
+    python soc_piecewise.py --save soc_piecewise_kotohira.npz
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import soc_model
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+
+# Mốc SOC (%): SOC変化率 nội suy tuyến tính giữa các mốc
+SOC_NODES = (10.0, 50.0, 80.0, 90.0, 100.0)
+
+# Nút 基準値 (kW) ngoài 基準値₀ của mô hình tuyến tính
+BASELINE_KNOTS = (0.0, 500.0, 1000.0, 1500.0, 2000.0)
+
+# Trọng số ridge về mô hình tuyến tính (tương đương số phút dữ liệu / nút)
+RIDGE = 50.0
+
+
+# ============================================================================
+# FIT & DỰ BÁO
+# ============================================================================
+
+def default_knots(model=None, knots=BASELINE_KNOTS):
+    """Nút 基準値 mặc định: BASELINE_KNOTS ∪ {基準値₀ = −intercept / slope}"""
+    slope, intercept = soc_model._coefficients(model)
+    return np.unique(np.append(knots, round(-intercept / slope, 1)))
+
+
+def _hat(nodes, value, extrapolate):
+    """
+    Chỉ số khoảng và trọng số của nút phải (hàm nón 1 chiều)
+
+    extrapolate = True: ngoài 2 đầu thì ngoại suy theo khoảng đầu / cuối,
+    False: giữ giá trị tại nút đầu / cuối
+    """
+    index = np.clip(np.searchsorted(nodes, value, side='right') - 1, 0, len(nodes) - 2)
+    weight = (value - nodes[index]) / (nodes[index + 1] - nodes[index])
+    if not extrapolate:
+        weight = np.clip(weight, 0.0, 1.0)
+    return index, weight
+
+
+def fit_piecewise(baselines, soc, rates, knots=None, soc_nodes=SOC_NODES, ridge=RIDGE,
+                  model=None, site=None):
+    """
+    Fit SOC変化率 = f(基準値, SOC) tuyến tính từng khúc
+
+    Args:
+        baselines, soc, rates: array (n,) 基準値 (kW), SOC đầu khoảng (%), SOC変化率 (%/h)
+        knots: nút 基準値 tăng dần, None = default_knots(model)
+        soc_nodes: mốc SOC tăng dần (%)
+        ridge: trọng số kéo giá trị tại nút về mô hình tuyến tính
+        model: mô hình tuyến tính làm prior (soc_model.get_model), None = mặc định
+
+    Returns:
+        dict (lưu được bằng save_piecewise):
+            'site', 'knots' (K,), 'soc_nodes' (M,)
+            'rates' (M, K): SOC変化率 (%/h) tại (mốc SOC, nút 基準値)
+            'counts' (M - 1, K - 1): số phút dữ liệu trong từng ô
+    """
+    from scipy import sparse
+
+    model = model or soc_model.get_model()
+    knots = default_knots(model) if knots is None else np.asarray(knots, dtype=np.float64)
+    soc_nodes = np.asarray(soc_nodes, dtype=np.float64)
+    x = np.asarray(baselines, dtype=np.float64)
+    s = np.asarray(soc, dtype=np.float64)
+    y = np.asarray(rates, dtype=np.float64)
+    ok = np.isfinite(x) & np.isfinite(s) & np.isfinite(y)
+    x, s, y = x[ok], s[ok], y[ok]
+
+    n_knots, n_nodes = len(knots), len(soc_nodes)
+    j, t = _hat(knots, x, extrapolate=True)
+    i, u = _hat(soc_nodes, s, extrapolate=False)
+
+    # Ma trận thiết kế thưa: mỗi phút có 4 hệ số khác 0
+    corners = [(i, j, (1 - u) * (1 - t)), (i, j + 1, (1 - u) * t),
+               (i + 1, j, u * (1 - t)), (i + 1, j + 1, u * t)]
+    rows = np.tile(np.arange(len(y)), 4)
+    cols = np.concatenate([a * n_knots + b for a, b, _ in corners])
+    vals = np.concatenate([w for _, _, w in corners])
+    design = sparse.csr_matrix((vals, (rows, cols)), shape=(len(y), n_nodes * n_knots))
+
+    prior = np.tile(soc_model.soc_rate(knots, model), n_nodes)
+    normal = (design.T @ design).toarray() + ridge * np.eye(n_nodes * n_knots)
+    values = np.linalg.solve(normal, design.T @ y + ridge * prior)
+
+    counts = np.bincount(i * (n_knots - 1) + j, minlength=(n_nodes - 1) * (n_knots - 1))
+    return {
+        'site': np.array(site or model['site']),
+        'knots': knots,
+        'soc_nodes': soc_nodes,
+        'rates': values.reshape(n_nodes, n_knots),
+        'counts': counts.reshape(n_nodes - 1, n_knots - 1),
+    }
+
+
+def fit_from_minutes(times, soc, baselines, **kwargs):
+    """fit_piecewise trên SOC変化率 từng phút (cùng bộ lọc với coefficient_fits)"""
+    from coefficient_fits import minute_rates
+
+    data = minute_rates(times, soc, baselines)
+    return fit_piecewise(data['baseline'], data['soc'], data['rate'], **kwargs)
+
+
+def soc_rate(model, baseline, soc):
+    """基準値 (kW), SOC (%) → SOC変化率 (%/h), broadcast như numpy"""
+    rates = model['rates']
+    n_knots = rates.shape[1]
+    j, t = _hat(model['knots'], np.asarray(baseline, dtype=np.float64), extrapolate=True)
+    i, u = _hat(model['soc_nodes'], np.asarray(soc, dtype=np.float64), extrapolate=False)
+    # Gather trên bảng phẳng: 4 góc của ô (mốc SOC i, nút j)
+    corner = i * n_knots + j
+    flat = rates.ravel()
+    low = np.take(flat, corner)
+    low = low + t * (np.take(flat, corner + 1) - low)
+    high = np.take(flat, corner + n_knots)
+    high = high + t * (np.take(flat, corner + n_knots + 1) - high)
+    return low + u * (high - low)
+
+
+def delta_soc(model, baseline, soc_start, hours=BLOCK_HOURS, substeps=1):
+    """
+    ΔSOC (%) sau `hours` giờ với 基準値 cố định
+
+    substeps = 1: SOC変化率 theo SOC đầu block cho cả `hours` giờ (bỏ qua taper
+    trong block); > 1: tích phân Euler, SOC変化率 cập nhật giữa block
+    (dp_solver dùng PIECEWISE_SUBSTEPS)
+    """
+    soc = np.asarray(soc_start, dtype=np.float64)
+    start = soc
+    step = hours / substeps
+    for _ in range(substeps):
+        soc = soc + soc_rate(model, baseline, soc) * step
+    return soc - start
+
+
+def soc_trajectory(model, soc_start, baselines, hours=BLOCK_HOURS, substeps=1, fixed_delta=None):
+    """
+    SOC sau từng block
+
+    Args:
+        soc_start: scalar hoặc array broadcast được với baselines[..., 0]
+        baselines: array (..., n_blocks)
+        fixed_delta: array (n_blocks,) ΔSOC cố định (JEPX), NaN = theo 基準値
+
+    Returns:
+        array (..., n_blocks + 1), cột 0 = soc_start
+    """
+    baselines = np.asarray(baselines, dtype=np.float64)
+    n_blocks = baselines.shape[-1]
+    if fixed_delta is None:
+        fixed_delta = np.full(n_blocks, np.nan)
+    soc = np.empty(baselines.shape[:-1] + (n_blocks + 1,))
+    soc[..., 0] = soc_start
+    for k in range(n_blocks):
+        if np.isnan(fixed_delta[k]):
+            delta = delta_soc(model, baselines[..., k], soc[..., k], hours, substeps)
+        else:
+            delta = fixed_delta[k]
+        soc[..., k + 1] = soc[..., k] + delta
+    return soc
+
+
+def save_piecewise(model, path):
+    np.savez_compressed(path, **model)
+
+
+def load_piecewise(path):
+    with np.load(path) as data:
+        model = {key: data[key] for key in data.files}
+    model['site'] = str(model['site'])
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit mô hình SOC tuyến tính từng khúc')
+    parser.add_argument('--ridge', type=float, default=RIDGE)
+    parser.add_argument('--save', default=None, help='lưu mô hình ra .npz')
+    args = parser.parse_args()
+
+    from batch_daily_report import load_kotohira
+    from dp_solver import PIECEWISE_SUBSTEPS, SOC_MIN, solve_dp
+
+    print('=' * 80)
+    print('🔋 MÔ HÌNH SOC TUYẾN TÍNH TỪNG KHÚC (SẠC / XẢ × MỨC SOC)')
+    print('=' * 80)
+
+    data = load_kotohira()['data'][0]
+    t0 = time.perf_counter()
+    piecewise = fit_from_minutes(data['timestamp'], data['battery_soc_percent'],
+                                 data['demand_plan_kw_baseline'], ridge=args.ridge)
+    print(f"\nFit: {time.perf_counter() - t0:.2f} giây")
+
+    print('\nSOC変化率 (%/h) tại nút 基準値:')
+    print('   SOC         ' + ''.join(f'{k:>9.0f}' for k in piecewise['knots']))
+    for node, row in zip(piecewise['soc_nodes'], piecewise['rates']):
+        print(f'   {node:>5.0f}%      ' + ''.join(f'{r:>+9.2f}' for r in row))
+    print('   Tuyến tính  ' + ''.join(f'{r:>+9.2f}' for r in soc_model.soc_rate(piecewise['knots'])))
+
+    rng = np.random.default_rng(0)
+    grid = rng.uniform(0, 2000, (1000, 1000))
+    levels = rng.uniform(5, 90, (1000, 1000))
+    t0 = time.perf_counter()
+    delta_soc(piecewise, grid, levels)
+    print(f"\nDự báo ΔSOC 1,000,000 điểm: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    fixed_delta = [np.nan] * 7 + [-75.0]
+    participating = [True] * 7 + [False]
+    linear = solve_dp(n_blocks=8, participating=participating, fixed_delta=fixed_delta,
+                      soc_end=SOC_MIN)
+    t0 = time.perf_counter()
+    result = solve_dp(n_blocks=8, participating=participating, fixed_delta=fixed_delta,
+                      soc_end=SOC_MIN, piecewise=piecewise)
+    elapsed = time.perf_counter() - t0
+    print("\n📋 7 block + JEPX -75% (block 8)")
+    if linear['pattern'] is not None:
+        replayed = soc_trajectory(piecewise, SOC_MIN, linear['pattern'],
+                                  substeps=PIECEWISE_SUBSTEPS,
+                                  fixed_delta=np.where(participating, np.nan, fixed_delta))
+        print(f"   Tuyến tính: Σ基準値 {linear['total']:.0f}kW, SOC theo mô hình khúc: "
+              f"{' → '.join(f'{s:.1f}' for s in replayed)}")
+    if result['pattern'] is not None:
+        print(f"   Từng khúc:  Σ基準値 {result['total']:.0f}kW ({elapsed * 1000:.0f} ms)")
+        print(f"   基準値: {[round(b) for b in result['pattern']]}")
+        print(f"   SOC:    {' → '.join(f'{s:.1f}' for s in result['soc'])}")
+    else:
+        print("   ❌ Không khả thi")
+
+    if args.save:
+        save_piecewise(piecewise, args.save)
+        print(f'\n✅ Đã lưu: {args.save}')
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ƯỚC LƯỢNG XÁC SUẤT VI PHẠM GIỚI HẠN SOC (MONTE CARLO)
+
+Mô hình tuyến tính SOC変化率 = slope × 基準値 + intercept có sai số thực tế
+(analyze_extended_4days.py, minute_by_minute_analysis.py in ra phân tán của
+residual), nhưng mọi optimizer coi ΔSOC là tất định và lập lịch sát 5% / 90%.
+
+Module này:
+- Tính residual theo block 3 giờ từ dữ liệu thực tế:
+      residual = ΔSOC thực đo − delta_soc(基準値 thực tế)
+  và gom theo ô (block trong ngày × mức 基準値); ô ít dữ liệu dùng residual
+  gộp của cùng mức 基準値
+- Bootstrap: rút residual có hoàn lại cho n_samples quỹ đạo của mỗi pattern,
+  cộng dồn theo block → P(SOC < soc_min), P(SOC > soc_max) từng block
+- Dùng chung số ngẫu nhiên (common random numbers) cho mọi pattern trong 1 lần
+  gọi → so sánh giữa các ứng viên ít nhiễu, dùng được trong vòng lặp tìm kiếm
+
+    python soc_risk.py 507 507 507 507 507 507 507 --soc-start 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import soc_model
+
+# Giới hạn SOC (giống batch_pattern_evaluator)
+SOC_MIN = 5.0
+SOC_MAX = 90.0
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+N_BLOCKS = 8
+
+# Biên các mức 基準値 (kW): <250, 250-750, 750-1250, ≥1250
+LEVEL_EDGES = (250.0, 750.0, 1250.0)
+
+# Ô (block × mức) ít hơn số residual này thì dùng residual gộp của mức
+MIN_COUNT = 30
+
+# Số phần tử tối đa của mảng (pattern × mẫu × block) trong 1 lần tính
+CHUNK_ELEMENTS = 4_000_000
+
+
+# ============================================================================
+# BẢNG RESIDUAL
+# ============================================================================
+
+def bucket_residuals(residuals, baselines, blocks=None, hours=BLOCK_HOURS, model=None,
+                     level_edges=LEVEL_EDGES, min_count=MIN_COUNT, n_blocks=N_BLOCKS):
+    """
+    Gom residual đã tính sẵn theo ô (block trong ngày × mức 基準値)
+
+    Args:
+        residuals: array (M,) residual ΔSOC của block (%)
+        baselines: array (M,) 基準値 của block (kW), để xếp mức
+        blocks: array (M,) chỉ số block trong ngày 0..n_blocks-1 (None = gộp mọi block)
+        hours: số giờ mỗi block
+        model: mô hình tất định đi kèm (None = mặc định)
+
+    Returns:
+        dict:
+            'values': array residual (%), xếp theo ô, tăng dần trong mỗi ô
+            'start', 'count': array (n_blocks, n_levels) vị trí / số residual của ô
+            'level_edges': biên mức 基準値
+            'hours', 'slope', 'intercept'
+    """
+    residuals = np.asarray(residuals, dtype=np.float64)
+    baselines = np.asarray(baselines, dtype=np.float64)
+    blocks = np.zeros(len(residuals), dtype=np.int64) if blocks is None else np.asarray(blocks)
+    ok = np.isfinite(baselines) & np.isfinite(residuals)
+    residuals, baselines, blocks = residuals[ok], baselines[ok], blocks[ok].astype(np.int64)
+    if len(residuals) == 0:
+        raise ValueError('Không có residual nào (thiếu 基準値 hoặc SOC thực đo)')
+
+    slope, intercept = soc_model._coefficients(model)
+    level_edges = np.asarray(level_edges, dtype=np.float64)
+    levels = np.digitize(baselines, level_edges)
+    n_levels = len(level_edges) + 1
+
+    values, start, count = [], np.zeros((n_blocks, n_levels), np.int64), \
+        np.zeros((n_blocks, n_levels), np.int64)
+    offset = 0
+    for level in range(n_levels):
+        pooled = residuals[levels == level]
+        if len(pooled) == 0:
+            pooled = residuals
+        for block in range(n_blocks):
+            cell = residuals[(levels == level) & (blocks == block)]
+            if len(cell) < min_count:
+                cell = pooled
+            values.append(np.sort(cell))
+            start[block, level] = offset
+            count[block, level] = len(cell)
+            offset += len(cell)
+
+    return {
+        'values': np.concatenate(values),
+        'start': start,
+        'count': count,
+        'level_edges': level_edges,
+        'hours': float(hours),
+        'slope': float(slope),
+        'intercept': float(intercept),
+    }
+
+
+def fit_residuals(baselines, deltas, blocks=None, hours=BLOCK_HOURS, model=None, **kwargs):
+    """
+    Bảng residual từ ΔSOC thực đo: residual = ΔSOC − delta_soc(基準値)
+
+    Args:
+        baselines: array (M,) 基準値 thực tế của từng block (kW)
+        deltas: array (M,) ΔSOC thực đo của block (%)
+        blocks: array (M,) chỉ số block trong ngày (None = gộp mọi block)
+        model: mô hình soc_model để tính residual (None = mặc định)
+        **kwargs: level_edges, min_count, n_blocks (xem bucket_residuals)
+    """
+    residuals = (np.asarray(deltas, dtype=np.float64) -
+                 soc_model.delta_soc(baselines, hours, model))
+    return bucket_residuals(residuals, baselines, blocks, hours, model, **kwargs)
+
+
+def residuals_from_table(table, model=None, **kwargs):
+    """Bảng residual từ block_table (historical_backtest) có 基準値 thực tế"""
+    soc = table['soc']
+    n_days, n_blocks = table['baseline'].shape
+    blocks = np.broadcast_to(np.arange(n_blocks), (n_days, n_blocks))
+    return fit_residuals(table['baseline'].ravel(), (soc[:, 1:] - soc[:, :-1]).ravel(),
+                         blocks.ravel(), model=model, n_blocks=n_blocks, **kwargs)
+
+
+def kotohira_residuals(model=None, start=None, end=None, **kwargs):
+    """Bảng residual từ kotohira_integrated_data.csv"""
+    from historical_backtest import load_units
+
+    unit, = load_units('kotohira', start, end)
+    return residuals_from_table(unit['table'], model=model, **kwargs)
+
+
+def save_residuals(table, path):
+    np.savez_compressed(path, **table)
+
+
+def load_residuals(path):
+    with np.load(path) as data:
+        table = {key: data[key] for key in data.files}
+    for key in ('hours', 'slope', 'intercept'):
+        table[key] = float(table[key])
+    return table
+
+
+# ============================================================================
+# MONTE CARLO
+# ============================================================================
+
+def sample_noise(table, baselines, uniforms, first_block=0):
+    """
+    Residual bootstrap cho từng (pattern, mẫu, block)
+
+    Args:
+        table: bảng residual (fit_residuals)
+        baselines: array (P, n) pattern 基準値
+        uniforms: array (S, n) số ngẫu nhiên [0, 1) dùng chung cho mọi pattern
+        first_block: chỉ số block trong ngày của cột đầu tiên
+
+    Returns:
+        array (P, S, n) residual ΔSOC (%)
+    """
+    n_table_blocks = table['start'].shape[0]
+    n = baselines.shape[1]
+    block = (first_block + np.arange(n)) % n_table_blocks
+    level = np.digitize(baselines, table['level_edges'])          # (P, n)
+    start = table['start'][block, level][:, np.newaxis, :]        # (P, 1, n)
+    count = table['count'][block, level][:, np.newaxis, :]
+    index = start + (uniforms[np.newaxis] * count).astype(np.int64)
+    return table['values'][index]
+
+
+def violation_probability(patterns, table, soc_start=SOC_MIN, soc_min=SOC_MIN, soc_max=SOC_MAX,
+                          n_samples=2000, seed=0, first_block=0, model=None, fixed_delta=None,
+                          quantiles=None, chunk_elements=CHUNK_ELEMENTS):
+    """
+    Xác suất SOC vượt giới hạn sau từng block cho N pattern cùng lúc
+
+    Args:
+        patterns: array (N, n) hoặc (n,) 基準値 (kW)
+        table: bảng residual (fit_residuals / load_residuals)
+        soc_start: SOC ban đầu (%)
+        soc_min, soc_max: scalar hoặc array (n,) giới hạn sau từng block
+            (-inf / inf = block không ràng buộc)
+        n_samples: số quỹ đạo mỗi pattern
+        seed: seed của bộ sinh số ngẫu nhiên (cùng seed → cùng mẫu nhiễu)
+        first_block: chỉ số block trong ngày của cột đầu tiên
+        model: mô hình soc_model cho phần tất định (None = hệ số của bảng residual)
+        fixed_delta: array (n,) ΔSOC tất định cố định (JEPX, block nghỉ), NaN = tính
+            từ 基準値 (như dp_solver); nhiễu của block cố định lấy theo mức 基準値 0
+        quantiles: phân vị (%) của SOC cần tính, ví dụ (5, 95); None = bỏ qua
+            (np.percentile chiếm phần lớn thời gian, không cần trong vòng lặp tìm kiếm)
+
+    Returns:
+        dict:
+            'p_low', 'p_high': array (N, n) P(SOC < soc_min), P(SOC > soc_max) sau block
+            'p_block': array (N, n) P(vi phạm tại block)
+            'p_any': array (N,) P(vi phạm ít nhất 1 block)
+            'soc': array (N, n + 1) SOC tất định (cột 0 = soc_start)
+            'soc_quantiles': array (len(quantiles), N, n) nếu có quantiles
+    """
+    patterns = np.asarray(patterns, dtype=np.float64)
+    if patterns.ndim == 1:
+        patterns = patterns[np.newaxis, :]
+    n_patterns, n = patterns.shape
+    soc_min = np.broadcast_to(np.asarray(soc_min, dtype=np.float64), (n,))
+    soc_max = np.broadcast_to(np.asarray(soc_max, dtype=np.float64), (n,))
+
+    if model is None:
+        model = {'slope': table['slope'], 'intercept': table['intercept']}
+    hours = table['hours']
+    if fixed_delta is None:
+        soc = soc_model.soc_trajectory(soc_start, patterns, hours, model)
+    else:
+        fixed_delta = np.broadcast_to(np.asarray(fixed_delta, dtype=np.float64), (n,))
+        fixed = ~np.isnan(fixed_delta)
+        delta = np.where(fixed, fixed_delta, soc_model.delta_soc(patterns, hours, model))
+        soc = np.concatenate([np.full((n_patterns, 1), float(soc_start)),
+                              soc_start + np.cumsum(delta, axis=1)], axis=1)
+        patterns = np.where(fixed, 0.0, patterns)
+
+    rng = np.random.default_rng(seed)
+    uniforms = rng.random((n_samples, n))
+
+    result = {key: np.empty((n_patterns, n)) for key in ('p_low', 'p_high', 'p_block')}
+    result['p_any'] = np.empty(n_patterns)
+    if quantiles is not None:
+        result['soc_quantiles'] = np.empty((len(quantiles), n_patterns, n))
+    step = max(1, chunk_elements // (n_samples * n))
+    for lo in range(0, n_patterns, step):
+        hi = min(lo + step, n_patterns)
+        noise = sample_noise(table, patterns[lo:hi], uniforms, first_block)
+        paths = soc[lo:hi, np.newaxis, 1:] + np.cumsum(noise, axis=2)    # (p, S, n)
+        low = paths < soc_min
+        high = paths > soc_max
+        result['p_low'][lo:hi] = low.mean(axis=1)
+        result['p_high'][lo:hi] = high.mean(axis=1)
+        result['p_block'][lo:hi] = (low | high).mean(axis=1)
+        result['p_any'][lo:hi] = (low | high).any(axis=2).mean(axis=1)
+        if quantiles is not None:
+            result['soc_quantiles'][:, lo:hi] = np.percentile(paths, quantiles, axis=1)
+    result['soc'] = soc
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Xác suất vi phạm giới hạn SOC (Monte Carlo)')
+    parser.add_argument('baselines', type=float, nargs='*',
+                        default=[507, 507, 507, 507, 507, 507, 507])
+    parser.add_argument('--soc-start', type=float, default=SOC_MIN)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--residuals', default=None,
+                        help='bảng residual .npz (mặc định: tính từ kotohira_integrated_data.csv)')
+    parser.add_argument('--save', default=None, help='lưu bảng residual ra .npz')
+    args = parser.parse_args()
+
+    print('=' * 80)
+    print('🎲 XÁC SUẤT VI PHẠM GIỚI HẠN SOC (MONTE CARLO)')
+    print('=' * 80)
+
+    table = load_residuals(args.residuals) if args.residuals else kotohira_residuals()
+    if args.save:
+        save_residuals(table, args.save)
+    values = table['values']
+    print(f"\nResidual ΔSOC / {table['hours']:.0f}h: {table['count'].max():,} mẫu/ô lớn nhất, "
+          f"độ lệch chuẩn {values.std():.2f}%, P5–P95 "
+          f"{np.percentile(values, 5):+.2f} … {np.percentile(values, 95):+.2f}%")
+
+    result = violation_probability(args.baselines, table, soc_start=args.soc_start,
+                                   n_samples=args.samples, quantiles=(5, 95))
+    p05, p95 = result['soc_quantiles'][:, 0]
+    print(f"\nPattern: {args.baselines}")
+    print(f"{'Block':>6} {'SOC':>8} {'P5':>8} {'P95':>8} {'P(<min)':>9} {'P(>max)':>9}")
+    for k in range(len(args.baselines)):
+        print(f"{k + 1:>6} {result['soc'][0, k + 1]:>7.1f}% {p05[k]:>7.1f}% {p95[k]:>7.1f}% "
+              f"{result['p_low'][0, k]:>9.1%} {result['p_high'][0, k]:>9.1%}")
+    print(f"\nP(vi phạm ít nhất 1 block): {result['p_any'][0]:.1%}")
+
+    rng = np.random.default_rng(1)
+    candidates = rng.uniform(0, 1500, (1000, len(args.baselines)))
+    t0 = time.perf_counter()
+    violation_probability(candidates, table, soc_start=args.soc_start, n_samples=args.samples)
+    print(f"\n1,000 pattern × {args.samples:,} quỹ đạo: {time.perf_counter() - t0:.2f} giây")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CẬP NHẬT HỆ SỐ SOC/基準値 TRỰC TUYẾN (RECURSIVE LEAST SQUARES)
+
+SLOPE/INTERCEPT chỉ được hồi quy 1 lần từ 4 ngày (22, 23, 25, 26/9) trong
+analyze_extended_4days.py. Module này cập nhật hệ số theo từng block 3 giờ khi
+có thêm dòng kotohira_integrated_data:
+
+    SOC変化率 (%/h) = slope × 基準値 + intercept
+    θ ← θ + k (y − xᵀθ),  k = P x / (λ + xᵀ P x),  P ← (P − k xᵀ P) / λ
+
+- λ (forgetting factor) < 1: dữ liệu cũ giảm dần trọng số, bộ nhớ hiệu dụng
+  ≈ 1 / (1 − λ) block (λ = 0.995 ≈ 200 block ≈ 25 ngày) → theo kịp lão hóa
+  pin và thay đổi theo mùa
+- Trạng thái mỗi site có kích thước cố định: θ (2), P (2×2) và bộ cộng dồn của
+  block đang mở; không giữ lịch sử, không hồi quy lại từ đầu
+- Gọi nhiều lần với các đoạn dữ liệu nối tiếp cho kết quả giống gọi 1 lần
+- Trạng thái lưu ở soc_rls_state.json; các optimizer đọc hệ số mới nhất qua
+  soc_model.get_model('kotohira', 'rls') (ví dụ --model kotohira/rls)
+
+    python soc_rls.py kotohira_integrated_data.csv --state soc_rls_state.json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import soc_model
+
+BLOCK_HOURS = soc_model.BLOCK_HOURS
+FORGETTING = 0.995
+
+# Hiệp phương sai ban đầu của (slope, intercept): độ tin vào mô hình khởi đầu
+INITIAL_COVARIANCE = (1e-5, 1.0)
+
+# Block có ít hơn tỉ lệ này số phút có dữ liệu thì bỏ qua
+MIN_COVERAGE = 0.8
+
+STATE_FILE = soc_model.RLS_STATE_FILE
+
+_BLOCK_NS = int(BLOCK_HOURS * 3600 * 1e9)
+_MINUTE_NS = int(60 * 1e9)
+
+
+def init_state(site='kotohira', model=None, forgetting=FORGETTING,
+               covariance=INITIAL_COVARIANCE):
+    """
+    Trạng thái RLS khởi đầu từ mô hình hiện có của site
+
+    Returns:
+        dict (kích thước cố định, ghi được ra JSON):
+            'site', 'forgetting', 'theta' [slope, intercept], 'P' 2×2,
+            'updates': số block đã dùng,
+            'open': block đang mở (None hoặc dict 'block', 'soc_start',
+                'soc_last', 'baseline_sum', 'count', 'time_last')
+    """
+    model = model or soc_model.get_model(site)
+    return {
+        'site': site,
+        'forgetting': float(forgetting),
+        'theta': [float(model['slope']), float(model['intercept'])],
+        'P': np.diag(covariance).tolist(),
+        'updates': 0,
+        'open': None,
+    }
+
+
+def rls_update(state, baselines, rates):
+    """
+    Cập nhật RLS tuần tự với các quan sát (基準値, SOC変化率)
+
+    Args:
+        state: trạng thái (init_state), được sửa tại chỗ
+        baselines: array (n,) 基準値 trung bình của block (kW)
+        rates: array (n,) SOC変化率 thực đo của block (%/h)
+
+    Returns:
+        array (n, 2) θ sau từng quan sát
+    """
+    lam = state['forgetting']
+    theta = np.array(state['theta'], dtype=np.float64)
+    P = np.array(state['P'], dtype=np.float64)
+    history = np.empty((len(baselines), 2))
+    for i, (baseline, rate) in enumerate(zip(baselines, rates)):
+        x = np.array([baseline, 1.0])
+        Px = P @ x
+        gain = Px / (lam + x @ Px)
+        theta += gain * (rate - x @ theta)
+        P = (P - np.outer(gain, Px)) / lam
+        P = (P + P.T) / 2
+        history[i] = theta
+    state['theta'] = theta.tolist()
+    state['P'] = P.tolist()
+    state['updates'] += len(baselines)
+    return history
+
+
+def block_observations(state, times, soc, baselines, min_coverage=MIN_COVERAGE):
+    """
+    Gom dòng mới thành các block 3 giờ đã đóng, cập nhật block đang mở của state
+
+    SOC đầu block = mẫu cuối cùng của block liền trước (như
+    historical_backtest.block_table); block sau khoảng trống dữ liệu bị bỏ qua.
+
+    Returns:
+        dict: 'block' (n,) số thứ tự block (epoch / 3h), 'baseline', 'rate' (%/h)
+    """
+    times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    soc = np.asarray(soc, dtype=np.float64)
+    baselines = np.asarray(baselines, dtype=np.float64)
+    ok = np.isfinite(soc) & np.isfinite(baselines)
+    order = np.argsort(times[ok], kind='stable')
+    times, soc, baselines = times[ok][order], soc[ok][order], baselines[ok][order]
+
+    opened = state['open']
+    if opened is not None:
+        # Bỏ dòng đã xử lý ở lần gọi trước (dữ liệu gửi lặp)
+        keep = times > opened['time_last']
+        times, soc, baselines = times[keep], soc[keep], baselines[keep]
+
+    empty = {'block': np.empty(0, np.int64), 'baseline': np.empty(0), 'rate': np.empty(0)}
+    if len(times) == 0:
+        return empty
+
+    block = times // _BLOCK_NS
+    ids, first = np.unique(block, return_index=True)
+    last = np.append(first[1:], len(block)) - 1
+    baseline_sum = np.add.reduceat(baselines, first)
+    count = np.diff(np.append(first, len(block))).astype(np.float64)
+    soc_last = soc[last]
+    soc_start = np.full(len(ids), np.nan)
+    soc_start[1:] = np.where(ids[1:] == ids[:-1] + 1, soc_last[:-1], np.nan)
+
+    # Nối với block đang mở của lần gọi trước
+    if opened is not None:
+        if ids[0] == opened['block']:
+            soc_start[0] = opened['soc_start']
+            baseline_sum[0] += opened['baseline_sum']
+            count[0] += opened['count']
+        else:
+            # Dữ liệu mới đã sang block sau → đóng block đang mở như block thường
+            if ids[0] == opened['block'] + 1:
+                soc_start[0] = opened['soc_last']
+            ids = np.insert(ids, 0, opened['block'])
+            soc_start = np.insert(soc_start, 0, opened['soc_start'])
+            soc_last = np.insert(soc_last, 0, opened['soc_last'])
+            baseline_sum = np.insert(baseline_sum, 0, opened['baseline_sum'])
+            count = np.insert(count, 0, opened['count'])
+
+    # Block cuối có thể chưa đủ dữ liệu → giữ lại làm block đang mở
+    state['open'] = {
+        'block': int(ids[-1]),
+        'soc_start': float(soc_start[-1]),
+        'soc_last': float(soc_last[-1]),
+        'baseline_sum': float(baseline_sum[-1]),
+        'count': float(count[-1]),
+        'time_last': int(times[-1]),
+    }
+    ids, soc_start, soc_last = ids[:-1], soc_start[:-1], soc_last[:-1]
+    baseline_sum, count = baseline_sum[:-1], count[:-1]
+
+    valid = np.isfinite(soc_start) & (count >= min_coverage * _BLOCK_NS / _MINUTE_NS)
+    if not valid.any():
+        return empty
+    return {
+        'block': ids[valid],
+        'baseline': baseline_sum[valid] / count[valid],
+        'rate': (soc_last[valid] - soc_start[valid]) / BLOCK_HOURS,
+    }
+
+
+def update(state, times, soc, baselines, min_coverage=MIN_COVERAGE):
+    """
+    Cập nhật hệ số với các dòng dữ liệu mới (timestamp, SOC, 基準値)
+
+    Returns:
+        DataFrame 1 dòng / block đã dùng: 'block_start', 'baseline', 'rate',
+        'slope', 'intercept'
+    """
+    observed = block_observations(state, times, soc, baselines, min_coverage)
+    history = rls_update(state, observed['baseline'], observed['rate'])
+    return pd.DataFrame({
+        'block_start': pd.to_datetime(observed['block'] * _BLOCK_NS),
+        'baseline': observed['baseline'],
+        'rate': observed['rate'],
+        'slope': history[:, 0],
+        'intercept': history[:, 1],
+    })
+
+
+def register(state, version=None, default=False):
+    """Đăng ký hệ số hiện tại vào soc_model (ví dụ 'rls-2025-10-18')"""
+    opened = state['open']
+    if version is None:
+        stamp = pd.Timestamp(opened['block'] * _BLOCK_NS) if opened else pd.Timestamp.now()
+        version = f'rls-{stamp:%Y-%m-%d}'
+    slope, intercept = state['theta']
+    note = f"RLS λ={state['forgetting']}, {state['updates']} block"
+    return soc_model.register_model(state['site'], version, slope, intercept, note, default)
+
+
+def load_states(path=STATE_FILE):
+    """{site: state} từ JSON ({} nếu chưa có)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_states(states, path=STATE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(states, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cập nhật hệ số SOC/基準値 bằng RLS')
+    parser.add_argument('csv', nargs='?', default='kotohira_integrated_data.csv')
+    parser.add_argument('--site', default='kotohira')
+    parser.add_argument('--state', default=STATE_FILE, help='file JSON trạng thái RLS')
+    parser.add_argument('--forgetting', type=float, default=FORGETTING)
+    args = parser.parse_args()
+
+    print('=' * 80)
+    print('🔁 CẬP NHẬT HỆ SỐ SOC/基準値 (RLS)')
+    print('=' * 80)
+
+    states = load_states(args.state)
+    state = states.get(args.site) or init_state(args.site, forgetting=args.forgetting)
+    before = list(state['theta'])
+
+    data = pd.read_csv(args.csv, usecols=['timestamp', 'battery_soc_percent',
+                                          'demand_plan_kw_baseline'])
+    history = update(state, data['timestamp'], data['battery_soc_percent'],
+                     data['demand_plan_kw_baseline'])
+    states[args.site] = state
+    save_states(states, args.state)
+
+    print(f"\n{len(data):,} dòng → {len(history)} block mới (tổng {state['updates']} block)")
+    print(f"Trước: SOC変化率 = {before[0]:.6f} × 基準値 {before[1]:+.4f}")
+    print(f"Sau:   SOC変化率 = {state['theta'][0]:.6f} × 基準値 {state['theta'][1]:+.4f}")
+    if len(history):
+        monthly = history.set_index('block_start')[['slope', 'intercept']].resample('MS').last()
+        print('\nHệ số cuối mỗi tháng:')
+        for month, row in monthly.dropna().iterrows():
+            print(f"   {month:%Y-%m}: {row['slope']:.6f} / {row['intercept']:+.4f}")
+    print(f'\n✅ Đã lưu trạng thái: {args.state}')
+    if os.path.abspath(args.state) == os.path.abspath(STATE_FILE):
+        print(f"   Optimizer dùng hệ số này qua soc_model.get_model('{args.site}', "
+              f"'{soc_model.RLS_VERSION}')")
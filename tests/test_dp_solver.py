@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""dp_solver: lịch thỏa giới hạn SOC liên tục, policy liên tục theo SOC"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dp_solver
+
+
+@pytest.fixture(scope='module')
+def gc_result():
+    """Cấu hình của gc_policy_table: 7 blocks + JEPX -75% ở block 8, bước 10 kW"""
+    return dp_solver.solve_dp(n_blocks=8, participating=[True] * 7 + [False],
+                              fixed_delta=[np.nan] * 7 + [-75.0], soc_end=5.0,
+                              baseline_step=10.0, grid_range=(0, 100))
+
+
+def test_jepx_plan_within_continuous_bounds():
+    result = dp_solver.solve_dp(n_blocks=7, jepx_delta=-85.0, soc_end=5.0)
+    assert result['total'] == 3549
+    assert dp_solver.soc_violation(result['soc'], soc_end=5.0, jepx_delta=-85.0) <= \
+        dp_solver.SOC_TOLERANCE
+
+
+def test_policy_smooth_in_soc(gc_result):
+    soc_starts = np.arange(60.0, 70.0, 0.01)
+    patterns, feasible = dp_solver.rollout_policy(gc_result, soc_starts)
+    assert feasible.all()
+
+    # SOC ban đầu lệch 0.01% → 基準値 mỗi block lệch tối đa 1 bước, Σ không nhảy
+    step = gc_result['levels'][1] - gc_result['levels'][0]
+    assert np.abs(np.diff(patterns, axis=0)).max() <= step
+    assert np.abs(np.diff(patterns.sum(axis=1))).max() <= step
+
+
+def test_ties_prefer_highest_baseline(gc_result):
+    # Từ 65.7% mọi 基準値 block 1 tới 800 kW cho cùng Σ → chọn 800 kW
+    patterns, _ = dp_solver.rollout_policy(gc_result, [65.70, 65.72])
+    np.testing.assert_array_equal(patterns[0], patterns[1])
+    assert patterns[0, 0] == 800
+    assert patterns[0].sum() == 1820
+
+
+def test_piecewise_taper_integrated_within_block():
+    import soc_model
+    import soc_piecewise
+
+    # Sạc giảm 1 nửa ở 90%, dừng ở 100%
+    knots = soc_piecewise.default_knots()
+    rate = soc_model.soc_rate(knots)
+    taper = np.array([1, 1, 1, 0.5, 0.0])[:, np.newaxis]
+    model = {'knots': knots, 'soc_nodes': np.array(soc_piecewise.SOC_NODES),
+             'rates': np.where(rate > 0, rate * taper, rate)}
+    result = dp_solver.solve_dp(n_blocks=4, soc_start=60.0, soc_max=100.0, soc_resolution=0.5,
+                                baseline_step=10.0, piecewise=model)
+    fine = soc_piecewise.soc_trajectory(model, 60.0, result['pattern'], substeps=1000)
+    np.testing.assert_allclose(result['soc'], fine, atol=1.0)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""soc_block_table: 差分更新（過去の行の修正を含む）== 全期間を一度に集計"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import soc_block_table
+
+
+def _minutes(n_days=3):
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2025-08-01', periods=n_days * 24 * 60, freq='min')
+    soc = rng.uniform(5, 90, len(times))
+    baselines = np.repeat(rng.integers(0, 2000, len(times) // 30), 30).astype(np.float64)
+    power = rng.normal(0, 100, len(times))
+    return times, soc, baselines, power
+
+
+def _assert_same(table, expected):
+    for column in soc_block_table.COLUMNS:
+        left, right = table[column].to_numpy(), expected[column].to_numpy()
+        if column == 'site':
+            assert (left == right).all()
+        elif np.issubdtype(left.dtype, np.number):
+            np.testing.assert_allclose(left.astype(float), right.astype(float), equal_nan=True)
+        else:
+            assert (pd.to_datetime(pd.Series(left)) == pd.to_datetime(pd.Series(right))).all()
+
+
+def test_append_and_revision_match_full_aggregation(tmp_path):
+    times, soc, baselines, power = _minutes()
+    path = tmp_path / 'table.csv'
+
+    # 途中のブロックで切れたデータ → 追記
+    table = soc_block_table.update_table(None, times[:1000], soc[:1000], baselines[:1000],
+                                         power[:1000])
+    soc_block_table.save_table(table, path)
+    table = soc_block_table.update_table(soc_block_table.load_table(path), times[:3000],
+                                         soc[:3000], baselines[:3000], power[:3000])
+    soc_block_table.save_table(table, path)
+    table = soc_block_table.load_table(path)
+
+    # 変更なし → そのまま
+    assert soc_block_table.update_table(table, times[:3000], soc[:3000], baselines[:3000],
+                                        power[:3000]) is table
+
+    # 過去のブロックの計画値を修正 + 追記
+    baselines = baselines.copy()
+    baselines[400:430] = 1234.0
+    table = soc_block_table.update_table(table, times, soc, baselines, power)
+    _assert_same(table, soc_block_table.aggregate_blocks(times, soc, baselines, power))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""soc_rls: gọi nhiều lần với các đoạn dữ liệu nối tiếp == gọi 1 lần"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import soc_rls
+
+
+def _minutes(n_blocks=4):
+    """n_blocks block 3 giờ dữ liệu từng phút, 基準値 khác nhau mỗi block"""
+    times = pd.date_range('2025-09-22', periods=n_blocks * 180, freq='min')
+    baselines = np.repeat(np.linspace(0, 1500, n_blocks), 180)
+    soc = 50 + np.cumsum((0.0128 * baselines - 2.0) / 60)
+    return times, soc, baselines
+
+
+def _run(chunks):
+    state = soc_rls.init_state()
+    observed = [soc_rls.block_observations(state, *chunk) for chunk in chunks]
+    blocks = np.concatenate([o['block'] for o in observed])
+    rates = np.concatenate([o['rate'] for o in observed])
+    return blocks, rates
+
+
+@pytest.mark.parametrize('cut', [180, 360, 400, 539])
+def test_chunks_match_single_pass(cut):
+    times, soc, baselines = _minutes()
+    single = _run([(times, soc, baselines)])
+    chunked = _run([(times[:cut], soc[:cut], baselines[:cut]),
+                    (times[cut:], soc[cut:], baselines[cut:])])
+    np.testing.assert_array_equal(chunked[0], single[0])
+    np.testing.assert_allclose(chunked[1], single[1])
+
+
+def test_update_theta_matches_single_pass():
+    times, soc, baselines = _minutes(8)
+    single, chunked = soc_rls.init_state(), soc_rls.init_state()
+    soc_rls.update(single, times, soc, baselines)
+    for lo in range(0, len(times), 360):
+        soc_rls.update(chunked, times[lo:lo + 360], soc[lo:lo + 360], baselines[lo:lo + 360])
+    assert chunked['updates'] == single['updates'] == 6
+    np.testing.assert_allclose(chunked['theta'], single['theta'])
+
+
+def test_update_recovers_noise_free_coefficients():
+    # Prior gần như không thông tin → θ hội tụ về hệ số sinh dữ liệu
+    times, soc, baselines = _minutes(8)
+    state = soc_rls.init_state(covariance=(1e3, 1e6))
+    history = soc_rls.update(state, times, soc, baselines)
+    np.testing.assert_allclose(history['rate'], 0.0128 * history['baseline'] - 2.0)
+    np.testing.assert_allclose(state['theta'], [0.0128, -2.0], rtol=1e-5)
+
+
+def test_saved_state_readable_by_soc_model(tmp_path, monkeypatch):
+    times, soc, baselines = _minutes(8)
+    state = soc_rls.init_state()
+    soc_rls.update(state, times, soc, baselines)
+    path = tmp_path / 'soc_rls_state.json'
+    soc_rls.save_states({'kotohira': state}, path)
+
+    monkeypatch.setattr(soc_rls.soc_model, 'RLS_STATE_FILE', str(path))
+    model = soc_rls.soc_model.get_model('kotohira', 'rls')
+    assert [model['slope'], model['intercept']] == state['theta']
+    with pytest.raises(KeyError):
+        soc_rls.soc_model.get_model('other', 'rls')
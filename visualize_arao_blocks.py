@@ -9,23 +9,15 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from block_shading import BLOCK_COLORS, add_block_shading
+from dataset_cache import load_dataset
+from soc_downsample import add_downsampled_trace, write_downsampled_html
+
 # データ読み込み
 print("データを読み込んでいます...")
-schedule_df = pd.read_csv(
-    'arao_202406-202504/arao_schedule_202406-202504.csv'
-)
-soc_battery12_df = pd.read_csv(
-    'arao_202406-202504/arao_soc_battery1-2_202406-202504.csv'
-)
-soc_battery34_df = pd.read_csv(
-    'arao_202406-202504/arao_soc_battery3-4_202406-202504.csv'
-)
-
-# 時刻をdatetimeに変換
-schedule_df['開始時刻'] = pd.to_datetime(schedule_df['開始時刻'])
-schedule_df['終了時刻'] = pd.to_datetime(schedule_df['終了時刻'])
-soc_battery12_df['時刻'] = pd.to_datetime(soc_battery12_df['時刻'])
-soc_battery34_df['時刻'] = pd.to_datetime(soc_battery34_df['時刻'])
+schedule_df = load_dataset('arao_202406-202504/arao_schedule_202406-202504.csv')
+soc_battery12_df = load_dataset('arao_202406-202504/arao_soc_battery1-2_202406-202504.csv')
+soc_battery34_df = load_dataset('arao_202406-202504/arao_soc_battery3-4_202406-202504.csv')
 
 # ブロック番号を抽出（時刻から計算）
 schedule_df['block'] = ((schedule_df['開始時刻'].dt.hour * 2 +
@@ -44,22 +36,13 @@ fig = make_subplots(
     vertical_spacing=0.1,
     subplot_titles=(
         '荒尾発電所 - 計画値（ブロック1~8別表示）- 30分粒度',
-        '荒尾発電所 - バッテリSOC - 1分粒度'
+        '荒尾発電所 - バッテリSOC - 1分粒度（表示範囲に応じて間引き）'
     ),
     row_heights=[0.4, 0.6]
 )
 
 # ブロック別の色とラベル
-block_colors = {
-    1: 'rgba(255, 0, 0, 0.6)',      # 赤（0:00-3:00）
-    2: 'rgba(255, 165, 0, 0.6)',    # オレンジ（3:00-6:00）
-    3: 'rgba(255, 255, 0, 0.6)',    # 黄色（6:00-9:00）
-    4: 'rgba(0, 255, 0, 0.6)',      # 緑（9:00-12:00）
-    5: 'rgba(0, 255, 255, 0.6)',    # シアン（12:00-15:00）
-    6: 'rgba(0, 0, 255, 0.6)',      # 青（15:00-18:00）
-    7: 'rgba(148, 0, 211, 0.6)',    # 紫（18:00-21:00）
-    8: 'rgba(255, 20, 147, 0.6)',   # ピンク（21:00-24:00）
-}
+block_colors = BLOCK_COLORS
 
 block_times = {
     1: '0:00-3:00',
@@ -72,6 +55,15 @@ block_times = {
     8: '21:00-24:00',
 }
 
+# ブロックの背景色（全期間を1トレースで、線より先に追加）
+start_date = schedule_df['開始時刻'].min().date()
+end_date = schedule_df['終了時刻'].max().date()
+
+add_block_shading(fig, start_date, end_date, -2500, 2500, opacity=0.15,
+                  colors=block_colors, row=1, col=1)
+add_block_shading(fig, start_date, end_date, 0, 100, opacity=0.1,
+                  colors=block_colors, row=2, col=1)
+
 # 1. JEPXと二次・三次を分けて表示（ブロックの色は背景で）
 jepx_df = schedule_df[schedule_df['計画リソース'] == 'JEPX']
 nijisanji_df = schedule_df[schedule_df['計画リソース'] == '二次・三次']
@@ -115,33 +107,27 @@ battery1_df = soc_battery12_df[soc_battery12_df['蓄電池名'] == '蓄電池1']
 battery2_df = soc_battery12_df[soc_battery12_df['蓄電池名'] == '蓄電池2']
 
 if len(battery1_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery1_df['時刻'],
-            y=battery1_df['SOC'],
-            name='バッテリ1 SOC',
-            line=dict(color='rgba(0, 128, 0, 0.7)', width=1),
-            mode='lines',
-            hovertemplate=(
-                '<b>バッテリ1 SOC</b>: %{y:.1f}%<br>'
-                '時刻: %{x}<extra></extra>'
-            )
+    add_downsampled_trace(
+        fig, battery1_df['時刻'], battery1_df['SOC'],
+        name='バッテリ1 SOC',
+        line=dict(color='rgba(0, 128, 0, 0.7)', width=1),
+        mode='lines',
+        hovertemplate=(
+            '<b>バッテリ1 SOC</b>: %{y:.1f}%<br>'
+            '時刻: %{x}<extra></extra>'
         ),
         row=2, col=1
     )
 
 if len(battery2_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery2_df['時刻'],
-            y=battery2_df['SOC'],
-            name='バッテリ2 SOC',
-            line=dict(color='rgba(144, 238, 144, 0.7)', width=1),
-            mode='lines',
-            hovertemplate=(
-                '<b>バッテリ2 SOC</b>: %{y:.1f}%<br>'
-                '時刻: %{x}<extra></extra>'
-            )
+    add_downsampled_trace(
+        fig, battery2_df['時刻'], battery2_df['SOC'],
+        name='バッテリ2 SOC',
+        line=dict(color='rgba(144, 238, 144, 0.7)', width=1),
+        mode='lines',
+        hovertemplate=(
+            '<b>バッテリ2 SOC</b>: %{y:.1f}%<br>'
+            '時刻: %{x}<extra></extra>'
         ),
         row=2, col=1
     )
@@ -151,33 +137,27 @@ battery3_df = soc_battery34_df[soc_battery34_df['蓄電池名'] == '蓄電池3']
 battery4_df = soc_battery34_df[soc_battery34_df['蓄電池名'] == '蓄電池4']
 
 if len(battery3_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery3_df['時刻'],
-            y=battery3_df['SOC'],
-            name='バッテリ3 SOC',
-            line=dict(color='rgba(255, 140, 0, 0.7)', width=1),
-            mode='lines',
-            hovertemplate=(
-                '<b>バッテリ3 SOC</b>: %{y:.1f}%<br>'
-                '時刻: %{x}<extra></extra>'
-            )
+    add_downsampled_trace(
+        fig, battery3_df['時刻'], battery3_df['SOC'],
+        name='バッテリ3 SOC',
+        line=dict(color='rgba(255, 140, 0, 0.7)', width=1),
+        mode='lines',
+        hovertemplate=(
+            '<b>バッテリ3 SOC</b>: %{y:.1f}%<br>'
+            '時刻: %{x}<extra></extra>'
         ),
         row=2, col=1
     )
 
 if len(battery4_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery4_df['時刻'],
-            y=battery4_df['SOC'],
-            name='バッテリ4 SOC',
-            line=dict(color='rgba(255, 69, 0, 0.7)', width=1),
-            mode='lines',
-            hovertemplate=(
-                '<b>バッテリ4 SOC</b>: %{y:.1f}%<br>'
-                '時刻: %{x}<extra></extra>'
-            )
+    add_downsampled_trace(
+        fig, battery4_df['時刻'], battery4_df['SOC'],
+        name='バッテリ4 SOC',
+        line=dict(color='rgba(255, 69, 0, 0.7)', width=1),
+        mode='lines',
+        hovertemplate=(
+            '<b>バッテリ4 SOC</b>: %{y:.1f}%<br>'
+            '時刻: %{x}<extra></extra>'
         ),
         row=2, col=1
     )
@@ -208,64 +188,8 @@ fig.update_layout(
     template='plotly_white'
 )
 
-# ブロックの背景色を追加（全日付に対して）
-import pandas as pd
-from datetime import datetime, timedelta
-
-# 全期間の日付リストを取得
-start_date = schedule_df['開始時刻'].min().date()
-end_date = schedule_df['終了時刻'].max().date()
-current_date = start_date
-
-# 各行に背景色の矩形を追加
-shapes = []
 annotations = []
 
-while current_date <= end_date:
-    for block_num in range(1, 9):
-        # ブロックの開始・終了時刻を計算
-        block_start_hour = (block_num - 1) * 3
-        block_end_hour = block_num * 3
-        
-        x0 = pd.Timestamp(current_date) + pd.Timedelta(hours=block_start_hour)
-        x1 = pd.Timestamp(current_date) + pd.Timedelta(hours=block_end_hour)
-        
-        # 矩形を追加（row 1のみ）
-        shapes.append(
-            dict(
-                type="rect",
-                xref="x",
-                yref="y",
-                x0=x0,
-                x1=x1,
-                y0=-2500,
-                y1=2500,
-                fillcolor=block_colors[block_num],
-                opacity=0.15,
-                layer="below",
-                line_width=0,
-            )
-        )
-        
-        # 背景色をrow 2にも追加
-        shapes.append(
-            dict(
-                type="rect",
-                xref="x2",
-                yref="y2",
-                x0=x0,
-                x1=x1,
-                y0=0,
-                y1=100,
-                fillcolor=block_colors[block_num],
-                opacity=0.1,
-                layer="below",
-                line_width=0,
-            )
-        )
-    
-    current_date += timedelta(days=1)
-
 # ブロックラベルを追加（最初の日だけ）
 first_date = start_date
 for block_num in range(1, 9):
@@ -286,7 +210,7 @@ for block_num in range(1, 9):
         )
     )
 
-fig.update_layout(shapes=shapes, annotations=annotations)
+fig.update_layout(annotations=annotations)
 
 # ブロック別統計
 print("\n=== ブロック別統計 ===")
@@ -305,7 +229,7 @@ for block_num in range(1, 9):
 
 # HTML出力
 output_file = 'arao_blocks_visualization.html'
-fig.write_html(output_file)
+write_downsampled_html(fig, output_file)
 print(f"\n✅ 可視化完了: {output_file}")
 
 # ブラウザで開く
@@ -4,22 +4,18 @@
 - 1分粒度: バッテリ1-2とバッテリ3-4のSOC値
 """
 
-import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
 
+from dataset_cache import load_dataset
+from soc_downsample import add_downsampled_trace, write_downsampled_html
+
 # データ読み込み
 print("データを読み込んでいます...")
-schedule_df = pd.read_csv('arao_202406-202504/arao_schedule_202406-202504.csv')
-soc_battery12_df = pd.read_csv('arao_202406-202504/arao_soc_battery1-2_202406-202504.csv')
-soc_battery34_df = pd.read_csv('arao_202406-202504/arao_soc_battery3-4_202406-202504.csv')
-
-# 時刻をdatetimeに変換
-schedule_df['開始時刻'] = pd.to_datetime(schedule_df['開始時刻'])
-schedule_df['終了時刻'] = pd.to_datetime(schedule_df['終了時刻'])
-soc_battery12_df['時刻'] = pd.to_datetime(soc_battery12_df['時刻'])
-soc_battery34_df['時刻'] = pd.to_datetime(soc_battery34_df['時刻'])
+schedule_df = load_dataset('arao_202406-202504/arao_schedule_202406-202504.csv')
+soc_battery12_df = load_dataset('arao_202406-202504/arao_soc_battery1-2_202406-202504.csv')
+soc_battery34_df = load_dataset('arao_202406-202504/arao_soc_battery3-4_202406-202504.csv')
 
 print(f"スケジュールデータ: {len(schedule_df)} 行 (30分粒度)")
 print(f"バッテリ1-2 SOCデータ: {len(soc_battery12_df)} 行 (1分粒度)")
@@ -33,7 +29,7 @@ fig = make_subplots(
     vertical_spacing=0.1,
     subplot_titles=(
         '荒尾発電所 - 計画値（JEPX + 二次・三次調整力）- 30分粒度',
-        '荒尾発電所 - バッテリSOC - 1分粒度'
+        '荒尾発電所 - バッテリSOC - 1分粒度（表示範囲に応じて間引き）'
     ),
     row_heights=[0.4, 0.6]
 )
@@ -75,28 +71,22 @@ battery1_df = soc_battery12_df[soc_battery12_df['蓄電池名'] == '蓄電池1']
 battery2_df = soc_battery12_df[soc_battery12_df['蓄電池名'] == '蓄電池2']
 
 if len(battery1_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery1_df['時刻'],
-            y=battery1_df['SOC'],
-            name='バッテリ1 SOC',
-            line=dict(color='green', width=1),
-            mode='lines',
-            hovertemplate='<b>バッテリ1 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>'
-        ),
+    add_downsampled_trace(
+        fig, battery1_df['時刻'], battery1_df['SOC'],
+        name='バッテリ1 SOC',
+        line=dict(color='green', width=1),
+        mode='lines',
+        hovertemplate='<b>バッテリ1 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>',
         row=2, col=1
     )
 
 if len(battery2_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery2_df['時刻'],
-            y=battery2_df['SOC'],
-            name='バッテリ2 SOC',
-            line=dict(color='lightgreen', width=1),
-            mode='lines',
-            hovertemplate='<b>バッテリ2 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>'
-        ),
+    add_downsampled_trace(
+        fig, battery2_df['時刻'], battery2_df['SOC'],
+        name='バッテリ2 SOC',
+        line=dict(color='lightgreen', width=1),
+        mode='lines',
+        hovertemplate='<b>バッテリ2 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>',
         row=2, col=1
     )
 
@@ -105,28 +95,22 @@ battery3_df = soc_battery34_df[soc_battery34_df['蓄電池名'] == '蓄電池3']
 battery4_df = soc_battery34_df[soc_battery34_df['蓄電池名'] == '蓄電池4']
 
 if len(battery3_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery3_df['時刻'],
-            y=battery3_df['SOC'],
-            name='バッテリ3 SOC',
-            line=dict(color='orange', width=1),
-            mode='lines',
-            hovertemplate='<b>バッテリ3 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>'
-        ),
+    add_downsampled_trace(
+        fig, battery3_df['時刻'], battery3_df['SOC'],
+        name='バッテリ3 SOC',
+        line=dict(color='orange', width=1),
+        mode='lines',
+        hovertemplate='<b>バッテリ3 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>',
         row=2, col=1
     )
 
 if len(battery4_df) > 0:
-    fig.add_trace(
-        go.Scatter(
-            x=battery4_df['時刻'],
-            y=battery4_df['SOC'],
-            name='バッテリ4 SOC',
-            line=dict(color='red', width=1),
-            mode='lines',
-            hovertemplate='<b>バッテリ4 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>'
-        ),
+    add_downsampled_trace(
+        fig, battery4_df['時刻'], battery4_df['SOC'],
+        name='バッテリ4 SOC',
+        line=dict(color='red', width=1),
+        mode='lines',
+        hovertemplate='<b>バッテリ4 SOC</b>: %{y:.1f}%<br>時刻: %{x}<extra></extra>',
         row=2, col=1
     )
 
@@ -204,7 +188,7 @@ if len(battery4_df) > 0:
 
 # HTML出力
 output_file = 'arao_visualization.html'
-fig.write_html(output_file)
+write_downsampled_html(fig, output_file)
 print(f"\n✅ 可視化完了: {output_file}")
 
 # ブラウザで開く
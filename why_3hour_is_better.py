@@ -1,5 +1,7 @@
 """
 PHÂN TÍCH CHI TIẾT: TẠI SAO CÔNG THỨC 3-HOUR BLOCKS TỐT HƠN CÔNG THỨC TỪNG PHÚT
+
+R² 0.9997 vs 0.1005 ở đây; model_selection.py so sánh ngoài mẫu theo horizon.
 """
 
 print('='*100)